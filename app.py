@@ -8,39 +8,48 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from datetime import datetime, timedelta
-from openai import OpenAI
 import os
 from typing import Optional, Tuple, Dict, Any, List
 import json
+from collections import OrderedDict
 from dotenv import load_dotenv
 import numpy as np
 from io import BytesIO
 import base64
+import hashlib
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-# Advanced analytics imports
-try:
-    from prophet import Prophet
-    PROPHET_AVAILABLE = True
-except:
-    PROPHET_AVAILABLE = False
-
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from scipy import stats
+from bi_engine import (
+    build_customer_aggregates, combine_customer_aggregates, cohort_tables_from_pairs,
+    list_parquet_partitions, read_parquet_schema, scan_customer_partitions, run_forecast_job, ForecastTimeout,
+    compute_series_fingerprint, evict_cache_dir, run_fast_forecasts, build_daily_history,
+    rolling_origin_cutoffs, run_backtest_fold, summarize_backtest,
+    build_anomaly_calendar, score_anomalies, extend_anomaly_scores, is_calendar_prefix, threshold_anomalies,
+    scan_segment_anomalies, build_group_sums, extend_group_sums, top_k_groups, top_k_rows, choose_time_resolution,
+    resample_daily, downsample_series, histogram_bins,
+    ANOMALY_WINDOW_DAYS, ANOMALY_SEASON_WEEKS, ANOMALY_SCAN_DAYS, ANOMALY_SCAN_TOP,
+    infer_column_types, get_schema_fingerprint, resolve_schema_roles,
+    write_export, EXPORT_FORMATS, ZSTD_AVAILABLE, FAST_ENGINES, PROPHET_AVAILABLE,
+    compute_kpis, build_report_bundle, REPORTLAB_AVAILABLE,
+    score_rfm, clv_from_aggregates, compute_rfm, compute_clv, compute_cohorts,
+    CACHE_ROOT, MODEL_CACHE_DIR, MODEL_CACHE_MAX_BYTES, ANOMALY_SENSITIVITY, BACKTEST_FOLDS, lazy_import,
+    ingest_file, get_ingest_cache_key, get_ingest_cache_path, load_ingest_cache, type_report_metadata,
+    normalize_column_name, handle_duplicate_columns, INGEST_CACHE_DIR, INGEST_CACHE_MAX_BYTES
+)
 
-# Export imports
+# Columnar storage for the ingestion cache
 try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-    from reportlab.lib.units import inch
-    REPORTLAB_AVAILABLE = True
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
 except:
-    REPORTLAB_AVAILABLE = False
-
-import xlsxwriter
+    PARQUET_AVAILABLE = False
 
 # Load environment variables
 load_dotenv()
@@ -268,24 +277,87 @@ def inject_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
-st.set_page_config(
-    page_title="Autonomous BI Suite Pro",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-inject_custom_css()
-
 # Configure Groq API
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
-if GROQ_API_KEY:
-    client = OpenAI(
+
+@st.cache_resource(show_spinner=False)
+def get_ai_client():
+    """Create the Groq client on first use; the OpenAI SDK is only imported when AI features run."""
+    if not GROQ_API_KEY:
+        return None
+    return lazy_import('openai').OpenAI(
         api_key=GROQ_API_KEY,
         base_url="https://api.groq.com/openai/v1"
     )
-else:
-    client = None
+
+AI_MODEL = "llama-3.3-70b-versatile"
+
+# Local cache locations (the root, ingested data and fitted models are shared with the command line)
+EXPORT_DIR = os.path.join(CACHE_ROOT, "exports")
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("BI_EXPORT_CACHE_MAX_MB", "1024")) * 1024 * 1024
+EXPORT_FORMAT_VERSION = 1
+FIGURE_CACHE_MAX_BYTES = int(os.getenv("BI_FIGURE_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+# Streaming ingestion settings
+STREAMING_CHUNK_ROWS = int(os.getenv("BI_STREAMING_CHUNK_ROWS", "200000"))
+STREAMING_SAMPLE_ROWS = 10000
+STREAMING_AUTO_MB = int(os.getenv("BI_STREAMING_AUTO_MB", "200"))
+MEDIAN_RESERVOIR_SIZE = 100000
+MODE_SKETCH_SIZE = 10000
+# Second hash key for streaming dedupe; with pandas' default key every row gets a 128-bit fingerprint
+STREAM_DEDUPE_HASH_KEY = 'bi-stream-dedupe'
+
+# Filter engine settings
+FILTER_RESULT_CACHE_SIZE = 8
+
+# Period comparison settings
+CALENDAR_PERIODS = {'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+CALENDAR_PERIOD_MONTHS = {'month': 1, 'quarter': 3, 'year': 12}
+ROLLING_WINDOW_DAYS = {'week': 7, 'month': 30, 'quarter': 91, 'year': 365}
+
+# Out-of-core customer analytics over partitioned Parquet directories
+OUT_OF_CORE_WORKERS = int(os.getenv('BI_OUT_OF_CORE_WORKERS', min(4, os.cpu_count() or 1)))
+OUT_OF_CORE_ANALYSES = ["RFM Analysis", "Customer Lifetime Value", "Cohort Analysis"]
+
+# Cohort analysis options
+COHORT_FREQUENCIES = {'Monthly': 'month', 'Weekly': 'week', 'Quarterly': 'quarter'}
+RETENTION_METRICS = {'Customer': 'customers', 'Revenue': 'revenue'}
+
+# Background forecast jobs: one worker process per core, so batch series fit in parallel
+FORECAST_WORKERS = int(os.getenv('BI_FORECAST_WORKERS', os.cpu_count() or 1))
+FORECAST_STORE_SIZE = 128
+FORECAST_POLL_SECONDS = 1
+BATCH_FORECAST_MAX_SERIES = 50
+BATCH_FORECAST_TIMEOUT = float(os.getenv('BI_BATCH_FORECAST_TIMEOUT', 60))
+BATCH_FORECAST_HISTORY_DAYS = 90
+
+# Trend chart bins; markers are drawn only on short series
+CHART_RESOLUTIONS = {'Auto': 'auto', 'Day': 'day', 'Week': 'week', 'Month': 'month'}
+CHART_RESOLUTION_LABELS = {'day': 'Daily', 'week': 'Weekly', 'month': 'Monthly'}
+CHART_MARKER_POINTS = 60
+
+# Ranked charts and tables: default and allowed number of entries, label for the remainder
+TOP_K_DEFAULT = int(os.getenv("BI_TOP_K", "10"))
+TOP_K_MIN = 3
+TOP_K_MAX = 50
+TOP_K_OTHER_LABEL = 'Other'
+CLV_TABLE_ROWS = 20
+
+# Filtered data download formats
+DATA_EXPORT_FORMATS = {'CSV': 'csv', 'CSV (gzip)': 'csv.gz', 'CSV (zstd)': 'csv.zst', 'Parquet': 'parquet'}
+FORECAST_ENGINES = {'Prophet': 'prophet', 'Holt-Winters': 'holt_winters', 'Fourier Ridge': 'fourier_ridge'}
+FORECAST_METHOD_LABELS = {
+    'prophet': 'Prophet Model',
+    'holt_winters': 'Holt-Winters',
+    'fourier_ridge': 'Fourier Ridge',
+    'moving_average': 'Moving Average'
+}
+MODEL_SOURCE_LABELS = {
+    'memory': ' (fitted model reused)',
+    'stored': ' (loaded from model store)',
+    'warm': ' (warm-started from the previous fit)',
+    'cold': ''
+}
 
 # ============================================================================
 # SAMPLE DATA GENERATION
@@ -325,39 +397,37 @@ def generate_sample_data() -> pd.DataFrame:
 # DATA PROCESSING PIPELINE (Enhanced)
 # ============================================================================
 
-def process_data(uploaded_file) -> pd.DataFrame:
+def process_data(uploaded_file, streaming: bool = False) -> pd.DataFrame:
     """Process uploaded data with AI-powered normalization."""
+    # A report from the previous upload must not outlive it, whichever path loads this one
+    st.session_state.type_inference_report = None
+    if streaming and uploaded_file.name.endswith('.csv') and PARQUET_AVAILABLE:
+        return process_csv_streaming(uploaded_file)
+
+    if not uploaded_file.name.endswith(('.csv', '.xlsx', '.xls')):
+        st.error("Unsupported file format. Please upload CSV or Excel files.")
+        return None
+
     try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(uploaded_file)
-        else:
-            st.error("Unsupported file format. Please upload CSV or Excel files.")
-            return None
-        
-        df = handle_duplicate_columns(df)
-        original_rows = len(df)
-        df = df.drop_duplicates()
-        duplicates_removed = original_rows - len(df)
-        
-        if GROQ_API_KEY:
-            df = normalize_columns_with_ai(df)
-        else:
-            df.columns = [col.strip().title().replace('_', ' ') for col in df.columns]
-        
-        df = auto_detect_dates(df)
-        df = handle_missing_values(df)
-        
-        if duplicates_removed > 0:
-            show_toast(f"✓ Removed {duplicates_removed} duplicate rows", "success")
-        
-        return df
+        # The same pipeline and cache serve the command line, so both see identical cleaned data
+        result = ingest_file(uploaded_file, uploaded_file.name,
+                             normalize_columns_with_ai if GROQ_API_KEY else None, get_ingest_ai_model())
+        st.session_state.type_inference_report = result['type_report']
+        if result['cached']:
+            show_toast("⚡ Loaded cleaned data from cache", "info")
+        elif result['duplicates_removed'] > 0:
+            show_toast(f"✓ Removed {result['duplicates_removed']} duplicate rows", "success")
+
+        return result['df']
         
     except Exception as e:
         st.error(f"Error processing data: {str(e)}")
         return None
 
+def get_ingest_ai_model() -> Optional[str]:
+    """Name the AI model that normalizes column names, or None when AI normalization is off."""
+    return AI_MODEL if GROQ_API_KEY else None
+
 def normalize_columns_with_ai(df: pd.DataFrame) -> pd.DataFrame:
     """Use AI to normalize column names to professional business terms."""
     try:
@@ -382,8 +452,8 @@ CRITICAL RULES:
 Return ONLY a JSON object mapping old names to new names:
 {{"old_name": "New Name", ...}}"""
 
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        response = get_ai_client().chat.completions.create(
+            model=AI_MODEL,
             messages=[
                 {"role": "system", "content": "You are a data normalization expert. Always respond with valid JSON only."},
                 {"role": "user", "content": prompt}
@@ -419,57 +489,229 @@ Return ONLY a JSON object mapping old names to new names:
         
     except Exception as e:
         st.warning(f"⚠️ AI normalization failed: {str(e)[:100]}")
-        df.columns = [col.strip().title().replace('_', ' ') for col in df.columns]
+        df.columns = [normalize_column_name(col) for col in df.columns]
         df = handle_duplicate_columns(df)
     
     return df
 
-def handle_duplicate_columns(df: pd.DataFrame) -> pd.DataFrame:
-    """Ensure all column names are unique by appending numbers to duplicates."""
-    cols = pd.Series(df.columns)
-    for dup in cols[cols.duplicated()].unique():
-        dup_positions = [i for i, col in enumerate(df.columns) if col == dup]
-        for idx, pos in enumerate(dup_positions[1:], start=2):
-            df.columns.values[pos] = f"{dup} {idx}"
-    return df
+STREAM_STAGING_TYPES = {
+    'datetime': pa.timestamp('ns'),
+    'bool': pa.bool_(),
+    'int': pa.float64(),
+    'float': pa.float64(),
+    'text': pa.string(),
+} if PARQUET_AVAILABLE else {}
 
-def auto_detect_dates(df: pd.DataFrame) -> pd.DataFrame:
-    """Auto-detect and convert date columns."""
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            try:
-                parsed = pd.to_datetime(df[col], errors='coerce')
-                if parsed.notna().sum() / len(df) > 0.5:
-                    df[col] = parsed
-            except:
-                pass
-    return df
+def hash_stream_rows(chunk: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Fingerprint each row with two independent 64-bit hashes."""
+    return (pd.util.hash_pandas_object(chunk, index=False).to_numpy(),
+            pd.util.hash_pandas_object(chunk, index=False, hash_key=STREAM_DEDUPE_HASH_KEY).to_numpy())
 
-def handle_missing_values(df: pd.DataFrame) -> pd.DataFrame:
-    """Intelligently handle missing values based on column type."""
-    for col in df.columns:
-        if df[col].isnull().any():
-            if pd.api.types.is_numeric_dtype(df[col]):
-                df[col] = df[col].fillna(df[col].median())
-            elif pd.api.types.is_datetime64_any_dtype(df[col]):
-                df[col] = df[col].fillna(method='ffill')
-            else:
-                mode_val = df[col].mode()
-                if len(mode_val) > 0:
-                    df[col] = df[col].fillna(mode_val[0])
-                else:
-                    df[col] = df[col].fillna('Unknown')
-    
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            try:
-                numeric_converted = pd.to_numeric(df[col], errors='coerce')
-                if numeric_converted.notna().sum() / len(df) > 0.8:
-                    df[col] = numeric_converted
-            except:
-                pass
-    
-    return df
+def find_seen_rows(runs: List[Tuple[np.ndarray, np.ndarray]], first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Flag rows whose hash pair appears in one of the sorted runs kept from earlier chunks."""
+    seen = np.zeros(len(first), dtype=bool)
+    for run_first, run_second in runs:
+        left = np.searchsorted(run_first, first, side='left')
+        right = np.searchsorted(run_first, first, side='right')
+        single = right - left == 1
+        seen[single] |= run_second[left[single]] == second[single]
+        # Distinct rows sharing the first hash are vanishingly rare, so they are checked one at a time
+        for row in np.flatnonzero(right - left > 1):
+            seen[row] |= bool(np.any(run_second[left[row]:right[row]] == second[row]))
+    return seen
+
+def add_hash_run(runs: List[Tuple[np.ndarray, np.ndarray]], first: np.ndarray, second: np.ndarray):
+    """Keep a chunk's hash pairs as a sorted run, merging runs of equal size so each hash is copied O(log n) times."""
+    order = np.lexsort((second, first))
+    runs.append((first[order], second[order]))
+    while len(runs) > 1 and len(runs[-2][0]) <= len(runs[-1][0]):
+        (newer_first, newer_second), (older_first, older_second) = runs.pop(), runs.pop()
+        first, second = np.concatenate([older_first, newer_first]), np.concatenate([older_second, newer_second])
+        order = np.lexsort((second, first))
+        runs.append((first[order], second[order]))
+
+def process_csv_streaming(uploaded_file) -> pd.DataFrame:
+    """Parse, dedupe and impute a large CSV in chunks; only the cleaned result is loaded into memory at the end."""
+    try:
+        cache_key = get_ingest_cache_key(uploaded_file, uploaded_file.name, 'streaming', get_ingest_ai_model())
+        cached = load_ingest_cache(cache_key)
+        if cached is not None:
+            cached_df, st.session_state.type_inference_report = cached
+            show_toast("⚡ Loaded cleaned data from cache", "info")
+            return cached_df
+
+        # Column names and kinds come from a leading sample
+        sample = pd.read_csv(uploaded_file, nrows=STREAMING_SAMPLE_ROWS)
+        uploaded_file.seek(0)
+        sample = handle_duplicate_columns(sample)
+        if GROQ_API_KEY:
+            sample = normalize_columns_with_ai(sample)
+        else:
+            sample.columns = [normalize_column_name(col) for col in sample.columns]
+
+        columns = list(sample.columns)
+        kinds, date_formats = infer_streaming_schema(sample)
+        sketches = {col: {'kind': kinds[col], 'nulls': 0, 'seen': 0, 'integral': True,
+                          'reservoir': np.empty(0), 'counts': pd.Series(dtype='float64')}
+                    for col in columns}
+
+        os.makedirs(INGEST_CACHE_DIR, exist_ok=True)
+        cache_path = get_ingest_cache_path(cache_key)
+        staging_path = f"{cache_path}.{os.getpid()}.stage.tmp"
+        output_path = f"{cache_path}.{os.getpid()}.tmp"
+
+        # Pass 1: parse, type, dedupe and sketch each chunk, staging it to Parquet
+        staging_schema = pa.schema([(col, STREAM_STAGING_TYPES[kinds[col]]) for col in columns])
+        hash_runs = []
+        rng = np.random.default_rng(42)
+        total_rows = kept_rows = 0
+
+        with pq.ParquetWriter(staging_path, staging_schema, compression='zstd') as writer:
+            for chunk in pd.read_csv(uploaded_file, chunksize=STREAMING_CHUNK_ROWS):
+                chunk.columns = columns
+                chunk = coerce_stream_chunk(chunk, kinds, date_formats)
+                total_rows += len(chunk)
+
+                # Rows repeated within the chunk are compared in full; rows seen in earlier chunks
+                # by a 128-bit hash pair, since those rows are no longer in memory
+                first_hash, second_hash = hash_stream_rows(chunk)
+                is_new = ~chunk.duplicated().to_numpy() & ~find_seen_rows(hash_runs, first_hash, second_hash)
+                chunk = chunk[is_new]
+                kept_rows += len(chunk)
+                add_hash_run(hash_runs, first_hash[is_new], second_hash[is_new])
+
+                for col in columns:
+                    update_column_sketch(sketches[col], chunk[col], rng)
+
+                writer.write_table(pa.Table.from_pandas(chunk, schema=staging_schema, preserve_index=False))
+
+        duplicates_removed = total_rows - kept_rows
+        del hash_runs
+
+        # Pass 2: impute from the sketches and write the final store
+        fill_values = {col: get_sketch_fill_value(sketches[col]) for col in columns}
+        final_schema = pa.schema([(col, get_final_stream_type(sketches[col])) for col in columns],
+                                 metadata=type_report_metadata(st.session_state.get('type_inference_report')))
+        last_valid_dates = {}
+
+        with pq.ParquetWriter(output_path, final_schema, compression='zstd') as writer:
+            for batch in pq.ParquetFile(staging_path).iter_batches(batch_size=STREAMING_CHUNK_ROWS):
+                chunk = batch.to_pandas()
+                for col in columns:
+                    if kinds[col] == 'datetime':
+                        if col in last_valid_dates:
+                            chunk[col] = chunk[col].fillna(last_valid_dates[col])
+                        chunk[col] = chunk[col].ffill()
+                        valid = chunk[col].dropna()
+                        if len(valid) > 0:
+                            last_valid_dates[col] = valid.iloc[-1]
+                    elif fill_values[col] is not None and sketches[col]['nulls'] > 0:
+                        chunk[col] = chunk[col].fillna(fill_values[col])
+                writer.write_table(pa.Table.from_pandas(chunk, schema=final_schema, preserve_index=False))
+
+        os.remove(staging_path)
+        os.replace(output_path, cache_path)
+        evict_cache_dir(INGEST_CACHE_DIR, INGEST_CACHE_MAX_BYTES)
+
+        if duplicates_removed > 0:
+            show_toast(f"✓ Removed {duplicates_removed} duplicate rows", "success")
+
+        return pd.read_parquet(cache_path)
+
+    except Exception as e:
+        for path in [locals().get('staging_path'), locals().get('output_path')]:
+            if path and os.path.exists(path):
+                os.remove(path)
+        st.error(f"Error processing data: {str(e)}")
+        return None
+
+def infer_streaming_schema(sample: pd.DataFrame) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Infer each column's kind (datetime/bool/int/float/text) and date format from a leading sample."""
+    sample, type_report = infer_column_types(sample.copy())
+    st.session_state.type_inference_report = type_report
+    date_formats = {
+        row['Column']: row['Format']
+        for _, row in type_report.iterrows()
+        if row['Format'] and pd.api.types.is_datetime64_any_dtype(sample[row['Column']])
+    }
+
+    kinds = {}
+    for col in sample.columns:
+        series = sample[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            kinds[col] = 'datetime'
+        elif pd.api.types.is_bool_dtype(series):
+            kinds[col] = 'bool'
+        elif pd.api.types.is_integer_dtype(series):
+            kinds[col] = 'int'
+        elif pd.api.types.is_numeric_dtype(series):
+            kinds[col] = 'float'
+        else:
+            kinds[col] = 'text'
+    return kinds, date_formats
+
+def coerce_stream_chunk(chunk: pd.DataFrame, kinds: Dict[str, str], date_formats: Dict[str, str]) -> pd.DataFrame:
+    """Convert a raw CSV chunk to the column kinds inferred from the sample."""
+    for col, kind in kinds.items():
+        series = chunk[col]
+        if kind == 'datetime':
+            chunk[col] = pd.to_datetime(series, errors='coerce', format=date_formats.get(col))
+        elif kind in ('int', 'float'):
+            chunk[col] = pd.to_numeric(series, errors='coerce').astype('float64')
+        elif kind == 'bool':
+            chunk[col] = series.astype(str).str.lower().map({'true': True, 'false': False}).astype('boolean')
+        else:
+            chunk[col] = series.where(series.isna(), series.astype(str))
+    return chunk
+
+def update_column_sketch(sketch: Dict[str, Any], series: pd.Series, rng: np.random.Generator):
+    """Fold a chunk into a column sketch: null count, median reservoir or mode counts."""
+    sketch['nulls'] += int(series.isna().sum())
+    kind = sketch['kind']
+
+    if kind in ('int', 'float'):
+        values = series.dropna().to_numpy(dtype='float64')
+        if kind == 'int' and sketch['integral']:
+            sketch['integral'] = bool(np.all(np.mod(values, 1) == 0))
+
+        # Reservoir sampling (Algorithm R) for an approximate median
+        reservoir = sketch['reservoir']
+        space = MEDIAN_RESERVOIR_SIZE - len(reservoir)
+        if space > 0:
+            reservoir = np.concatenate([reservoir, values[:space]])
+            sketch['seen'] += len(values[:space])
+            values = values[space:]
+        if len(values) > 0:
+            positions = rng.integers(0, sketch['seen'] + np.arange(1, len(values) + 1))
+            keep = positions < MEDIAN_RESERVOIR_SIZE
+            reservoir[positions[keep]] = values[keep]
+            sketch['seen'] += len(values)
+        sketch['reservoir'] = reservoir
+
+    elif kind in ('text', 'bool'):
+        # Heavy-hitter counts for the mode, trimmed to stay bounded on high-cardinality columns
+        counts = sketch['counts'].add(series.value_counts(), fill_value=0)
+        if len(counts) > MODE_SKETCH_SIZE:
+            counts = counts.nlargest(MODE_SKETCH_SIZE // 2)
+        sketch['counts'] = counts
+
+def get_sketch_fill_value(sketch: Dict[str, Any]) -> Any:
+    """Return the imputation value handle_missing_values would use, estimated from a sketch."""
+    kind = sketch['kind']
+    if kind in ('int', 'float'):
+        return float(np.median(sketch['reservoir'])) if len(sketch['reservoir']) > 0 else None
+    if kind in ('text', 'bool'):
+        if len(sketch['counts']) > 0:
+            return sketch['counts'].idxmax()
+        return 'Unknown' if kind == 'text' else None
+    return None
+
+def get_final_stream_type(sketch: Dict[str, Any]):
+    """Pick the Arrow type for the final store once all chunks have been seen."""
+    kind = sketch['kind']
+    if kind == 'int' and sketch['nulls'] == 0 and sketch['integral']:
+        return pa.int64()
+    return STREAM_STAGING_TYPES[kind]
 
 # ============================================================================
 # UTILITY FUNCTIONS
@@ -499,20 +741,129 @@ def show_toast(message: str, type: str = "info"):
     </script>
     """, unsafe_allow_html=True)
 
-def detect_column_type(df: pd.DataFrame, keywords: list) -> Optional[str]:
-    """Detect column by keyword matching and validate data type."""
-    candidates = []
-    for col in df.columns:
-        col_lower = col.lower()
-        if any(keyword in col_lower for keyword in keywords):
-            candidates.append(col)
-    
-    if keywords and any(k in ['revenue', 'amount', 'sales', 'price', 'value', 'total', 'profit'] for k in keywords):
-        numeric_candidates = [c for c in candidates if pd.api.types.is_numeric_dtype(df[c])]
-        if numeric_candidates:
-            return numeric_candidates[0]
-    
-    return candidates[0] if candidates else None
+@st.cache_data(max_entries=32, show_spinner=False)
+def resolve_column_roles(schema: Tuple[Tuple[str, str], ...]) -> Dict[str, Optional[str]]:
+    """Resolve every column role once per schema by keyword priority and data type."""
+    return resolve_schema_roles(schema)
+
+def get_column_roles(df: pd.DataFrame, apply_overrides: bool = True) -> Dict[str, Optional[str]]:
+    """Return the shared column-role schema, including the sidebar column mapping."""
+    roles = dict(resolve_column_roles(get_schema_fingerprint(df)))
+
+    if apply_overrides:
+        numeric_col = st.session_state.get('numeric_col')
+        if numeric_col and numeric_col != 'None' and numeric_col in df.columns:
+            roles['value'] = numeric_col
+        category_col = st.session_state.get('category_col')
+        if category_col and category_col != 'None' and category_col in df.columns:
+            roles['category'] = category_col
+
+    return roles
+
+def lru_get(cache: OrderedDict, key: Any) -> Any:
+    """Fetch an entry from an LRU dict and mark it as recently used."""
+    if key not in cache:
+        return None
+    cache.move_to_end(key)
+    return cache[key]
+
+def lru_put(cache: OrderedDict, key: Any, value: Any, max_entries: int):
+    """Store an entry in an LRU dict, evicting the oldest entries beyond max_entries."""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_entries:
+        cache.popitem(last=False)
+
+def compute_dataset_fingerprint(df: pd.DataFrame) -> str:
+    """Hash the full contents of a loaded dataset; computed once per load."""
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([str(col) for col in df.columns]).encode())
+    hasher.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return hasher.hexdigest()
+
+# ============================================================================
+# FILTER ENGINE
+# ============================================================================
+
+def build_filter_engine(df: pd.DataFrame, date_col: Optional[str], category_col: Optional[str]) -> Dict[str, Any]:
+    """Sort by date and index the category column once so filters resolve to row slices."""
+    has_dates = date_col is not None and pd.api.types.is_datetime64_any_dtype(df[date_col])
+
+    base = df
+    if has_dates and not df[date_col].is_monotonic_increasing:
+        base = df.sort_values(date_col, kind='stable', na_position='last').reset_index(drop=True)
+
+    engine = {
+        'base': base,
+        'date_col': date_col if has_dates else None,
+        'category_col': category_col,
+        'results': OrderedDict(),
+    }
+
+    if has_dates:
+        # NaT rows are sorted last and never match a date range
+        valid_dates = base[date_col].dropna()
+        engine['day_index'] = valid_dates.to_numpy().astype('datetime64[D]')
+        engine['min_date'] = valid_dates.iloc[0].date() if len(valid_dates) else None
+        engine['max_date'] = valid_dates.iloc[-1].date() if len(valid_dates) else None
+
+    if category_col:
+        try:
+            codes, categories = pd.factorize(base[category_col], sort=True)
+        except TypeError:
+            codes, categories = pd.factorize(base[category_col])
+        # Row positions grouped by category code, each group in ascending (date) order
+        engine['category_rows'] = np.argsort(codes, kind='stable')
+        engine['category_offsets'] = np.searchsorted(codes[engine['category_rows']], np.arange(len(categories) + 1))
+        engine['categories'] = categories.tolist()
+        engine['category_codes'] = {value: code for code, value in enumerate(engine['categories'])}
+
+    return engine
+
+def apply_filters(engine: Dict[str, Any], date_range: Optional[Tuple] = None, category: Any = 'All') -> pd.DataFrame:
+    """Resolve a filter state to a row selection of the base frame, reusing recent results."""
+    cache_key = (tuple(date_range) if date_range else None, category)
+    cached = lru_get(engine['results'], cache_key)
+    if cached is not None:
+        return cached
+
+    base = engine['base']
+    start, stop = 0, len(base)
+
+    if engine['date_col'] and date_range and len(date_range) == 2:
+        day_index = engine['day_index']
+        start = int(np.searchsorted(day_index, np.datetime64(date_range[0], 'D'), side='left'))
+        stop = int(np.searchsorted(day_index, np.datetime64(date_range[1], 'D'), side='right'))
+
+    if engine['category_col'] and category != 'All':
+        # A category missing from this data (e.g. a saved filter from another dataset) matches no rows,
+        # the same answer the KPI cube gives
+        code = engine['category_codes'].get(category)
+        if code is None:
+            result = base.iloc[0:0]
+        else:
+            offsets = engine['category_offsets']
+            rows = engine['category_rows'][offsets[code]:offsets[code + 1]]
+            rows = rows[np.searchsorted(rows, start):np.searchsorted(rows, stop)]
+            result = base.iloc[rows]
+    else:
+        # Positional slices share the base frame's data instead of copying it
+        result = base.iloc[start:stop]
+
+    lru_put(engine['results'], cache_key, result, FILTER_RESULT_CACHE_SIZE)
+    return result
+
+def get_filter_engine(date_col: Optional[str], category_col: Optional[str]) -> Dict[str, Any]:
+    """Return the session's filter engine, rebuilding it when the dataset or columns change."""
+    engine_key = (st.session_state.get('dataset_fingerprint'), date_col, category_col)
+    engine = st.session_state.get('filter_engine')
+    if engine is None or engine['key'] != engine_key:
+        engine = build_filter_engine(st.session_state.original_df, date_col, category_col)
+        engine['key'] = engine_key
+        st.session_state.filter_engine = engine
+        # Keep a single date-sorted copy of the data
+        st.session_state.original_df = engine['base']
+    return engine
 
 # ============================================================================
 # KPI CALCULATION FUNCTIONS (Enhanced)
@@ -520,122 +871,245 @@ def detect_column_type(df: pd.DataFrame, keywords: list) -> Optional[str]:
 
 def calculate_kpis(df: pd.DataFrame) -> Dict[str, Any]:
     """Calculate KPIs from the dataframe - works with any dataset type."""
+    return compute_kpis(df, get_column_roles(df))
+
+def build_kpi_cube(df: pd.DataFrame, roles: Dict[str, Optional[str]]) -> Optional[Dict[str, Any]]:
+    """Pre-aggregate day x category cells so KPIs for any filter merge cells instead of rows."""
+    date_col, category_col = roles['date'], roles['category']
+    value_col, profit_col, entity_col = roles['value'], roles['profit'], roles['entity']
+
+    if not date_col or not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        return None
+
+    valid = df[date_col].notna().to_numpy()
+    days = df[date_col].to_numpy()[valid].astype('datetime64[D]').astype(np.int64)
+
+    if category_col:
+        category_codes, categories = pd.factorize(df[category_col].to_numpy()[valid])
+    else:
+        category_codes, categories = np.zeros(len(days), dtype=np.int64), []
+    n_categories = len(categories) + 1
+    # Missing categories (code -1) get their own slot so row counts stay exact
+    category_codes = np.where(category_codes < 0, len(categories), category_codes)
+
+    cell_ids, cells = pd.factorize((days - days.min()) * n_categories + category_codes if len(days) else days)
+    n_cells = len(cells)
+
+    def cell_sum(column: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        if not column or not pd.api.types.is_numeric_dtype(df[column]):
+            return np.zeros(n_cells), np.zeros(n_cells)
+        values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype='float64')[valid]
+        present = ~np.isnan(values)
+        sums = np.bincount(cell_ids, weights=np.where(present, values, 0.0), minlength=n_cells)
+        counts = np.bincount(cell_ids, weights=present, minlength=n_cells)
+        return sums, counts
+
+    cube = {
+        'roles': dict(roles),
+        'cell_day': days.min() + cells // n_categories if n_cells else cells,
+        'cell_category': cells % n_categories,
+        'cell_rows': np.bincount(cell_ids, minlength=n_cells),
+        'category_codes': {value: code for code, value in enumerate(categories)},
+        'value_numeric': bool(value_col) and pd.api.types.is_numeric_dtype(df[value_col]),
+        'profit_numeric': bool(profit_col) and pd.api.types.is_numeric_dtype(df[profit_col]),
+    }
+    cube['value_sum'], cube['value_count'] = cell_sum(value_col)
+    cube['profit_sum'], _ = cell_sum(profit_col)
+
+    if entity_col:
+        # Exact distinct (cell, entity) pairs stand in for a per-day entity bitmap
+        entity_codes, entities = pd.factorize(df[entity_col].to_numpy()[valid])
+        present = entity_codes >= 0
+        n_entities = max(len(entities), 1)
+        pairs = pd.unique(cell_ids[present].astype(np.int64) * n_entities + entity_codes[present])
+        cube['pair_cell'], cube['pair_entity'] = pairs // n_entities, pairs % n_entities
+        cube['n_entities'] = n_entities
+
+    return cube
+
+def select_cube_cells(cube: Dict[str, Any], date_range: Tuple, category: Any = 'All') -> np.ndarray:
+    """Return a boolean mask of the cube cells inside a date range and category filter."""
+    start_day = np.datetime64(date_range[0], 'D').astype(np.int64)
+    end_day = np.datetime64(date_range[1], 'D').astype(np.int64)
+    selected = (cube['cell_day'] >= start_day) & (cube['cell_day'] <= end_day)
+    if category != 'All':
+        selected &= cube['cell_category'] == cube['category_codes'].get(category, -1)
+    return selected
+
+def cube_daily_series(cube: Dict[str, Any], date_range: Tuple, category: Any = 'All') -> pd.Series:
+    """Collapse the selected cube cells into a gap-free daily value series."""
+    selected = select_cube_cells(cube, date_range, category)
+    days = cube['cell_day'][selected]
+    if len(days) == 0 or not cube['value_numeric']:
+        return pd.Series(dtype='float64')
+
+    first_day = days.min()
+    sums = np.bincount(days - first_day, weights=cube['value_sum'][selected])
+    index = pd.date_range(pd.Timestamp(np.datetime64(int(first_day), 'D')), periods=len(sums), freq='D')
+    return pd.Series(sums, index=index)
+
+def query_kpi_cube(cube: Dict[str, Any], date_range: Tuple, category: Any = 'All') -> Dict[str, Any]:
+    """Answer calculate_kpis for a date range and category by merging cube cells."""
+    roles = cube['roles']
     kpis = {
         'total_value': 0,
         'avg_value': 0,
         'growth_percent': 0,
         'total_profit': 0,
         'profit_margin': 0,
-        'total_records': len(df),
+        'total_records': 0,
         'unique_entities': 0,
         'value_label': 'Value',
         'entity_label': 'Entities'
     }
-    
-    # Use user-selected column or auto-detect
-    if hasattr(st.session_state, 'numeric_col') and st.session_state.numeric_col and st.session_state.numeric_col != 'None':
-        value_col = st.session_state.numeric_col
-    else:
-        value_col = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total', 'runs', 'score', 'salary', 'rating', 'points', 'goals'])
-    
-    # Detect entity column (customer, player, employee, etc.)
-    entity_col = detect_column_type(df, ['customer', 'client', 'user', 'player', 'employee', 'person', 'name', 'id'])
-    
-    if value_col and pd.api.types.is_numeric_dtype(df[value_col]):
-        try:
-            numeric_data = pd.to_numeric(df[value_col], errors='coerce')
-            kpis['total_value'] = numeric_data.sum()
-            kpis['avg_value'] = numeric_data.mean()
-            kpis['value_label'] = value_col
-        except:
-            pass
-    
-    # Try to find profit column
-    profit_col = detect_column_type(df, ['profit', 'margin', 'earnings', 'wickets', 'assists'])
-    if profit_col and pd.api.types.is_numeric_dtype(df[profit_col]):
-        try:
-            profit_data = pd.to_numeric(df[profit_col], errors='coerce')
-            kpis['total_profit'] = profit_data.sum()
-            if kpis['total_value'] > 0:
-                kpis['profit_margin'] = (kpis['total_profit'] / kpis['total_value']) * 100
-        except:
-            pass
-    
-    if entity_col:
-        kpis['unique_entities'] = df[entity_col].nunique()
-        kpis['entity_label'] = entity_col
-    
-    # Calculate growth
-    date_col = detect_column_type(df, ['date', 'time', 'timestamp', 'created', 'year'])
-    if date_col and value_col:
-        try:
-            # Check if it's already datetime
-            if pd.api.types.is_datetime64_any_dtype(df[date_col]):
-                df_sorted = df.sort_values(date_col)
-            elif pd.api.types.is_numeric_dtype(df[date_col]):
-                # If numeric (like year), sort by it
-                df_sorted = df.sort_values(date_col)
-            else:
-                # Try to convert to datetime
-                df_sorted = df.copy()
-                df_sorted[date_col] = pd.to_datetime(df_sorted[date_col], errors='coerce')
-                df_sorted = df_sorted.sort_values(date_col)
-            
-            mid_point = len(df_sorted) // 2
-            numeric_data = pd.to_numeric(df_sorted[value_col], errors='coerce')
-            first_half = numeric_data.iloc[:mid_point].sum()
-            second_half = numeric_data.iloc[mid_point:].sum()
-            
+
+    selected = select_cube_cells(cube, date_range, category)
+    rows = cube['cell_rows'][selected]
+    kpis['total_records'] = int(rows.sum())
+
+    if cube['value_numeric']:
+        value_sum = cube['value_sum'][selected]
+        value_count = cube['value_count'][selected].sum()
+        kpis['total_value'] = value_sum.sum()
+        kpis['avg_value'] = kpis['total_value'] / value_count if value_count else np.nan
+        kpis['value_label'] = roles['value']
+
+        # Growth: second half of the rows (in date order) vs the first half
+        days = cube['cell_day'][selected]
+        if len(days) > 0:
+            day_offsets = days - days.min()
+            day_rows = np.bincount(day_offsets, weights=rows)
+            day_values = np.bincount(day_offsets, weights=value_sum)
+            mid_point = kpis['total_records'] // 2
+            cumulative_rows = np.cumsum(day_rows)
+            mid_day = int(np.searchsorted(cumulative_rows, mid_point, side='right'))
+            first_half = day_values[:mid_day].sum()
+            if mid_day < len(day_rows) and day_rows[mid_day] > 0:
+                # Split the boundary day pro rata, as rows within a day have no order
+                rows_before = cumulative_rows[mid_day - 1] if mid_day > 0 else 0
+                first_half += day_values[mid_day] * (mid_point - rows_before) / day_rows[mid_day]
+            second_half = kpis['total_value'] - first_half
             if first_half > 0:
                 kpis['growth_percent'] = ((second_half - first_half) / first_half) * 100
-        except:
-            pass
-    
+
+    if cube['profit_numeric']:
+        kpis['total_profit'] = cube['profit_sum'][selected].sum()
+        if kpis['total_value'] > 0:
+            kpis['profit_margin'] = (kpis['total_profit'] / kpis['total_value']) * 100
+
+    if 'pair_cell' in cube:
+        entities = cube['pair_entity'][selected[cube['pair_cell']]]
+        kpis['unique_entities'] = int(np.count_nonzero(np.bincount(entities, minlength=cube['n_entities'])))
+        kpis['entity_label'] = roles['entity']
+
     return kpis
 
-def calculate_period_comparison(df: pd.DataFrame, period: str = 'month') -> Dict[str, Any]:
-    """Calculate period-over-period comparisons (YoY, MoM, etc.)."""
-    date_col = detect_column_type(df, ['date', 'time', 'timestamp', 'created'])
-    revenue_col = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total'])
-    
+def get_dashboard_kpis(df: pd.DataFrame) -> Dict[str, Any]:
+    """Serve KPIs from the session's cube when the filter state allows it, else from rows."""
+    engine = st.session_state.get('filter_engine')
+    filter_key = st.session_state.get('filter_key')
+    if engine is None or filter_key is None or not filter_key[2]:
+        return calculate_kpis(df)
+
+    _, date_col, date_range, category_col, category = filter_key
+    roles = get_column_roles(df)
+    if len(date_range) != 2 or roles['date'] != date_col or roles['category'] != category_col:
+        return calculate_kpis(df)
+
+    cube_key = (st.session_state.get('dataset_fingerprint'), tuple(sorted(roles.items(), key=lambda item: item[0])))
+    cube_entry = st.session_state.get('kpi_cube')
+    if cube_entry is None or cube_entry[0] != cube_key:
+        cube_entry = (cube_key, build_kpi_cube(engine['base'], roles))
+        st.session_state.kpi_cube = cube_entry
+
+    cube = cube_entry[1]
+    if cube is None:
+        return calculate_kpis(df)
+    return query_kpi_cube(cube, date_range, category)
+
+def build_daily_series(df: pd.DataFrame, date_col: str, value_col: str) -> pd.Series:
+    """Sum a value column per calendar day, including empty days, in one vectorized pass."""
+    valid = df[date_col].notna().to_numpy()
+    days = df[date_col].to_numpy()[valid].astype('datetime64[D]').astype(np.int64)
+    if len(days) == 0:
+        return pd.Series(dtype='float64')
+
+    values = pd.to_numeric(df[value_col], errors='coerce').to_numpy(dtype='float64')[valid]
+    first_day = days.min()
+    sums = np.bincount(days - first_day, weights=np.nan_to_num(values))
+    index = pd.date_range(pd.Timestamp(np.datetime64(int(first_day), 'D')), periods=len(sums), freq='D')
+    return pd.Series(sums, index=index)
+
+def build_period_engine(daily: pd.Series) -> Dict[str, Any]:
+    """Build prefix sums over a gap-free daily series so any window sum is two lookups."""
+    return {
+        'dates': daily.index,
+        'first_day': np.datetime64(daily.index[0].date(), 'D').astype(np.int64),
+        'prefix': np.concatenate([[0.0], np.cumsum(daily.to_numpy(dtype='float64'))]),
+    }
+
+def period_window_sum(engine: Dict[str, Any], start: pd.Timestamp, end: pd.Timestamp) -> float:
+    """Sum the daily series between two dates, inclusive."""
+    n_days = len(engine['prefix']) - 1
+    lo = int(np.clip(np.datetime64(start.date(), 'D').astype(np.int64) - engine['first_day'], 0, n_days))
+    hi = int(np.clip(np.datetime64(end.date(), 'D').astype(np.int64) - engine['first_day'] + 1, 0, n_days))
+    return float(engine['prefix'][hi] - engine['prefix'][lo]) if hi > lo else 0.0
+
+def get_comparison_windows(max_date: pd.Timestamp, period: str) -> Tuple[pd.Timestamp, pd.Timestamp, pd.Timestamp, pd.Timestamp]:
+    """Return (current start, current end, previous start, previous end) for a period choice."""
+    max_date = max_date.normalize()
+
+    if period == 'week':
+        current_start = max_date - timedelta(days=6)
+        previous_end = current_start - timedelta(days=1)
+        return current_start, max_date, previous_end - timedelta(days=6), previous_end
+
+    # Calendar periods compare period-to-date with the same dates of the previous period
+    current = max_date.to_period(CALENDAR_PERIODS[period])
+    previous = current - 1
+    current_start = current.start_time.normalize()
+    previous_start = previous.start_time.normalize()
+    previous_end = min(max_date - pd.DateOffset(months=CALENDAR_PERIOD_MONTHS[period]), previous.end_time.normalize())
+    return current_start, max_date, previous_start, previous_end
+
+def calculate_period_comparison(df: pd.DataFrame, period: str = 'month', custom_windows: Optional[Tuple] = None,
+                                engine: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Calculate period-over-period comparisons (WoW, MoM, QoQ, YoY or custom windows)."""
     comparison = {
         'current_period': 0,
         'previous_period': 0,
         'change_percent': 0,
-        'change_absolute': 0
+        'change_absolute': 0,
+        'current_window': None,
+        'previous_window': None
     }
     
-    if not date_col or not revenue_col:
-        return comparison
-    
-    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
-        return comparison
+    if engine is None:
+        roles = get_column_roles(df)
+        date_col = roles['date']
+        revenue_col = roles['value']
+        if not date_col or not revenue_col or not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+            return comparison
+        daily = build_daily_series(df, date_col, revenue_col)
+        if daily.empty:
+            return comparison
+        engine = build_period_engine(daily)
     
     try:
-        df_sorted = df.sort_values(date_col)
-        max_date = df_sorted[date_col].max()
-        
-        if period == 'month':
-            current_start = max_date - timedelta(days=30)
-            previous_start = current_start - timedelta(days=30)
-            previous_end = current_start
-        elif period == 'quarter':
-            current_start = max_date - timedelta(days=90)
-            previous_start = current_start - timedelta(days=90)
-            previous_end = current_start
-        elif period == 'year':
-            current_start = max_date - timedelta(days=365)
-            previous_start = current_start - timedelta(days=365)
-            previous_end = current_start
+        if period == 'custom' and custom_windows:
+            (current_start, current_end), (previous_start, previous_end) = [
+                (pd.Timestamp(start), pd.Timestamp(end)) for start, end in custom_windows
+            ]
+        elif period == 'week' or period in CALENDAR_PERIODS:
+            current_start, current_end, previous_start, previous_end = get_comparison_windows(engine['dates'][-1], period)
         else:
             return comparison
         
-        current_data = df_sorted[df_sorted[date_col] >= current_start]
-        previous_data = df_sorted[(df_sorted[date_col] >= previous_start) & (df_sorted[date_col] < previous_end)]
-        
-        comparison['current_period'] = pd.to_numeric(current_data[revenue_col], errors='coerce').sum()
-        comparison['previous_period'] = pd.to_numeric(previous_data[revenue_col], errors='coerce').sum()
+        comparison['current_period'] = period_window_sum(engine, current_start, current_end)
+        comparison['previous_period'] = period_window_sum(engine, previous_start, previous_end)
         comparison['change_absolute'] = comparison['current_period'] - comparison['previous_period']
+        comparison['current_window'] = (current_start.date(), current_end.date())
+        comparison['previous_window'] = (previous_start.date(), previous_end.date())
         
         if comparison['previous_period'] > 0:
             comparison['change_percent'] = (comparison['change_absolute'] / comparison['previous_period']) * 100
@@ -645,371 +1119,656 @@ def calculate_period_comparison(df: pd.DataFrame, period: str = 'month') -> Dict
     
     return comparison
 
+def calculate_rolling_comparison(engine: Dict[str, Any], window_days: int) -> pd.DataFrame:
+    """Compare each day's trailing window with the window before it, for every day at once."""
+    prefix = engine['prefix']
+    window_ends = np.arange(2 * window_days, len(prefix))
+    if len(window_ends) == 0:
+        return pd.DataFrame(columns=['Date', 'Current', 'Previous', 'Change %'])
+
+    current = prefix[window_ends] - prefix[window_ends - window_days]
+    previous = prefix[window_ends - window_days] - prefix[window_ends - 2 * window_days]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.where(previous > 0, (current - previous) / previous * 100, np.nan)
+
+    return pd.DataFrame({
+        'Date': engine['dates'][window_ends - 1],
+        'Current': current,
+        'Previous': previous,
+        'Change %': change
+    })
+
+def get_dashboard_period_engine(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    """Return the prefix-sum engine for the current filter state, built at most once per state."""
+    roles = get_column_roles(df)
+    date_col, value_col = roles['date'], roles['value']
+    if not date_col or not value_col or not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        return None
+
+    engines = st.session_state.setdefault('period_engines', OrderedDict())
+    engine_key = (st.session_state.get('filter_key'), date_col, value_col)
+    engine = lru_get(engines, engine_key)
+    if engine is None:
+        daily = None
+        filter_key = st.session_state.get('filter_key')
+        cube_entry = st.session_state.get('kpi_cube')
+        cube_key = (st.session_state.get('dataset_fingerprint'), tuple(sorted(roles.items(), key=lambda item: item[0])))
+        if filter_key is not None and filter_key[2] and len(filter_key[2]) == 2 and filter_key[1] == date_col \
+                and filter_key[3] == roles['category'] and cube_entry is not None and cube_entry[0] == cube_key \
+                and cube_entry[1] is not None:
+            daily = cube_daily_series(cube_entry[1], filter_key[2], filter_key[4])
+        if daily is None:
+            daily = build_daily_series(df, date_col, value_col)
+        if daily.empty:
+            return None
+        engine = build_period_engine(daily)
+        lru_put(engines, engine_key, engine, FILTER_RESULT_CACHE_SIZE)
+    return engine
+
 # ============================================================================
 # ADVANCED ANALYTICS FUNCTIONS
 # ============================================================================
 
-def detect_anomalies(df: pd.DataFrame, sensitivity: float = 2.0) -> pd.DataFrame:
-    """Detect anomalies in revenue/sales data using z-score method."""
-    date_col = detect_column_type(df, ['date', 'time', 'timestamp', 'created'])
-    revenue_col = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total'])
-    
-    if not date_col or not revenue_col:
+def detect_anomalies(df: pd.DataFrame, sensitivity: float = ANOMALY_SENSITIVITY) -> pd.DataFrame:
+    """Flag days whose robust seasonal score exceeds the sensitivity."""
+    scores = get_anomaly_scores(df)
+    if scores.empty:
         return pd.DataFrame()
-    
-    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+    return threshold_anomalies(scores, sensitivity)
+
+def get_anomaly_scores(df: pd.DataFrame) -> pd.DataFrame:
+    """Serve robust daily anomaly scores for the current filter state, scoring only days not seen before."""
+    history = get_forecast_history(df)
+    if history.empty:
         return pd.DataFrame()
     
+    roles = get_column_roles(df)
+    cache = st.session_state.setdefault('anomaly_scores', OrderedDict())
+    score_key = (st.session_state.get('filter_key'), roles['date'], roles['value'])
+    scores = lru_get(cache, score_key)
+    if scores is not None:
+        return scores
+    
     try:
-        daily_revenue = df.groupby(df[date_col].dt.date)[revenue_col].sum().reset_index()
-        daily_revenue.columns = ['Date', 'Revenue']
+        calendar = build_anomaly_calendar(history)
         
-        mean_revenue = daily_revenue['Revenue'].mean()
-        std_revenue = daily_revenue['Revenue'].std()
+        # Extending the date range forward only appends days, whose scores depend on a fixed trailing window
+        scores = None
+        for (_, cached_date, cached_value), cached in reversed(cache.items()):
+            if (cached_date, cached_value) == score_key[1:] and is_calendar_prefix(cached, calendar):
+                scores = extend_anomaly_scores(cached, calendar)
+                break
         
-        daily_revenue['z_score'] = (daily_revenue['Revenue'] - mean_revenue) / std_revenue
-        anomalies = daily_revenue[abs(daily_revenue['z_score']) > sensitivity]
-        
-        return anomalies.sort_values('Date', ascending=False)
+        if scores is None:
+            scores = score_anomalies(calendar)
     except:
         return pd.DataFrame()
-
-def calculate_rfm(df: pd.DataFrame) -> pd.DataFrame:
-    """Calculate RFM (Recency, Frequency, Monetary) analysis."""
-    date_col = detect_column_type(df, ['date', 'time', 'timestamp', 'created'])
-    customer_col = detect_column_type(df, ['customer', 'client', 'user'])
-    revenue_col = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total'])
     
-    if not all([date_col, customer_col, revenue_col]):
+    lru_put(cache, score_key, scores, FILTER_RESULT_CACHE_SIZE)
+    return scores
+
+def get_segment_anomalies(df: pd.DataFrame, dimensions: List[str], metrics: List[str]) -> pd.DataFrame:
+    """Serve the ranked segment-day anomaly scan for the current filter state, scanned once per column choice."""
+    date_col = get_column_roles(df)['date']
+    if not date_col or not pd.api.types.is_datetime64_any_dtype(df[date_col]):
         return pd.DataFrame()
     
-    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
-        return pd.DataFrame()
+    cache = st.session_state.setdefault('segment_anomalies', OrderedDict())
+    scan_key = (st.session_state.get('filter_key'), date_col, tuple(dimensions), tuple(metrics))
+    ranked = lru_get(cache, scan_key)
+    if ranked is None:
+        try:
+            ranked = scan_segment_anomalies(df, date_col, dimensions, metrics)
+        except:
+            return pd.DataFrame()
+        lru_put(cache, scan_key, ranked, FILTER_RESULT_CACHE_SIZE)
+    return ranked
+
+def calculate_rfm(df: pd.DataFrame) -> pd.DataFrame:
+    """Calculate RFM (Recency, Frequency, Monetary) analysis."""
+    return compute_rfm(df, get_column_roles(df))
+
+def find_appended_rows(cache: OrderedDict, filter_key: Tuple, columns: Tuple) -> Tuple[Any, Optional[pd.DataFrame]]:
+    """Find a cached result for the same dataset whose filter differs only by an earlier end date, and the rows that filter now adds."""
+    engine = st.session_state.get('filter_engine')
+    date_range, category = filter_key[2], filter_key[4]
+    if engine is None or not date_range or len(date_range) != 2:
+        return None, None
+    
+    # A date range extended forward only appends rows, so results over the old range can absorb just the new days
+    for (cached_filter, cached_columns), cached in reversed(cache.items()):
+        cached_range = cached_filter[2]
+        if cached_columns == columns and cached_range and len(cached_range) == 2 \
+                and cached_filter[:2] == filter_key[:2] and cached_filter[3:] == filter_key[3:] \
+                and cached_range[0] == date_range[0] and cached_range[1] < date_range[1]:
+            return cached, apply_filters(engine, (cached_range[1] + timedelta(days=1), date_range[1]), category)
+    return None, None
+
+def get_group_sums(df: pd.DataFrame, key_col: str, value_col: str) -> Dict[str, Any]:
+    """Serve per-key sums for the current filter state, extending cached sums when the end date moves forward."""
+    filter_key = st.session_state.get('filter_key')
+    if filter_key is None:
+        return build_group_sums(df[key_col], df[value_col])
+    
+    cache = st.session_state.setdefault('group_sums', OrderedDict())
+    columns = (key_col, value_col)
+    sums = lru_get(cache, (filter_key, columns))
+    if sums is None:
+        cached, new_rows = find_appended_rows(cache, filter_key, columns)
+        if cached is not None:
+            sums = extend_group_sums(cached, new_rows[key_col], new_rows[value_col]) if not new_rows.empty else cached
+        else:
+            sums = build_group_sums(df[key_col], df[value_col])
+        lru_put(cache, (filter_key, columns), sums, FILTER_RESULT_CACHE_SIZE)
+    return sums
+
+def get_rfm_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Serve the RFM table for the current filter state, extending cached aggregates when the end date moves forward."""
+    roles = get_column_roles(df)
+    date_col, customer_col, revenue_col = roles['date'], roles['customer'], roles['value']
+    filter_key = st.session_state.get('filter_key')
+    if not all([date_col, customer_col, revenue_col]) or filter_key is None \
+            or not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        return calculate_rfm(df)
+    
+    tables = st.session_state.setdefault('rfm_tables', OrderedDict())
+    columns = (date_col, customer_col, revenue_col)
+    entry = lru_get(tables, (filter_key, columns))
+    if entry is not None:
+        return entry['rfm']
     
     try:
-        max_date = df[date_col].max()
-        
-        rfm = df.groupby(customer_col).agg({
-            date_col: lambda x: (max_date - x.max()).days,
-            customer_col: 'count',
-            revenue_col: 'sum'
-        })
-        
-        rfm.columns = ['Recency', 'Frequency', 'Monetary']
-        rfm = rfm.reset_index()
-        
-        rfm['R_Score'] = pd.qcut(rfm['Recency'], 5, labels=[5,4,3,2,1], duplicates='drop')
-        rfm['F_Score'] = pd.qcut(rfm['Frequency'].rank(method='first'), 5, labels=[1,2,3,4,5], duplicates='drop')
-        rfm['M_Score'] = pd.qcut(rfm['Monetary'], 5, labels=[1,2,3,4,5], duplicates='drop')
-        
-        rfm['RFM_Score'] = rfm['R_Score'].astype(str) + rfm['F_Score'].astype(str) + rfm['M_Score'].astype(str)
-        rfm['RFM_Total'] = rfm[['R_Score', 'F_Score', 'M_Score']].astype(int).sum(axis=1)
-        
-        def segment_customer(row):
-            if row['RFM_Total'] >= 13:
-                return 'Champions'
-            elif row['RFM_Total'] >= 10:
-                return 'Loyal Customers'
-            elif row['RFM_Total'] >= 7:
-                return 'Potential Loyalists'
-            elif row['RFM_Total'] >= 5:
-                return 'At Risk'
-            else:
-                return 'Lost'
-        
-        rfm['Segment'] = rfm.apply(segment_customer, axis=1)
-        
-        return rfm
+        aggregates = None
+        cached, new_rows = find_appended_rows(tables, filter_key, columns)
+        if cached is not None:
+            aggregates = cached['aggregates']
+            if not new_rows.empty:
+                aggregates = combine_customer_aggregates([
+                    aggregates, build_customer_aggregates(new_rows, date_col, customer_col, revenue_col)
+                ])
+        
+        if aggregates is None:
+            aggregates = build_customer_aggregates(df, date_col, customer_col, revenue_col)
+        rfm = score_rfm(aggregates, df[date_col].max())
     except:
         return pd.DataFrame()
+    
+    lru_put(tables, (filter_key, columns), {'aggregates': aggregates, 'rfm': rfm}, FILTER_RESULT_CACHE_SIZE)
+    return rfm
 
 def calculate_customer_lifetime_value(df: pd.DataFrame) -> pd.DataFrame:
     """Calculate Customer Lifetime Value (CLV)."""
-    customer_col = detect_column_type(df, ['customer', 'client', 'user'])
-    revenue_col = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total'])
-    date_col = detect_column_type(df, ['date', 'time', 'timestamp', 'created'])
-    
-    if not all([customer_col, revenue_col, date_col]):
-        return pd.DataFrame()
-    
-    try:
-        customer_data = df.groupby(customer_col).agg({
-            revenue_col: ['sum', 'mean', 'count'],
-            date_col: lambda x: (x.max() - x.min()).days
-        })
-        
-        customer_data.columns = ['Total_Revenue', 'Avg_Order_Value', 'Purchase_Frequency', 'Customer_Lifespan_Days']
-        customer_data = customer_data.reset_index()
-        
-        avg_lifespan = customer_data['Customer_Lifespan_Days'].replace(0, 1).mean()
-        customer_data['Customer_Lifespan_Days'] = customer_data['Customer_Lifespan_Days'].replace(0, avg_lifespan)
-        
-        customer_data['Purchase_Rate'] = customer_data['Purchase_Frequency'] / (customer_data['Customer_Lifespan_Days'] / 30)
-        customer_data['CLV'] = customer_data['Avg_Order_Value'] * customer_data['Purchase_Rate'] * (customer_data['Customer_Lifespan_Days'] / 30)
-        
-        customer_data = customer_data.sort_values('CLV', ascending=False)
-        
-        return customer_data
-    except:
-        return pd.DataFrame()
+    return compute_clv(df, get_column_roles(df))
 
-def perform_cohort_analysis(df: pd.DataFrame) -> pd.DataFrame:
-    """Perform cohort analysis based on customer first purchase month."""
-    date_col = detect_column_type(df, ['date', 'time', 'timestamp', 'created'])
-    customer_col = detect_column_type(df, ['customer', 'client', 'user'])
-    
-    if not all([date_col, customer_col]):
-        return pd.DataFrame()
+def build_cohort_analysis(df: pd.DataFrame, frequency: str = 'month') -> Dict[str, Any]:
+    """Build customer and revenue cohort retention tables without touching the input frame."""
+    return compute_cohorts(df, get_column_roles(df), frequency)
+
+def perform_cohort_analysis(df: pd.DataFrame, frequency: str = 'month', metric: str = 'customers') -> pd.DataFrame:
+    """Perform cohort analysis based on customer first purchase period."""
+    return build_cohort_analysis(df, frequency).get(metric, pd.DataFrame())
+
+def get_cohort_analysis(df: pd.DataFrame, frequency: str = 'month') -> Dict[str, Any]:
+    """Serve cohort tables for the current filter state, building them at most once per state."""
+    roles = get_column_roles(df)
+    filter_key = st.session_state.get('filter_key')
+    if filter_key is None:
+        return build_cohort_analysis(df, frequency)
+    
+    tables = st.session_state.setdefault('cohort_tables', OrderedDict())
+    cohort_key = (filter_key, roles['date'], roles['customer'], roles['value'], frequency)
+    cohorts = lru_get(tables, cohort_key)
+    if cohorts is None:
+        cohorts = build_cohort_analysis(df, frequency)
+        lru_put(tables, cohort_key, cohorts, FILTER_RESULT_CACHE_SIZE)
+    return cohorts
+
+def run_out_of_core_analysis(root: str) -> Dict[str, Any]:
+    """Run RFM and CLV analysis over a directory of Parquet partitions, keeping cohort activity pairs."""
+    partitions = list_parquet_partitions(root)
+    if not partitions:
+        raise ValueError(f"No Parquet files found under {root}")
+    
+    roles = resolve_column_roles(read_parquet_schema(partitions[0]))
+    date_col, customer_col, revenue_col = roles['date'], roles['customer'], roles['value']
+    if not all([date_col, customer_col, revenue_col]):
+        raise ValueError("Partitions need a date, a customer and a numeric value column")
+    
+    start = time.time()
+    scan = scan_customer_partitions(partitions, date_col, customer_col, revenue_col, OUT_OF_CORE_WORKERS)
+    aggregates = scan['aggregates']
+    if aggregates.empty:
+        raise ValueError("Partitions contain no customer transactions")
+    
+    return {
+        'root': root,
+        'partitions': scan['partitions'],
+        'rows': scan['rows'],
+        'rfm': score_rfm(aggregates, aggregates['Last_Purchase'].max()),
+        'clv': clv_from_aggregates(aggregates),
+        'pairs': scan['pairs'],
+        'seconds': time.time() - start
+    }
+
+def build_forecast_history(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate revenue per day into the ds/y frame the forecast models expect."""
+    roles = get_column_roles(df)
+    date_col = roles['date']
+    revenue_col = roles['value']
     
-    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+    if not date_col or not revenue_col:
         return pd.DataFrame()
     
-    try:
-        df['OrderMonth'] = df[date_col].dt.to_period('M')
-        df['CohortMonth'] = df.groupby(customer_col)[date_col].transform('min').dt.to_period('M')
-        
-        df_cohort = df.groupby(['CohortMonth', 'OrderMonth']).agg({
-            customer_col: 'nunique'
-        }).reset_index()
-        
-        df_cohort['Period'] = (df_cohort.OrderMonth - df_cohort.CohortMonth).apply(lambda x: x.n)
-        
-        cohort_pivot = df_cohort.pivot_table(
-            index='CohortMonth',
-            columns='Period',
-            values=customer_col
-        )
+    return build_daily_history(df, date_col, revenue_col)
+
+def get_forecast_table(result: Dict[str, Any], periods: int) -> pd.DataFrame:
+    """Return the future rows of a forecast result."""
+    return result['forecast'].tail(periods).reset_index(drop=True)
+
+def build_forecast_figure(daily_revenue: pd.DataFrame, result: Dict[str, Any]) -> go.Figure:
+    """Plot history against a forecast result, with bounds when the model provides them."""
+    forecast = result['forecast']
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=daily_revenue['ds'],
+        y=daily_revenue['y'],
+        mode='lines',
+        name='Historical',
+        line=dict(color='#667eea', width=2)
+    ))
+    
+    if 'yhat_lower' in forecast.columns:
+        fig.add_trace(go.Scatter(
+            x=forecast['ds'],
+            y=forecast['yhat'],
+            mode='lines',
+            name='Forecast',
+            line=dict(color='#f59e0b', width=2, dash='dash')
+        ))
         
-        cohort_size = cohort_pivot[0]
-        retention = cohort_pivot.divide(cohort_size, axis=0) * 100
+        fig.add_trace(go.Scatter(
+            x=forecast['ds'],
+            y=forecast['yhat_upper'],
+            mode='lines',
+            name='Upper Bound',
+            line=dict(width=0),
+            showlegend=False
+        ))
         
-        return retention
-    except:
-        return pd.DataFrame()
+        fig.add_trace(go.Scatter(
+            x=forecast['ds'],
+            y=forecast['yhat_lower'],
+            mode='lines',
+            name='Lower Bound',
+            line=dict(width=0),
+            fillcolor='rgba(245, 158, 11, 0.2)',
+            fill='tonexty',
+            showlegend=False
+        ))
+        title = f"Revenue Forecast ({FORECAST_METHOD_LABELS.get(result['method'], result['method'])})"
+    else:
+        fig.add_trace(go.Scatter(
+            x=forecast['ds'],
+            y=forecast['yhat'],
+            mode='lines',
+            name='Forecast (Simple MA)',
+            line=dict(color='#f59e0b', width=2, dash='dash')
+        ))
+        title = 'Revenue Forecast (Moving Average)'
+    
+    fig.update_layout(
+        title=title,
+        xaxis_title='Date',
+        yaxis_title='Revenue',
+        hovermode='x unified',
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        height=400
+    )
+    
+    return fig
 
 def forecast_revenue(df: pd.DataFrame, periods: int = 30) -> Tuple[pd.DataFrame, go.Figure]:
     """Forecast revenue using Prophet (if available) or simple moving average."""
-    date_col = detect_column_type(df, ['date', 'time', 'timestamp', 'created'])
-    revenue_col = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total'])
-    
-    if not date_col or not revenue_col:
-        return pd.DataFrame(), None
-    
-    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
-        return pd.DataFrame(), None
-    
     try:
-        daily_revenue = df.groupby(df[date_col].dt.date)[revenue_col].sum().reset_index()
-        daily_revenue.columns = ['ds', 'y']
-        daily_revenue['ds'] = pd.to_datetime(daily_revenue['ds'])
+        daily_revenue = build_forecast_history(df)
+        if daily_revenue.empty:
+            return pd.DataFrame(), None
         
-        if PROPHET_AVAILABLE and len(daily_revenue) > 30:
-            model = Prophet(daily_seasonality=False, yearly_seasonality=True, weekly_seasonality=True)
-            model.fit(daily_revenue)
-            
-            future = model.make_future_dataframe(periods=periods)
-            forecast = model.predict(future)
-            
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=daily_revenue['ds'],
-                y=daily_revenue['y'],
-                mode='lines',
-                name='Historical',
-                line=dict(color='#667eea', width=2)
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=forecast['ds'],
-                y=forecast['yhat'],
-                mode='lines',
-                name='Forecast',
-                line=dict(color='#f59e0b', width=2, dash='dash')
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=forecast['ds'],
-                y=forecast['yhat_upper'],
-                mode='lines',
-                name='Upper Bound',
-                line=dict(width=0),
-                showlegend=False
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=forecast['ds'],
-                y=forecast['yhat_lower'],
-                mode='lines',
-                name='Lower Bound',
-                line=dict(width=0),
-                fillcolor='rgba(245, 158, 11, 0.2)',
-                fill='tonexty',
-                showlegend=False
-            ))
-            
-            fig.update_layout(
-                title='Revenue Forecast (Prophet Model)',
-                xaxis_title='Date',
-                yaxis_title='Revenue',
-                hovermode='x unified',
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                height=400
-            )
-            
-            return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].tail(periods), fig
-        else:
-            # Simple moving average forecast
-            window = min(7, len(daily_revenue) // 3)
-            daily_revenue['MA'] = daily_revenue['y'].rolling(window=window).mean()
-            last_ma = daily_revenue['MA'].iloc[-1]
-            
-            future_dates = pd.date_range(start=daily_revenue['ds'].max() + timedelta(days=1), periods=periods)
-            forecast_values = [last_ma] * periods
-            
-            forecast_df = pd.DataFrame({
-                'ds': future_dates,
-                'yhat': forecast_values
-            })
-            
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=daily_revenue['ds'],
-                y=daily_revenue['y'],
-                mode='lines',
-                name='Historical',
-                line=dict(color='#667eea', width=2)
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=forecast_df['ds'],
-                y=forecast_df['yhat'],
-                mode='lines',
-                name='Forecast (Simple MA)',
-                line=dict(color='#f59e0b', width=2, dash='dash')
-            ))
-            
-            fig.update_layout(
-                title='Revenue Forecast (Moving Average)',
-                xaxis_title='Date',
-                yaxis_title='Revenue',
-                hovermode='x unified',
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                height=400
-            )
-            
-            return forecast_df, fig
+        result = run_forecast_job(daily_revenue, periods, model_dir=MODEL_CACHE_DIR, model_max_bytes=MODEL_CACHE_MAX_BYTES)
+        return get_forecast_table(result, periods), build_forecast_figure(daily_revenue, result)
     except Exception as e:
         st.error(f"Forecast error: {str(e)}")
         return pd.DataFrame(), None
 
 # ============================================================================
-# EXPORT FUNCTIONS
+# FORECAST JOBS
 # ============================================================================
 
-def export_to_excel(df: pd.DataFrame, kpis: Dict[str, Any]) -> BytesIO:
-    """Export dashboard data to Excel with multiple sheets."""
-    output = BytesIO()
-    
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        workbook = writer.book
-        
-        # Formats
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#667eea',
-            'font_color': 'white',
-            'border': 1
-        })
-        
-        kpi_format = workbook.add_format({
-            'bold': True,
-            'font_size': 14,
-            'bg_color': '#f0f0f0'
-        })
-        
-        # KPI Sheet
-        kpi_df = pd.DataFrame([kpis])
-        kpi_df.to_excel(writer, sheet_name='KPIs', index=False)
-        worksheet = writer.sheets['KPIs']
-        for col_num, value in enumerate(kpi_df.columns.values):
-            worksheet.write(0, col_num, value, header_format)
-        
-        # Data Sheet
-        df.to_excel(writer, sheet_name='Data', index=False)
-        worksheet = writer.sheets['Data']
-        for col_num, value in enumerate(df.columns.values):
-            worksheet.write(0, col_num, value, header_format)
-            worksheet.set_column(col_num, col_num, 15)
-        
-        # Summary Statistics
-        summary = df.describe()
-        summary.to_excel(writer, sheet_name='Statistics')
+@st.cache_resource(show_spinner=False)
+def get_forecast_executor() -> ProcessPoolExecutor:
+    """Return the process pool that runs forecast fits off the script thread."""
+    return ProcessPoolExecutor(max_workers=FORECAST_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+@st.cache_resource(show_spinner=False)
+def get_forecast_store() -> Dict[str, Any]:
+    """Return the store of running jobs, finished forecasts and fitted models shared by all sessions."""
+    return {
+        'lock': threading.Lock(),
+        'jobs': {},
+        'errors': OrderedDict(),
+        'results': OrderedDict(),
+        'models': OrderedDict()
+    }
+
+def get_forecast_history(df: pd.DataFrame) -> pd.DataFrame:
+    """Return the daily forecast series for the current filter state, aggregated once per state."""
+    roles = get_column_roles(df)
+    histories = st.session_state.setdefault('forecast_histories', OrderedDict())
+    history_key = (st.session_state.get('filter_key'), roles['date'], roles['value'])
+    history = lru_get(histories, history_key)
+    if history is None:
+        history = build_forecast_history(df)
+        lru_put(histories, history_key, history, FILTER_RESULT_CACHE_SIZE)
+    return history
+
+def has_forecast_model(fingerprint: str) -> bool:
+    """Check whether a fitted model exists for a series."""
+    store = get_forecast_store()
+    with store['lock']:
+        return fingerprint in store['models']
+
+def submit_forecast_task(fn, *args):
+    """Submit work to the forecast pool, replacing the pool if a crashed worker broke it."""
+    try:
+        return get_forecast_executor().submit(fn, *args)
+    except BrokenProcessPool:
+        get_forecast_executor.clear()
+        return get_forecast_executor().submit(fn, *args)
+
+def submit_forecast_job(daily_revenue: pd.DataFrame, periods: int, timeout: Optional[float] = None,
+                        retry: bool = False) -> Tuple[str, int]:
+    """Queue a forecast unless its result or job already exists; a failed job is queued again only on retry."""
+    key = (compute_series_fingerprint(daily_revenue), periods)
+    store = get_forecast_store()
+    with store['lock']:
+        if key in store['results'] or key in store['jobs'] or (key in store['errors'] and not retry):
+            return key
+        
+        model_json = lru_get(store['models'], key[0])
+        future = submit_forecast_task(
+            run_forecast_job, daily_revenue, periods, model_json, MODEL_CACHE_DIR, MODEL_CACHE_MAX_BYTES, timeout
+        )
         
-    output.seek(0)
-    return output
+        store['errors'].pop(key, None)
+        store['jobs'][key] = {'future': future, 'submitted': time.time(), 'reuse_model': model_json is not None}
+    return key
 
-def export_to_pdf(df: pd.DataFrame, kpis: Dict[str, Any]) -> BytesIO:
-    """Export dashboard summary to PDF."""
-    if not REPORTLAB_AVAILABLE:
-        return None
+def describe_forecast_error(error: Exception) -> Dict[str, Any]:
+    """Report a failed forecast job, flagging jobs stopped by their time limit."""
+    return {'status': 'failed', 'error': str(error), 'timed_out': isinstance(error, ForecastTimeout)}
+
+def get_forecast_job(key: Tuple[str, int]) -> Dict[str, Any]:
+    """Report a forecast job's status, moving finished jobs into the result store."""
+    store = get_forecast_store()
+    with store['lock']:
+        result = lru_get(store['results'], key)
+        if result is not None:
+            return {'status': 'done', 'result': result}
+        
+        job = store['jobs'].get(key)
+        if job is None:
+            if key in store['errors']:
+                return describe_forecast_error(lru_get(store['errors'], key))
+            return {'status': 'idle'}
+        
+        if not job['future'].done():
+            return {'status': 'running', 'elapsed': time.time() - job['submitted'], 'reuse_model': job['reuse_model']}
+        
+        del store['jobs'][key]
+        try:
+            result = job['future'].result()
+        except Exception as e:
+            lru_put(store['errors'], key, e, FORECAST_STORE_SIZE)
+            return describe_forecast_error(e)
+        
+        lru_put(store['results'], key, result, FORECAST_STORE_SIZE)
+        if result['model']:
+            lru_put(store['models'], key[0], result['model'], FORECAST_STORE_SIZE)
+        return {'status': 'done', 'result': result}
+
+@st.fragment(run_every=FORECAST_POLL_SECONDS)
+def render_forecast_status(key: Tuple[str, int]):
+    """Poll a running forecast job and refresh the page once it finishes."""
+    job = get_forecast_job(key)
+    if job['status'] == 'running':
+        action = "Forecasting from the fitted model" if job['reuse_model'] else "Fitting forecast model"
+        st.info(f"⏳ {action}... {job['elapsed']:.0f}s elapsed. You can keep using the other tabs.")
+    else:
+        st.rerun()
+
+def build_dimension_histories(df: pd.DataFrame, dimensions: List[str]) -> Dict[str, pd.DataFrame]:
+    """Split daily revenue into one ds/y series per dimension value, largest series first."""
+    roles = get_column_roles(df)
+    date_col = roles['date']
+    revenue_col = roles['value']
     
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#667eea'),
-        spaceAfter=30,
-        alignment=1
+    if not date_col or not revenue_col or not dimensions:
+        return {}
+    
+    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        return {}
+    
+    daily = df.groupby(
+        [df[col] for col in dimensions] + [df[date_col].dt.normalize().rename('ds')],
+        observed=True,
+        sort=True
+    )[revenue_col].sum()
+    
+    levels = list(range(len(dimensions)))
+    totals = daily.groupby(level=levels).sum().nlargest(BATCH_FORECAST_MAX_SERIES)
+    
+    histories = {}
+    for key in totals.index:
+        key = key if isinstance(key, tuple) else (key,)
+        label = " / ".join(str(value) for value in key)
+        series = daily.xs(key, level=levels) if len(levels) > 1 else daily.xs(key[0], level=0)
+        histories[label] = pd.DataFrame({'ds': series.index, 'y': series.to_numpy()})
+    return histories
+
+def submit_batch_forecast(histories: Dict[str, pd.DataFrame], periods: int) -> Dict[str, Tuple[str, int]]:
+    """Queue one forecast per series; the shared pool fits them in parallel."""
+    return {
+        label: submit_forecast_job(history, periods, BATCH_FORECAST_TIMEOUT, retry=True)
+        for label, history in histories.items()
+    }
+
+def get_batch_forecast(series_keys: Dict[str, Tuple[str, int]]) -> Dict[str, Any]:
+    """Collect the status of a batch and, once finished, one tidy forecast frame."""
+    jobs = {label: get_forecast_job(key) for label, key in series_keys.items()}
+    running = sum(job['status'] == 'running' for job in jobs.values())
+    if running:
+        return {'status': 'running', 'done': len(jobs) - running, 'total': len(jobs)}
+    return summarize_batch_forecast(jobs, next(iter(series_keys.values()))[1])
+
+def run_fast_batch_forecast(histories: Dict[str, pd.DataFrame], periods: int, engine: str) -> Dict[str, Any]:
+    """Forecast every series with a NumPy engine in one vectorized call on the script thread."""
+    results = run_fast_forecasts(histories, periods, engine)
+    jobs = {
+        label: {'status': 'done', 'result': results[label]} if label in results
+        else {'status': 'failed', 'error': 'Not enough history'}
+        for label in histories
+    }
+    return summarize_batch_forecast(jobs, periods)
+
+def summarize_batch_forecast(jobs: Dict[str, Dict[str, Any]], periods: int) -> Dict[str, Any]:
+    """Combine finished per-series jobs into one tidy forecast frame and a status table."""
+    frames = []
+    summary = []
+    for label, job in jobs.items():
+        if job['status'] == 'done':
+            result = job['result']
+            forecast = get_forecast_table(result, periods)
+            frames.append(forecast.assign(series=label))
+            summary.append({'Series': label, 'Status': 'OK', 'Model': FORECAST_METHOD_LABELS.get(result['method']), 'Seconds': round(result['seconds'], 4)})
+        elif job['status'] == 'failed':
+            status = 'Timed out' if job.get('timed_out') else 'Failed'
+            summary.append({'Series': label, 'Status': status, 'Model': None, 'Seconds': None})
+        else:
+            # Results beyond the store size are evicted; regenerating the batch restores them
+            status = 'Expired'
+            summary.append({'Series': label, 'Status': status, 'Model': None, 'Seconds': None})
+    
+    forecasts = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not forecasts.empty:
+        forecasts = forecasts[['series'] + [col for col in forecasts.columns if col != 'series']]
+    return {'status': 'done', 'forecasts': forecasts, 'summary': pd.DataFrame(summary)}
+
+def build_batch_forecast_figure(histories: Dict[str, pd.DataFrame], forecasts: pd.DataFrame) -> go.Figure:
+    """Draw one small panel per series with recent history and its forecast."""
+    frames = []
+    for label, history in histories.items():
+        recent = history[history['ds'] > history['ds'].max() - timedelta(days=BATCH_FORECAST_HISTORY_DAYS)]
+        frames.append(pd.DataFrame({'Series': label, 'Date': recent['ds'], 'Revenue': recent['y'], 'Type': 'Historical'}))
+    frames.append(pd.DataFrame({
+        'Series': forecasts['series'],
+        'Date': forecasts['ds'],
+        'Revenue': forecasts['yhat'],
+        'Type': 'Forecast'
+    }))
+    
+    fig = px.line(
+        pd.concat(frames, ignore_index=True),
+        x='Date',
+        y='Revenue',
+        color='Type',
+        facet_col='Series',
+        facet_col_wrap=3,
+        color_discrete_map={'Historical': '#667eea', 'Forecast': '#f59e0b'},
+        title='Forecast by Series'
     )
+    fig.update_yaxes(matches=None, showticklabels=True)
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split('=', 1)[-1]))
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        height=max(300, 220 * ((len(histories) + 2) // 3))
+    )
+    return fig
+
+@st.fragment(run_every=FORECAST_POLL_SECONDS)
+def render_batch_status(series_keys: Dict[str, Tuple[str, int]]):
+    """Show batch progress and refresh the page once every series has finished."""
+    batch = get_batch_forecast(series_keys)
+    if batch['status'] == 'running':
+        st.progress(batch['done'] / batch['total'], text=f"⏳ {batch['done']} of {batch['total']} series forecast...")
+    else:
+        st.rerun()
+
+def submit_backtest(daily_revenue: pd.DataFrame, horizon: int, engines: List[str], n_folds: int) -> Dict[str, Any]:
+    """Queue one rolling-origin fold per engine and cutoff on the shared forecast pool."""
+    cutoffs = rolling_origin_cutoffs(daily_revenue, horizon, n_folds)
+    backtest = {
+        'key': (compute_series_fingerprint(daily_revenue), horizon),
+        'futures': [],
+        'folds': len(cutoffs),
+        'submitted': time.time(),
+        'finished': None,
+        'result': None
+    }
+    
+    def record_finish(_):
+        # Folds complete one after another, so the last callback records when the whole backtest ended
+        backtest['finished'] = time.time()
     
-    # Title
-    elements.append(Paragraph("Business Intelligence Report", title_style))
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # KPIs
-    elements.append(Paragraph("Key Performance Indicators", styles['Heading2']))
-    elements.append(Spacer(1, 0.2*inch))
-    
-    kpi_data = [
-        ['Metric', 'Value'],
-        ['Total Revenue', f"${kpis['total_revenue']:,.2f}"],
-        ['Growth Rate', f"{kpis['growth_percent']:.1f}%"],
-        ['Avg Order Value', f"${kpis['avg_order_value']:,.2f}"],
-        ['Total Transactions', f"{kpis['total_transactions']:,}"],
-        ['Unique Customers', f"{kpis['unique_customers']:,}"]
-    ]
-    
-    kpi_table = Table(kpi_data, colWidths=[3*inch, 2*inch])
-    kpi_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(kpi_table)
-    elements.append(Spacer(1, 0.5*inch))
-    
-    # Data Summary
-    elements.append(Paragraph("Data Overview", styles['Heading2']))
-    elements.append(Spacer(1, 0.2*inch))
-    elements.append(Paragraph(f"Total Records: {len(df)}", styles['Normal']))
-    elements.append(Paragraph(f"Date Range: {df.iloc[0]['Transaction Date'] if 'Transaction Date' in df.columns else 'N/A'} to {df.iloc[-1]['Transaction Date'] if 'Transaction Date' in df.columns else 'N/A'}", styles['Normal']))
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    for engine in engines:
+        for cutoff in cutoffs:
+            future = submit_forecast_task(run_backtest_fold, daily_revenue, cutoff, horizon, engine, BATCH_FORECAST_TIMEOUT)
+            future.add_done_callback(record_finish)
+            backtest['futures'].append(future)
+    return backtest
+
+def get_backtest(backtest: Dict[str, Any]) -> Dict[str, Any]:
+    """Report backtest progress and, once every fold has finished, the summary and fold tables."""
+    if backtest['result'] is not None:
+        return backtest['result']
+    
+    futures = backtest['futures']
+    done = sum(future.done() for future in futures)
+    if done < len(futures):
+        return {'status': 'running', 'done': done, 'total': len(futures)}
+    
+    rows = [future.result() for future in futures if future.exception() is None]
+    folds = pd.DataFrame(rows)
+    if not folds.empty:
+        folds = folds.sort_values(['Engine', 'Cutoff']).reset_index(drop=True)
+    backtest['result'] = {
+        'status': 'done',
+        'summary': summarize_backtest(folds),
+        'folds': folds,
+        'failed': len(futures) - len(rows),
+        'seconds': (backtest['finished'] or time.time()) - backtest['submitted']
+    }
+    return backtest['result']
+
+@st.fragment(run_every=FORECAST_POLL_SECONDS)
+def render_backtest_status(backtest: Dict[str, Any]):
+    """Show backtest progress and refresh the page once every fold has finished."""
+    status = get_backtest(backtest)
+    if status['status'] == 'running':
+        st.progress(status['done'] / status['total'], text=f"⏳ {status['done']} of {status['total']} folds evaluated...")
+    else:
+        st.rerun()
+
+# ============================================================================
+# EXPORT FUNCTIONS
+# ============================================================================
+
+def get_export_path(df: pd.DataFrame, export_format: str, roles: Dict[str, Optional[str]]) -> str:
+    """Name the cached export of the current data, filter state and column mapping in one format."""
+    roles = tuple(sorted(roles.items(), key=lambda item: item[0]))
+    filter_key = st.session_state.get('filter_key') or (compute_dataset_fingerprint(df),)
+    digest = hashlib.sha256(repr((filter_key, roles, export_format, EXPORT_FORMAT_VERSION)).encode()).hexdigest()
+    return os.path.join(EXPORT_DIR, f"{digest[:32]}.{EXPORT_FORMATS[export_format][0]}")
+
+def build_export(path: str, df: pd.DataFrame, kpis: Dict[str, Any], export_format: str,
+                 roles: Dict[str, Optional[str]]) -> bytes:
+    """Produce an export on first request, keep it in the disk cache and return its contents."""
+    if os.path.exists(path):
+        os.utime(path, None)
+    else:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if export_format == 'bundle':
+                build_report_bundle(temp_path, df, roles)
+            else:
+                write_export(temp_path, df, export_format, kpis, roles['date'])
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    with open(path, 'rb') as export_file:
+        data = export_file.read()
+    evict_cache_dir(EXPORT_DIR, EXPORT_CACHE_MAX_BYTES)
+    return data
+
+def export_download_button(label: str, df: pd.DataFrame, kpis: Dict[str, Any], export_format: str,
+                           file_name: str, key: Optional[str] = None):
+    """Show a download button whose file is only generated when it is clicked."""
+    # The file is built on Streamlit's download thread, where session state (and the column mapping) is unavailable
+    roles = get_column_roles(df)
+    path = get_export_path(df, export_format, roles)
+    extension, mime = EXPORT_FORMATS[export_format]
+    st.download_button(
+        label=label,
+        data=lambda: build_export(path, df, kpis, export_format, roles),
+        file_name=f"{file_name}.{extension}",
+        mime=mime,
+        key=key
+    )
 
 def create_download_link(file_data: BytesIO, filename: str, link_text: str) -> str:
     """Create a download link for file data."""
@@ -1020,6 +1779,39 @@ def create_download_link(file_data: BytesIO, filename: str, link_text: str) -> s
 # VISUALIZATION FUNCTIONS (Enhanced)
 # ============================================================================
 
+@st.cache_resource(show_spinner=False)
+def get_figure_store() -> Dict[str, Any]:
+    """Return the byte-bounded store of serialized dashboard figures shared by all sessions."""
+    return {'lock': threading.Lock(), 'figures': OrderedDict(), 'bytes': 0}
+
+def get_cached_figure(chart: str, builder, df: pd.DataFrame, *options) -> Optional[go.Figure]:
+    """Serve a dashboard figure from its JSON when data, filters, columns and theme are unchanged."""
+    filter_key = st.session_state.get('filter_key')
+    if filter_key is None:
+        return builder(df, *options)
+    
+    roles = tuple(sorted(get_column_roles(df).items(), key=lambda item: item[0]))
+    theme = (st.session_state.primary_color, st.session_state.secondary_color)
+    key = (filter_key, chart, roles, options, theme)
+    store = get_figure_store()
+    with store['lock']:
+        figure_json = lru_get(store['figures'], key)
+    if figure_json is not None:
+        return pio.from_json(figure_json) if figure_json else None
+    
+    fig = builder(df, *options)
+    # An empty string records that the chart does not apply to this data
+    figure_json = fig.to_json() if fig is not None else ''
+    with store['lock']:
+        figures = store['figures']
+        if key not in figures:
+            figures[key] = figure_json
+            store['bytes'] += len(figure_json)
+        while store['bytes'] > FIGURE_CACHE_MAX_BYTES and len(figures) > 1:
+            _, evicted = figures.popitem(last=False)
+            store['bytes'] -= len(evicted)
+    return fig
+
 def analyze_dataset_structure(df: pd.DataFrame) -> dict:
     """Analyze dataset to determine best visualization strategy."""
     structure = {
@@ -1028,11 +1820,12 @@ def analyze_dataset_structure(df: pd.DataFrame) -> dict:
         'datetime_cols': df.select_dtypes(include=['datetime64']).columns.tolist(),
     }
     
-    structure['revenue_col'] = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total'])
-    structure['category_col'] = detect_column_type(df, ['category', 'type', 'segment', 'region', 'product'])
-    structure['quantity_col'] = detect_column_type(df, ['quantity', 'units', 'qty', 'count'])
-    structure['date_col'] = detect_column_type(df, ['date', 'time', 'timestamp', 'order', 'created'])
-    structure['name_col'] = detect_column_type(df, ['product', 'name', 'item', 'customer', 'city'])
+    roles = get_column_roles(df)
+    structure['revenue_col'] = roles['value']
+    structure['category_col'] = roles['category']
+    structure['quantity_col'] = roles['quantity']
+    structure['date_col'] = roles['date']
+    structure['name_col'] = roles['name']
     
     structure['has_revenue'] = structure['revenue_col'] is not None
     structure['has_category'] = structure['category_col'] is not None
@@ -1043,27 +1836,30 @@ def analyze_dataset_structure(df: pd.DataFrame) -> dict:
     return structure
 
 def create_distribution_chart(df: pd.DataFrame) -> go.Figure:
-    """Create a Plotly histogram for distribution analysis."""
-    # Use user-selected or auto-detected column
-    if hasattr(st.session_state, 'numeric_col') and st.session_state.numeric_col and st.session_state.numeric_col != 'None':
-        value_col = st.session_state.numeric_col
-    else:
-        value_col = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total', 'runs', 'score', 'salary', 'rating', 'points'])
+    """Create a histogram from bins computed server-side, so only the bin counts reach the browser."""
+    roles = get_column_roles(df)
+    value_col = roles['value']
     
     if value_col and pd.api.types.is_numeric_dtype(df[value_col]):
-        fig = px.histogram(
-            df, 
-            x=value_col,
-            nbins=30,
-            title=f"Distribution of {value_col}",
-            labels={value_col: value_col},
-            color_discrete_sequence=[st.session_state.primary_color]
-        )
+        bins = histogram_bins(df[value_col])
+        if bins.empty:
+            return None
+        
+        fig = go.Figure(go.Bar(
+            x=bins['Center'],
+            y=bins['Count'],
+            width=bins['End'] - bins['Start'],
+            customdata=bins[['Start', 'End']],
+            hovertemplate="%{customdata[0]:,.2f} – %{customdata[1]:,.2f}<br>Count: %{y:,}<extra></extra>",
+            marker_color=st.session_state.primary_color
+        ))
         
         fig.update_layout(
+            title=f"Distribution of {value_col}",
             xaxis_title=value_col,
             yaxis_title="Frequency",
             showlegend=False,
+            bargap=0,
             plot_bgcolor='rgba(0,0,0,0)',
             paper_bgcolor='rgba(0,0,0,0)',
             font=dict(size=12),
@@ -1074,28 +1870,17 @@ def create_distribution_chart(df: pd.DataFrame) -> go.Figure:
         return fig
     return None
 
-def create_categorical_chart(df: pd.DataFrame) -> go.Figure:
-    """Create a Plotly bar chart for categorical analysis."""
-    # Use user-selected or auto-detected columns
-    if hasattr(st.session_state, 'category_col') and st.session_state.category_col and st.session_state.category_col != 'None':
-        category_col = st.session_state.category_col
-    else:
-        category_col = detect_column_type(df, ['category', 'type', 'segment', 'region', 'product', 'department', 'team'])
-    
-    if hasattr(st.session_state, 'numeric_col') and st.session_state.numeric_col and st.session_state.numeric_col != 'None':
-        value_col = st.session_state.numeric_col
-    else:
-        value_col = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total', 'runs', 'score', 'salary', 'rating'])
+def create_categorical_chart(df: pd.DataFrame, top_k: int = TOP_K_DEFAULT) -> go.Figure:
+    """Create a Plotly bar chart of the largest categories, with the rest grouped as Other."""
+    roles = get_column_roles(df)
+    category_col = roles['category']
+    value_col = roles['value']
     
     if category_col and value_col and pd.api.types.is_numeric_dtype(df[value_col]):
-        grouped = df.groupby(category_col)[value_col].sum().sort_values(ascending=False).head(10)
-        
-        # Create custom color scale based on user's colors
-        import plotly.graph_objects as go
-        colors = [st.session_state.primary_color, st.session_state.secondary_color]
+        grouped = top_k_groups(get_group_sums(df, category_col, value_col), top_k, TOP_K_OTHER_LABEL)
         
         fig = px.bar(
-            x=grouped.index,
+            x=grouped.index.astype(str),
             y=grouped.values,
             title=f"{value_col} by {category_col}",
             labels={'x': category_col, 'y': value_col},
@@ -1117,26 +1902,25 @@ def create_categorical_chart(df: pd.DataFrame) -> go.Figure:
         return fig
     return None
 
-def create_time_series_chart(df: pd.DataFrame) -> go.Figure:
-    """Create time series trend chart."""
-    date_col = detect_column_type(df, ['date', 'time', 'timestamp', 'created', 'order', 'year'])
-    
-    # Use user-selected or auto-detected column
-    if hasattr(st.session_state, 'numeric_col') and st.session_state.numeric_col and st.session_state.numeric_col != 'None':
-        value_col = st.session_state.numeric_col
-    else:
-        value_col = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total', 'runs', 'score', 'rating'])
-    
-    if date_col and value_col and pd.api.types.is_datetime64_any_dtype(df[date_col]) and pd.api.types.is_numeric_dtype(df[value_col]):
-        time_data = df.groupby(df[date_col].dt.date)[value_col].sum().reset_index()
-        time_data.columns = ['Date', value_col]
+def create_time_series_chart(df: pd.DataFrame, resolution: str = 'auto') -> go.Figure:
+    """Create the trend chart from the cached daily series, binned and downsampled to a bounded point count."""
+    roles = get_column_roles(df)
+    value_col = roles['value']
+    engine = get_dashboard_period_engine(df)
+    
+    if engine is not None and pd.api.types.is_numeric_dtype(df[value_col]):
+        daily = pd.Series(np.diff(engine['prefix']), index=engine['dates'])
+        if resolution == 'auto':
+            resolution = choose_time_resolution(daily.index[0], daily.index[-1])
+        series = downsample_series(resample_daily(daily, resolution))
+        time_data = pd.DataFrame({'Date': series.index, value_col: series.to_numpy()})
         
         fig = px.line(
             time_data,
             x='Date',
             y=value_col,
-            title=f'{value_col} Trend Over Time',
-            markers=True
+            title=f'{value_col} Trend Over Time ({CHART_RESOLUTION_LABELS[resolution]})',
+            markers=len(time_data) <= CHART_MARKER_POINTS
         )
         
         fig.update_layout(
@@ -1153,19 +1937,14 @@ def create_time_series_chart(df: pd.DataFrame) -> go.Figure:
         return fig
     return None
 
-def create_top_performers_chart(df: pd.DataFrame) -> go.Figure:
+def create_top_performers_chart(df: pd.DataFrame, top_k: int = TOP_K_DEFAULT) -> go.Figure:
     """Create horizontal bar chart for top performers."""
-    # Detect name column
-    name_col = detect_column_type(df, ['product', 'name', 'item', 'customer', 'city', 'state', 'player', 'employee', 'team'])
-    
-    # Use user-selected or auto-detected value column
-    if hasattr(st.session_state, 'numeric_col') and st.session_state.numeric_col and st.session_state.numeric_col != 'None':
-        value_col = st.session_state.numeric_col
-    else:
-        value_col = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total', 'runs', 'score', 'salary', 'rating', 'points'])
+    roles = get_column_roles(df)
+    name_col = roles['name']
+    value_col = roles['value']
     
     if name_col and value_col and pd.api.types.is_numeric_dtype(df[value_col]):
-        top_items = df.groupby(name_col)[value_col].sum().sort_values(ascending=True).tail(10)
+        top_items = top_k_groups(get_group_sums(df, name_col, value_col), top_k).iloc[::-1]
         
         # Create custom color scale
         colorscale = [[0, st.session_state.primary_color], [1, st.session_state.secondary_color]]
@@ -1182,7 +1961,7 @@ def create_top_performers_chart(df: pd.DataFrame) -> go.Figure:
         ))
         
         fig.update_layout(
-            title=f'Top 10 {name_col} by {value_col}',
+            title=f'Top {top_k} {name_col} by {value_col}',
             xaxis_title=value_col,
             yaxis_title=name_col,
             plot_bgcolor='rgba(0,0,0,0)',
@@ -1249,8 +2028,8 @@ FORMAT YOUR RESPONSE EXACTLY AS:
 """
         
         with st.spinner("🔍 Analyzing data and generating prescriptive insights..."):
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
+            response = get_ai_client().chat.completions.create(
+                model=AI_MODEL,
                 messages=[
                     {"role": "system", "content": "You are an executive business analyst providing prescriptive, actionable recommendations."},
                     {"role": "user", "content": prompt}
@@ -1316,6 +2095,14 @@ def display_alerts(alerts: List[Dict[str, str]]):
 
 def main():
     """Main application entry point."""
+    st.set_page_config(
+        page_title="Autonomous BI Suite Pro",
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    
+    inject_custom_css()
     
     # Header with gradient
     st.markdown("""
@@ -1370,19 +2157,34 @@ def main():
             )
             
             if uploaded_file is not None:
+                streaming_mode = False
+                if uploaded_file.name.endswith('.csv') and PARQUET_AVAILABLE:
+                    streaming_mode = st.checkbox(
+                        "⚡ Streaming Mode",
+                        value=uploaded_file.size > STREAMING_AUTO_MB * 1024 * 1024,
+                        help="Process large CSV files in chunks with bounded memory"
+                    )
+                
                 if st.session_state.original_df is None or st.button("🔄 Reload Data"):
                     with st.spinner("Processing data..."):
-                        df = process_data(uploaded_file)
+                        df = process_data(uploaded_file, streaming=streaming_mode)
                         if df is not None:
                             st.session_state.original_df = df
                             st.session_state.processed_df = df
+                            st.session_state.dataset_fingerprint = compute_dataset_fingerprint(df)
                             st.success("✅ Data loaded successfully!")
+                
+                type_report = st.session_state.get('type_inference_report')
+                if type_report is not None and not type_report.empty:
+                    with st.expander("🔍 Type Inference Report"):
+                        st.dataframe(type_report, use_container_width=True, hide_index=True)
         else:
             if st.button("🎲 Load Sample Data") or st.session_state.original_df is None:
                 with st.spinner("Generating sample data..."):
                     df = generate_sample_data()
                     st.session_state.original_df = df
                     st.session_state.processed_df = df
+                    st.session_state.dataset_fingerprint = compute_dataset_fingerprint(df)
                     st.success("✅ Sample data loaded!")
         
         # Filters
@@ -1390,7 +2192,7 @@ def main():
             st.markdown("---")
             st.subheader("📊 Dataset Configuration")
             
-            df = st.session_state.original_df.copy()
+            df = st.session_state.original_df
             
             # Dataset Type Selection
             st.session_state.dataset_type = st.selectbox(
@@ -1407,7 +2209,8 @@ def main():
             numeric_columns = ['None'] + df.select_dtypes(include=['float64', 'int64']).columns.tolist()
             
             # Primary numeric column
-            default_numeric = detect_column_type(df, ['revenue', 'amount', 'sales', 'price', 'value', 'total', 'runs', 'score', 'salary', 'count'])
+            default_roles = get_column_roles(df, apply_overrides=False)
+            default_numeric = default_roles['value']
             numeric_idx = numeric_columns.index(default_numeric) if default_numeric in numeric_columns else 0
             st.session_state.numeric_col = st.selectbox(
                 "Primary Value Column",
@@ -1417,7 +2220,7 @@ def main():
             )
             
             # Category column
-            default_category = detect_column_type(df, ['category', 'type', 'segment', 'region', 'product', 'team', 'department'])
+            default_category = default_roles['category']
             category_idx = all_columns.index(default_category) if default_category in all_columns else 0
             st.session_state.category_col = st.selectbox(
                 "Category Column",
@@ -1429,13 +2232,17 @@ def main():
             st.markdown("---")
             st.subheader("🎛️ Global Filters")
             
-            df = st.session_state.original_df.copy()
+            roles = get_column_roles(df)
+            filter_engine = get_filter_engine(roles['date'], roles['category'])
+            date_col = filter_engine['date_col']
+            category_col = filter_engine['category_col']
+            date_range = None
+            selected_category = 'All'
             
             # Date Range Filter
-            date_col = detect_column_type(df, ['date', 'time', 'timestamp', 'created'])
-            if date_col and pd.api.types.is_datetime64_any_dtype(df[date_col]):
-                min_date = df[date_col].min().date()
-                max_date = df[date_col].max().date()
+            if date_col and filter_engine['min_date'] is not None:
+                min_date = filter_engine['min_date']
+                max_date = filter_engine['max_date']
                 
                 date_range = st.date_input(
                     "Date Range",
@@ -1443,20 +2250,18 @@ def main():
                     min_value=min_date,
                     max_value=max_date
                 )
-                
-                if len(date_range) == 2:
-                    df = df[(df[date_col].dt.date >= date_range[0]) & 
-                           (df[date_col].dt.date <= date_range[1])]
             
             # Category Filter
-            category_col = st.session_state.category_col if st.session_state.category_col != 'None' else detect_column_type(df, ['category', 'type', 'segment', 'region', 'product', 'department', 'team'])
             if category_col:
-                categories = ['All'] + sorted(df[category_col].unique().tolist())
+                categories = ['All'] + filter_engine['categories']
                 selected_category = st.selectbox("Category Filter", categories)
-                
-                if selected_category != 'All':
-                    df = df[df[category_col] == selected_category]
             
+            df = apply_filters(filter_engine, date_range, selected_category)
+            st.session_state.filter_key = (
+                st.session_state.get('dataset_fingerprint'),
+                date_col, tuple(date_range) if date_range else None,
+                category_col, selected_category
+            )
             st.session_state.processed_df = df
             
             st.markdown("---")
@@ -1470,7 +2275,7 @@ def main():
             if st.button("Save Current Filters"):
                 if filter_name:
                     st.session_state.saved_filters[filter_name] = {
-                        'date_range': date_range if date_col else None,
+                        'date_range': date_range,
                         'category': selected_category if category_col else None
                     }
                     show_toast(f"Filter '{filter_name}' saved!", "success")
@@ -1497,7 +2302,7 @@ def main():
         with tab1:
             # KPIs
             st.subheader("📈 Key Performance Indicators")
-            kpis = calculate_kpis(df)
+            kpis = get_dashboard_kpis(df)
             
             # Check and display alerts
             alerts = check_alerts(kpis)
@@ -1563,23 +2368,51 @@ def main():
             st.subheader("📊 Period Comparison")
             comparison_period = st.select_slider(
                 "Compare to:",
-                options=['month', 'quarter', 'year'],
+                options=['week', 'month', 'quarter', 'year', 'custom'],
                 value='month'
             )
             
-            comparison = calculate_period_comparison(df, comparison_period)
+            period_engine = get_dashboard_period_engine(df)
+            custom_windows = None
+            if comparison_period == 'custom' and period_engine is not None:
+                last_date = period_engine['dates'][-1].date()
+                first_date = period_engine['dates'][0].date()
+                col1, col2 = st.columns(2)
+                with col1:
+                    current_window = st.date_input(
+                        "Current Window",
+                        value=(max(first_date, last_date - timedelta(days=29)), last_date),
+                        min_value=first_date,
+                        max_value=last_date
+                    )
+                with col2:
+                    previous_window = st.date_input(
+                        "Previous Window",
+                        value=(max(first_date, last_date - timedelta(days=59)), max(first_date, last_date - timedelta(days=30))),
+                        min_value=first_date,
+                        max_value=last_date
+                    )
+                if len(current_window) == 2 and len(previous_window) == 2:
+                    custom_windows = (current_window, previous_window)
+            
+            comparison = calculate_period_comparison(df, comparison_period, custom_windows, period_engine) if period_engine else calculate_period_comparison(df, comparison_period, custom_windows)
+            period_label = 'Window' if comparison_period == 'custom' else comparison_period.title()
             
             col1, col2, col3 = st.columns(3)
             with col1:
                 st.metric(
-                    f"Current {comparison_period.title()}",
+                    f"Current {period_label}",
                     f"${comparison['current_period']:,.2f}"
                 )
+                if comparison['current_window']:
+                    st.caption(f"{comparison['current_window'][0]:%b %d, %Y} – {comparison['current_window'][1]:%b %d, %Y}")
             with col2:
                 st.metric(
-                    f"Previous {comparison_period.title()}",
+                    f"Previous {period_label}",
                     f"${comparison['previous_period']:,.2f}"
                 )
+                if comparison['previous_window']:
+                    st.caption(f"{comparison['previous_window'][0]:%b %d, %Y} – {comparison['previous_window'][1]:%b %d, %Y}")
             with col3:
                 st.metric(
                     "Change",
@@ -1587,6 +2420,29 @@ def main():
                     f"{comparison['change_percent']:.1f}%"
                 )
             
+            if period_engine is not None and comparison_period in ROLLING_WINDOW_DAYS:
+                with st.expander("📈 Rolling Comparison"):
+                    window_days = ROLLING_WINDOW_DAYS[comparison_period]
+                    rolling = calculate_rolling_comparison(period_engine, window_days)
+                    if not rolling.empty:
+                        change = downsample_series(rolling.set_index('Date')['Change %'].dropna(), method='minmax')
+                        fig = px.line(
+                            change.rename_axis('Date').reset_index(),
+                            x='Date',
+                            y='Change %',
+                            title=f'Trailing {window_days}-Day Change vs Previous {window_days} Days'
+                        )
+                        fig.update_layout(
+                            plot_bgcolor='rgba(0,0,0,0)',
+                            paper_bgcolor='rgba(0,0,0,0)',
+                            height=300,
+                            hovermode='x unified'
+                        )
+                        fig.update_traces(line_color=st.session_state.primary_color)
+                        st.plotly_chart(fig, use_container_width=True)
+                    else:
+                        st.info("Not enough history for a rolling comparison.")
+            
             st.markdown("---")
             
             # Charts
@@ -1595,24 +2451,26 @@ def main():
             col1, col2 = st.columns(2)
             
             with col1:
-                fig = create_time_series_chart(df)
+                trend_resolution = st.radio("Trend Resolution:", list(CHART_RESOLUTIONS.keys()), horizontal=True)
+                fig = get_cached_figure('time_series', create_time_series_chart, df, CHART_RESOLUTIONS[trend_resolution])
                 if fig:
                     st.plotly_chart(fig, use_container_width=True)
             
             with col2:
-                fig = create_categorical_chart(df)
+                top_k = st.slider("Top N:", TOP_K_MIN, TOP_K_MAX, TOP_K_DEFAULT)
+                fig = get_cached_figure('categorical', create_categorical_chart, df, top_k)
                 if fig:
                     st.plotly_chart(fig, use_container_width=True)
             
             col1, col2 = st.columns(2)
             
             with col1:
-                fig = create_distribution_chart(df)
+                fig = get_cached_figure('distribution', create_distribution_chart, df)
                 if fig:
                     st.plotly_chart(fig, use_container_width=True)
             
             with col2:
-                fig = create_top_performers_chart(df)
+                fig = get_cached_figure('top_performers', create_top_performers_chart, df, top_k)
                 if fig:
                     st.plotly_chart(fig, use_container_width=True)
         
@@ -1625,9 +2483,31 @@ def main():
                 ["RFM Analysis", "Customer Lifetime Value", "Cohort Analysis", "Anomaly Detection"]
             )
             
+            out_of_core = None
+            if analytics_type in OUT_OF_CORE_ANALYSES:
+                with st.expander("🗄️ Out-of-Core Mode"):
+                    st.caption("Analyze a directory of date-partitioned Parquet files that does not fit in memory.")
+                    partition_dir = st.text_input("Parquet Directory:", value=st.session_state.get('out_of_core_dir', ''))
+                    
+                    if not PARQUET_AVAILABLE:
+                        st.warning("Install pyarrow to enable out-of-core analysis.")
+                    elif st.button("🚀 Scan Partitions") and partition_dir:
+                        with st.spinner(f"Scanning partitions with {OUT_OF_CORE_WORKERS} workers..."):
+                            try:
+                                st.session_state.out_of_core_results = run_out_of_core_analysis(partition_dir)
+                                st.session_state.out_of_core_dir = partition_dir
+                            except Exception as e:
+                                st.error(f"Out-of-core scan failed: {str(e)}")
+                    
+                    results = st.session_state.get('out_of_core_results')
+                    if results and results['root'] == partition_dir:
+                        st.caption(f"{results['rows']:,} rows from {results['partitions']} partitions in {results['seconds']:.1f}s")
+                        if st.checkbox("Use partitioned data", value=True):
+                            out_of_core = results
+            
             if analytics_type == "RFM Analysis":
                 st.markdown("### 📊 RFM (Recency, Frequency, Monetary) Analysis")
-                rfm_df = calculate_rfm(df)
+                rfm_df = out_of_core['rfm'] if out_of_core else get_rfm_table(df)
                 
                 if not rfm_df.empty:
                     col1, col2 = st.columns([2, 1])
@@ -1657,13 +2537,13 @@ def main():
             
             elif analytics_type == "Customer Lifetime Value":
                 st.markdown("### 💰 Customer Lifetime Value Analysis")
-                clv_df = calculate_customer_lifetime_value(df)
+                clv_df = out_of_core['clv'] if out_of_core else calculate_customer_lifetime_value(df)
                 
                 if not clv_df.empty:
                     col1, col2 = st.columns([2, 1])
                     
                     with col1:
-                        st.dataframe(clv_df.head(20), use_container_width=True)
+                        st.dataframe(top_k_rows(clv_df, 'CLV', CLV_TABLE_ROWS), use_container_width=True)
                     
                     with col2:
                         avg_clv = clv_df['CLV'].mean()
@@ -1685,12 +2565,27 @@ def main():
             
             elif analytics_type == "Cohort Analysis":
                 st.markdown("### 📅 Cohort Retention Analysis")
-                cohort_df = perform_cohort_analysis(df)
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    cohort_period = st.selectbox("Cohort Period:", list(COHORT_FREQUENCIES.keys()))
+                with col2:
+                    retention_metric = st.selectbox("Retention Metric:", list(RETENTION_METRICS.keys()))
+                frequency = COHORT_FREQUENCIES[cohort_period]
+                
+                if out_of_core and frequency == 'week':
+                    st.info("Partitioned data is aggregated by month; choose Monthly or Quarterly cohorts.")
+                    cohorts = {}
+                elif out_of_core:
+                    cohorts = cohort_tables_from_pairs(out_of_core['pairs'], frequency)
+                else:
+                    cohorts = get_cohort_analysis(df, frequency)
+                cohort_df = cohorts.get(RETENTION_METRICS[retention_metric], pd.DataFrame())
                 
                 if not cohort_df.empty:
                     fig = px.imshow(
                         cohort_df,
-                        title='Cohort Retention Heatmap (%)',
+                        title=f'{retention_metric} Retention Heatmap (%)',
                         labels=dict(x="Period", y="Cohort", color="Retention %"),
                         color_continuous_scale='RdYlGn',
                         aspect='auto'
@@ -1698,9 +2593,10 @@ def main():
                     st.plotly_chart(fig, use_container_width=True)
                     
                     st.markdown("#### 💡 How to Read:")
-                    st.markdown("""
-                    - **Rows**: Customer acquisition cohorts (by month)
-                    - **Columns**: Periods after acquisition
+                    st.markdown(f"""
+                    - **Rows**: Customer acquisition cohorts (by {frequency})
+                    - **Columns**: {frequency.title()}s after acquisition
+                    - **Values**: {'Share of the cohort still purchasing' if RETENTION_METRICS[retention_metric] == 'customers' else 'Cohort revenue relative to its first ' + frequency}
                     - **Colors**: Green = high retention, Red = low retention
                     """)
                 else:
@@ -1709,55 +2605,215 @@ def main():
             elif analytics_type == "Anomaly Detection":
                 st.markdown("### 🚨 Anomaly Detection")
                 
-                sensitivity = st.slider("Sensitivity (Z-Score)", 1.0, 3.0, 2.0, 0.5)
-                anomalies_df = detect_anomalies(df, sensitivity)
+                sensitivity = st.slider("Sensitivity (Robust Z-Score)", 1.5, 5.0, ANOMALY_SENSITIVITY, 0.5)
+                st.caption(
+                    f"Each day is compared with the median of the previous {ANOMALY_WINDOW_DAYS} days plus its "
+                    f"weekday pattern over the last {ANOMALY_SEASON_WEEKS} weeks, scaled by the median absolute deviation."
+                )
+                anomaly_scope = st.radio("Scan:", ["Total Revenue", "All Segments"], horizontal=True)
                 
-                if not anomalies_df.empty:
-                    st.markdown(f"**Found {len(anomalies_df)} anomalies**")
+                if anomaly_scope == "All Segments":
+                    dimension_options = [
+                        col for col in df.columns
+                        if not pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_datetime64_any_dtype(df[col])
+                    ]
+                    metric_options = [
+                        col for col in df.columns
+                        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+                    ]
+                    value_col = get_column_roles(df)['value']
+                    default_dimensions = [col for col in dimension_options if col.lower() in ('category', 'region')] or dimension_options[:1]
+                    scan_dimensions = st.multiselect("Segment by:", dimension_options, default=default_dimensions)
+                    scan_metrics = st.multiselect("Metrics:", metric_options, default=[value_col] if value_col in metric_options else metric_options[:1])
                     
-                    fig = px.scatter(
-                        anomalies_df,
-                        x='Date',
-                        y='Revenue',
-                        size=abs(anomalies_df['z_score']),
-                        color='z_score',
-                        title='Revenue Anomalies',
-                        color_continuous_scale='RdYlGn',
-                        color_continuous_midpoint=0
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+                    ranked = get_segment_anomalies(df, scan_dimensions, scan_metrics)
+                    segment_anomalies = ranked[ranked['z_score'].abs() > sensitivity] if not ranked.empty else ranked
+                    st.caption(f"Every segment and metric is scored over the last {ANOMALY_SCAN_DAYS} days; the most anomalous {ANOMALY_SCAN_TOP} segment-days are ranked.")
                     
-                    st.dataframe(anomalies_df, use_container_width=True)
+                    if not segment_anomalies.empty:
+                        st.markdown(f"**Found {len(segment_anomalies)} anomalous segment-days**")
+                        
+                        top_segments = segment_anomalies.head(20).assign(
+                            Label=lambda frame: frame['Dimension'] + ": " + frame['Segment'] + " · " + frame['Metric']
+                        )
+                        fig = px.bar(
+                            top_segments.iloc[::-1],
+                            x='z_score',
+                            y='Label',
+                            orientation='h',
+                            color='z_score',
+                            hover_data=['Date', 'Value', 'Expected'],
+                            title='Most Anomalous Segments',
+                            color_continuous_scale='RdYlGn',
+                            color_continuous_midpoint=0
+                        )
+                        st.plotly_chart(fig, use_container_width=True)
+                        
+                        st.dataframe(segment_anomalies, use_container_width=True)
+                    else:
+                        st.success("✅ No significant segment anomalies detected!")
                 else:
-                    st.success("✅ No significant anomalies detected!")
+                    anomalies_df = detect_anomalies(df, sensitivity)
+                    
+                    if not anomalies_df.empty:
+                        st.markdown(f"**Found {len(anomalies_df)} anomalies**")
+                        
+                        fig = px.scatter(
+                            anomalies_df,
+                            x='Date',
+                            y='Revenue',
+                            size=abs(anomalies_df['z_score']),
+                            color='z_score',
+                            title='Revenue Anomalies',
+                            color_continuous_scale='RdYlGn',
+                            color_continuous_midpoint=0
+                        )
+                        st.plotly_chart(fig, use_container_width=True)
+                        
+                        st.dataframe(anomalies_df, use_container_width=True)
+                    else:
+                        st.success("✅ No significant anomalies detected!")
         
         # Tab 3: Forecasting
         with tab3:
             st.subheader("🔮 Revenue Forecasting")
             
-            forecast_days = st.slider("Forecast Period (days)", 7, 90, 30)
-            
-            if st.button("🚀 Generate Forecast", type="primary"):
-                with st.spinner("Building forecast model..."):
-                    forecast_df, forecast_fig = forecast_revenue(df, forecast_days)
-                    
-                    if forecast_fig:
-                        st.plotly_chart(forecast_fig, use_container_width=True)
-                        
-                        if not forecast_df.empty:
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                forecast_days = st.slider("Forecast Period (days)", 7, 90, 30)
+            with col2:
+                # Without Prophet the built-in engines replace the flat moving-average fallback
+                engine_options = list(FORECAST_ENGINES.keys()) if PROPHET_AVAILABLE else list(FORECAST_ENGINES.keys())[1:]
+                forecast_engine = FORECAST_ENGINES[st.selectbox("Forecast Engine:", engine_options)]
+            forecast_mode = st.radio("Forecast Mode:", ["Total Revenue", "Batch by Dimension"], horizontal=True)
+            daily_revenue = get_forecast_history(df) if forecast_mode == "Total Revenue" else pd.DataFrame()
+            
+            if forecast_mode == "Batch by Dimension":
+                dimension_options = [
+                    col for col in df.columns
+                    if not pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_datetime64_any_dtype(df[col])
+                ]
+                default_dimensions = [col for col in dimension_options if col.lower() in ('category', 'region')]
+                dimensions = st.multiselect("Forecast each:", dimension_options, default=default_dimensions)
+                
+                if st.button("🚀 Generate Batch Forecast", type="primary") and dimensions:
+                    histories = build_dimension_histories(df, dimensions)
+                    if forecast_engine in FAST_ENGINES:
+                        st.session_state.batch_forecast = {
+                            'histories': histories,
+                            'series_keys': None,
+                            'batch': run_fast_batch_forecast(histories, forecast_days, forecast_engine) if histories else None
+                        }
+                    else:
+                        st.session_state.batch_forecast = {
+                            'histories': histories,
+                            'series_keys': submit_batch_forecast(histories, forecast_days),
+                            'batch': None
+                        }
+                
+                batch_request = st.session_state.get('batch_forecast')
+                if batch_request and (batch_request['series_keys'] or batch_request['batch']):
+                    batch = batch_request['batch'] or get_batch_forecast(batch_request['series_keys'])
+                    if batch['status'] == 'running':
+                        render_batch_status(batch_request['series_keys'])
+                    else:
+                        if not batch['forecasts'].empty:
+                            st.plotly_chart(
+                                build_batch_forecast_figure(batch_request['histories'], batch['forecasts']),
+                                use_container_width=True
+                            )
                             st.markdown("### 📊 Forecast Data")
-                            st.dataframe(forecast_df, use_container_width=True)
-                            
-                            # Download forecast
-                            csv = forecast_df.to_csv(index=False)
+                            st.dataframe(batch['forecasts'], use_container_width=True)
                             st.download_button(
-                                label="📥 Download Forecast CSV",
-                                data=csv,
-                                file_name=f"forecast_{datetime.now().strftime('%Y%m%d')}.csv",
+                                label="📥 Download Batch Forecast CSV",
+                                data=lambda: batch['forecasts'].to_csv(index=False),
+                                file_name=f"batch_forecast_{datetime.now().strftime('%Y%m%d')}.csv",
                                 mime="text/csv"
                             )
-                    else:
-                        st.error("Unable to generate forecast. Check data quality.")
+                        with st.expander("Series Status"):
+                            st.dataframe(batch['summary'], use_container_width=True)
+                elif batch_request is not None:
+                    st.info("No series found for the selected dimensions.")
+            elif daily_revenue.empty:
+                st.info("Forecasting requires date and value columns.")
+            else:
+                forecast_key = (compute_series_fingerprint(daily_revenue), forecast_days)
+                
+                if forecast_engine in FAST_ENGINES:
+                    # Built-in engines take milliseconds, so they run directly on every rerun
+                    forecast_job = {'status': 'done', 'result': run_forecast_job(daily_revenue, forecast_days, engine=forecast_engine)}
+                else:
+                    # Changing only the horizon reuses the fitted model, so no new fit is needed
+                    # Failed jobs are not resubmitted automatically, so their error stays on screen until the button is clicked
+                    generate = st.button("🚀 Generate Forecast", type="primary")
+                    if generate or has_forecast_model(forecast_key[0]):
+                        submit_forecast_job(daily_revenue, forecast_days, retry=generate)
+                    
+                    forecast_job = get_forecast_job(forecast_key)
+                
+                if forecast_job['status'] == 'running':
+                    render_forecast_status(forecast_key)
+                elif forecast_job['status'] == 'failed':
+                    st.error(f"Forecast error: {forecast_job['error']}")
+                elif forecast_job['status'] == 'done':
+                    forecast_result = forecast_job['result']
+                    forecast_df = get_forecast_table(forecast_result, forecast_days)
+                    st.plotly_chart(build_forecast_figure(daily_revenue, forecast_result), use_container_width=True)
+                    model_note = MODEL_SOURCE_LABELS.get(forecast_result['model_source'], '')
+                    st.caption(f"Model: {FORECAST_METHOD_LABELS.get(forecast_result['method'])}{model_note} · computed in {forecast_result['seconds']:.2f}s")
+                    
+                    if not forecast_df.empty:
+                        st.markdown("### 📊 Forecast Data")
+                        st.dataframe(forecast_df, use_container_width=True)
+                        
+                        # Download forecast
+                        st.download_button(
+                            label="📥 Download Forecast CSV",
+                            data=lambda: forecast_df.to_csv(index=False),
+                            file_name=f"forecast_{datetime.now().strftime('%Y%m%d')}.csv",
+                            mime="text/csv"
+                        )
+                
+                with st.expander("⚖️ Engine Backtest"):
+                    st.caption(
+                        f"Rolling-origin evaluation: each fold trains on the history before a cutoff and forecasts "
+                        f"the next {forecast_days} days; cutoffs step back {forecast_days} days at a time."
+                    )
+                    backtest_folds = st.number_input("Folds:", min_value=1, max_value=12, value=BACKTEST_FOLDS)
+                    if st.button("Run Backtest"):
+                        engines = [engine for label, engine in FORECAST_ENGINES.items() if label in engine_options] + ['moving_average']
+                        backtest = submit_backtest(daily_revenue, forecast_days, engines, int(backtest_folds))
+                        if backtest['folds']:
+                            st.session_state.engine_backtest = backtest
+                        else:
+                            st.warning("Not enough history for a backtest at this horizon.")
+                    
+                    # A backtest of other data, filters or horizon no longer applies
+                    if st.session_state.get('engine_backtest') is not None \
+                            and st.session_state.engine_backtest['key'] != forecast_key:
+                        st.session_state.engine_backtest = None
+                    
+                    if st.session_state.get('engine_backtest') is not None:
+                        backtest_status = get_backtest(st.session_state.engine_backtest)
+                        if backtest_status['status'] == 'running':
+                            render_backtest_status(st.session_state.engine_backtest)
+                        elif not backtest_status['summary'].empty:
+                            summary = backtest_status['summary'].copy()
+                            summary['Engine'] = summary['Engine'].map(FORECAST_METHOD_LABELS)
+                            st.dataframe(
+                                summary.drop(columns='Model').round(
+                                    {'MAPE': 2, 'sMAPE': 2, 'Coverage': 1, 'Fit Seconds': 3, 'Predict Seconds': 3}
+                                ),
+                                use_container_width=True
+                            )
+                            st.caption(
+                                f"{st.session_state.engine_backtest['folds']} folds per engine · "
+                                f"{backtest_status['failed']} failed · finished in {backtest_status['seconds']:.1f}s"
+                            )
+                            with st.expander("Per-fold results"):
+                                st.dataframe(backtest_status['folds'], use_container_width=True)
+                        else:
+                            st.error("Every backtest fold failed.")
         
         # Tab 4: Reports
         with tab4:
@@ -1770,51 +2826,43 @@ def main():
             with col1:
                 st.markdown("#### Excel Report")
                 st.markdown("Comprehensive report with KPIs, data, and statistics")
-                
-                if st.button("📊 Generate Excel Report", key="excel"):
-                    with st.spinner("Generating Excel report..."):
-                        kpis = calculate_kpis(df)
-                        excel_file = export_to_excel(df, kpis)
-                        
-                        st.download_button(
-                            label="📥 Download Excel",
-                            data=excel_file,
-                            file_name=f"bi_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                        show_toast("Excel report generated!", "success")
+                export_download_button(
+                    "📊 Download Excel Report", df, kpis, 'xlsx',
+                    f"bi_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}", key="excel"
+                )
             
             with col2:
                 st.markdown("#### PDF Summary")
                 st.markdown("Executive summary with key metrics")
                 
                 if REPORTLAB_AVAILABLE:
-                    if st.button("📄 Generate PDF Report", key="pdf"):
-                        with st.spinner("Generating PDF report..."):
-                            kpis = calculate_kpis(df)
-                            pdf_file = export_to_pdf(df, kpis)
-                            
-                            if pdf_file:
-                                st.download_button(
-                                    label="📥 Download PDF",
-                                    data=pdf_file,
-                                    file_name=f"bi_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                                    mime="application/pdf"
-                                )
-                                show_toast("PDF report generated!", "success")
+                    export_download_button(
+                        "📄 Download PDF Report", df, kpis, 'pdf',
+                        f"bi_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}", key="pdf"
+                    )
                 else:
                     st.warning("PDF export requires reportlab package")
             
+            st.markdown("#### Report Bundle")
+            st.markdown("Excel, PDF, CSV and chart files in one zip, rendered in parallel, with a timings manifest")
+            export_download_button(
+                "📦 Download Report Bundle", df, kpis, 'bundle',
+                f"bi_bundle_{datetime.now().strftime('%Y%m%d_%H%M%S')}", key="bundle"
+            )
+            
             st.markdown("---")
             
             st.markdown("### 📋 Data Export")
+            st.caption("Files are generated when you click download and cached for the current filters.")
             
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="📥 Download Filtered Data (CSV)",
-                data=csv,
-                file_name=f"filtered_data_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
+            format_options = [
+                label for label, export_format in DATA_EXPORT_FORMATS.items()
+                if (export_format != 'parquet' or PARQUET_AVAILABLE) and (export_format != 'csv.zst' or ZSTD_AVAILABLE)
+            ]
+            export_format = DATA_EXPORT_FORMATS[st.selectbox("Format:", format_options)]
+            export_download_button(
+                "📥 Download Filtered Data", df, kpis, export_format,
+                f"filtered_data_{datetime.now().strftime('%Y%m%d')}", key="data_export"
             )
         
         # Tab 5: AI Insights
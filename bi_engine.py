@@ -0,0 +1,2059 @@
+"""
+Autonomous BI Suite - Analytics Engine
+Streamlit-free analytics that can run in worker processes.
+"""
+
+import os
+import gzip
+import json
+import time
+import warnings
+import hashlib
+import signal
+import shutil
+import zipfile
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from io import BytesIO
+from typing import Optional, Tuple, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import multiprocessing
+import importlib
+import importlib.util
+from functools import lru_cache
+
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+# detect_date_format tries dayfirst=True on every value, which warns for month-first dates. Columns are
+# inferred on worker threads and warnings.catch_warnings is not thread-safe, so the filter is set once here
+warnings.filterwarnings('ignore', message=r'Parsing dates in .* format when dayfirst=True', category=UserWarning)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.types as pat
+    PARQUET_AVAILABLE = True
+    ZSTD_AVAILABLE = pa.Codec.is_available('zstd')
+except:
+    PARQUET_AVAILABLE = False
+    ZSTD_AVAILABLE = False
+
+# Heavy optional backends are imported on first use, so workers and the app start without paying for them
+def module_available(name: str) -> bool:
+    """Check whether a module is installed without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+@lru_cache(maxsize=None)
+def lazy_import(name: str):
+    """Import a module the first time it is needed and return the same module afterwards."""
+    return importlib.import_module(name)
+
+@lru_cache(maxsize=None)
+def module_importable(name: str) -> bool:
+    """Import a module once to confirm an installed backend actually loads."""
+    try:
+        lazy_import(name)
+        return True
+    except ImportError:
+        return False
+
+PROPHET_AVAILABLE = module_available('prophet')
+REPORTLAB_AVAILABLE = module_available('reportlab')
+
+# Local cache shared by the app and the command line
+CACHE_ROOT = os.getenv("BI_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bi_cache"))
+MODEL_CACHE_DIR = os.path.join(CACHE_ROOT, "models")
+MODEL_CACHE_MAX_BYTES = int(os.getenv("BI_MODEL_CACHE_MAX_MB", "256")) * 1024 * 1024
+INGEST_CACHE_DIR = os.path.join(CACHE_ROOT, "ingest")
+INGEST_CACHE_MAX_BYTES = int(os.getenv("BI_INGEST_CACHE_MAX_MB", "2048")) * 1024 * 1024
+INGEST_PIPELINE_VERSION = 2
+# Parquet footer key holding the type inference report of a cached ingest
+TYPE_REPORT_METADATA_KEY = b'bi_type_report'
+
+# Number of partial results held before they are folded together
+PARTITION_MERGE_BATCH = 8
+
+# Prophet configuration shared by every forecast
+PROPHET_SETTINGS = {'daily_seasonality': False, 'yearly_seasonality': True, 'weekly_seasonality': True}
+PROPHET_MIN_DAYS = 30
+
+# Built-in NumPy engines; intervals match Prophet's default 80% width
+FAST_ENGINES = ('holt_winters', 'fourier_ridge')
+FORECAST_INTERVAL_Z = 1.2816
+RIDGE_PENALTY = 1.0
+WEEKLY_FOURIER_ORDER = 3
+YEARLY_FOURIER_ORDER = 6
+HOLT_WINTERS_GRID = {'alpha': [0.05, 0.2, 0.5], 'beta': [0.0, 0.05], 'gamma': [0.05, 0.2]}
+HOLT_WINTERS_DAMPING = 0.98
+
+# Robust anomaly scoring: trailing level window, weekday season depth, MAD-to-sigma factor
+ANOMALY_WINDOW_DAYS = 28
+ANOMALY_SEASON_WEEKS = 8
+MAD_SCALE = 1.4826
+
+# Default robust z-score above which a day is reported as an anomaly
+ANOMALY_SENSITIVITY = 3.0
+
+# RFM segments as (name, minimum RFM_Total), checked in order
+RFM_SEGMENT_RULES = [
+    ('Champions', 13),
+    ('Loyal Customers', 10),
+    ('Potential Loyalists', 7),
+    ('At Risk', 5),
+]
+RFM_DEFAULT_SEGMENT = 'Lost'
+
+# Segment scan: most recent days ranked, segment-days kept, share of trailing days with activity to be scored
+ANOMALY_SCAN_DAYS = 30
+ANOMALY_SCAN_TOP = 200
+ANOMALY_MIN_ACTIVE_SHARE = 0.5
+
+# Cells per block when sorting rolling windows, bounding scratch memory
+ROLLING_BLOCK_CELLS = 8_000_000
+
+# Chart payload bounds: points per line, histogram bins, longest span plotted per time bin
+CHART_MAX_POINTS = 500
+CHART_HISTOGRAM_BINS = 30
+CHART_RESOLUTION_MAX_DAYS = {'day': 180, 'week': 1200}
+CHART_RESAMPLE_RULES = {'week': 'W-MON', 'month': 'MS'}
+
+# Excel export: worksheet row limit (header included) and rows converted per batch
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_CHUNK_ROWS = 50_000
+EXCEL_NATIVE_TYPES = (str, bool, int, float, np.number, np.bool_, datetime)
+
+# Data exports: rows serialized per chunk, and file extension and MIME type per format
+EXPORT_CHUNK_ROWS = 100_000
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'csv.gz': ('csv.gz', 'application/gzip'),
+    'csv.zst': ('csv.zst', 'application/zstd'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('pdf', 'application/pdf'),
+    'bundle': ('zip', 'application/zip')
+}
+
+# Report bundles: worker processes, default artifacts, file names inside the zip and chart image size
+REPORT_WORKERS = int(os.getenv("BI_REPORT_WORKERS", min(4, os.cpu_count() or 1)))
+REPORT_BUNDLE_FORMATS = ('xlsx', 'pdf', 'csv')
+REPORT_ARTIFACT_NAMES = {'xlsx': 'report', 'pdf': 'summary'}
+REPORT_CHART_SIZE = (1200, 600)
+REPORT_TOP_K = 10
+# Already-compressed artifacts are stored in the zip as they are
+REPORT_STORED_EXTENSIONS = ('.xlsx', '.parquet', '.gz', '.zst', '.png')
+
+# Rolling-origin backtest defaults
+BACKTEST_FOLDS = int(os.getenv("BI_BACKTEST_FOLDS", "4"))
+BACKTEST_MIN_TRAIN_DAYS = 30
+
+# Headless batch runs: analyses available, worker processes and the file types read from a directory
+BATCH_ANALYSES = ('kpis', 'rfm', 'clv', 'cohorts', 'anomalies', 'forecast')
+BATCH_WORKERS = int(os.getenv("BI_BATCH_WORKERS", min(4, os.cpu_count() or 1)))
+DATASET_EXTENSIONS = ('.csv', '.xlsx', '.xls', '.parquet')
+
+# Type inference settings
+TYPE_INFERENCE_SAMPLE_ROWS = 1000
+TYPE_INFERENCE_WORKERS = int(os.getenv("BI_TYPE_INFERENCE_WORKERS", "4"))
+DATE_MATCH_THRESHOLD = 0.5
+NUMERIC_MATCH_THRESHOLD = 0.8
+
+# ============================================================================
+# FILE CACHE HELPERS
+# ============================================================================
+
+def evict_cache_dir(cache_dir: str, max_bytes: int):
+    """Delete least recently used files until the directory fits within max_bytes."""
+    try:
+        entries = []
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if os.path.isfile(path) and not name.endswith('.tmp'):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+    except FileNotFoundError:
+        return
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total_bytes -= size
+        except OSError:
+            pass
+
+def write_json_atomic(path: str, payload: Dict[str, Any]):
+    """Write a JSON file through a temporary file so readers never see partial content."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+# ============================================================================
+# TYPE INFERENCE & COLUMN ROLES
+# ============================================================================
+
+def infer_column_types(df: pd.DataFrame, sample_rows: int = TYPE_INFERENCE_SAMPLE_ROWS,
+                       max_workers: int = TYPE_INFERENCE_WORKERS) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Detect numeric and date columns stored as text, converting only the columns that pass."""
+    text_cols = [col for col in df.columns if is_text_column(df[col])]
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = list(executor.map(lambda col: infer_single_column(df[col], sample_rows), text_cols))
+
+    report = []
+    for col, (converted, info) in zip(text_cols, results):
+        if converted is not None:
+            df[col] = converted
+        report.append({'Column': col, **info})
+
+    report_df = pd.DataFrame(report, columns=['Column', 'Inferred Type', 'Format', 'Sample Match %', 'Seconds'])
+    return df, report_df
+
+def is_text_column(series: pd.Series) -> bool:
+    """Check for object or string dtype without scanning the values."""
+    return pd.api.types.is_object_dtype(series.dtype) or isinstance(series.dtype, pd.StringDtype)
+
+def stratified_sample(series: pd.Series, sample_rows: int, strata: int = 10) -> pd.Series:
+    """Take an equal number of random rows from evenly sized slices of the column."""
+    n = len(series)
+    if n <= sample_rows:
+        return series
+
+    rng = np.random.default_rng(42)
+    bounds = np.linspace(0, n, strata + 1).astype(int)
+    per_stratum = max(1, sample_rows // strata)
+    positions = np.concatenate([
+        rng.choice(np.arange(lo, hi), size=min(per_stratum, hi - lo), replace=False)
+        for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+    ])
+    return series.iloc[np.sort(positions)]
+
+def detect_date_format(sample: pd.Series) -> Tuple[str, float]:
+    """Pick the date format that parses the largest share of a sample."""
+    candidates = set()
+    for value in sample.dropna().astype(str).head(20):
+        for dayfirst in (False, True):
+            fmt = guess_datetime_format(value, dayfirst=dayfirst)
+            if fmt:
+                candidates.add(fmt)
+
+    best_format, best_ratio = 'mixed', 0.0
+    for fmt in sorted(candidates) or ['mixed']:
+        ratio = pd.to_datetime(sample, errors='coerce', format=fmt).notna().mean()
+        if ratio > best_ratio:
+            best_format, best_ratio = fmt, ratio
+    return best_format, best_ratio
+
+def infer_single_column(series: pd.Series, sample_rows: int) -> Tuple[Optional[pd.Series], Dict[str, Any]]:
+    """Classify one text column from a sample; return the fully converted column if it passes."""
+    start = time.perf_counter()
+    info = {'Inferred Type': 'text', 'Format': None, 'Sample Match %': 0.0}
+    converted = None
+
+    try:
+        sample = stratified_sample(series, sample_rows)
+        if len(sample) > 0:
+            numeric_ratio = pd.to_numeric(sample, errors='coerce').notna().mean()
+            if numeric_ratio > NUMERIC_MATCH_THRESHOLD:
+                info.update({'Inferred Type': 'numeric', 'Sample Match %': numeric_ratio * 100})
+                candidate = pd.to_numeric(series, errors='coerce')
+                if candidate.notna().mean() > NUMERIC_MATCH_THRESHOLD:
+                    converted = candidate
+            else:
+                date_format, date_ratio = detect_date_format(sample)
+                if date_ratio > DATE_MATCH_THRESHOLD:
+                    info.update({'Inferred Type': 'datetime', 'Format': date_format, 'Sample Match %': date_ratio * 100})
+                    candidate = pd.to_datetime(series, errors='coerce', format=date_format)
+                    if candidate.notna().mean() > DATE_MATCH_THRESHOLD:
+                        converted = candidate
+
+        if converted is None and info['Inferred Type'] != 'text':
+            # The sample passed but the full column did not; keep it as text
+            info['Inferred Type'] = 'text'
+    except Exception:
+        converted = None
+        info['Inferred Type'] = 'text'
+
+    info['Seconds'] = round(time.perf_counter() - start, 4)
+    return converted, info
+
+
+# Keyword lists per column role, in priority order
+COLUMN_ROLE_KEYWORDS = {
+    'date': ['date', 'time', 'timestamp', 'created', 'order', 'year'],
+    'value': ['revenue', 'amount', 'sales', 'price', 'value', 'total', 'runs', 'score', 'salary', 'rating', 'points', 'goals', 'count'],
+    'entity': ['customer', 'client', 'user', 'player', 'employee', 'person', 'name', 'id'],
+    'customer': ['customer', 'client', 'user'],
+    'category': ['category', 'type', 'segment', 'region', 'product', 'department', 'team'],
+    'name': ['product', 'name', 'item', 'customer', 'city', 'state', 'player', 'employee', 'team'],
+    'profit': ['profit', 'margin', 'earnings', 'wickets', 'assists'],
+    'quantity': ['quantity', 'units', 'qty', 'count'],
+}
+NUMERIC_ROLES = {'value', 'profit', 'quantity'}
+
+def get_schema_fingerprint(df: pd.DataFrame) -> Tuple[Tuple[str, str], ...]:
+    """Summarise column names and kinds; column roles depend on nothing else."""
+    fingerprint = []
+    for col, dtype in df.dtypes.items():
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            kind = 'datetime'
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            kind = 'numeric'
+        else:
+            kind = 'other'
+        fingerprint.append((str(col), kind))
+    return tuple(fingerprint)
+
+def resolve_schema_roles(schema: Tuple[Tuple[str, str], ...]) -> Dict[str, Optional[str]]:
+    """Pick a column for every role by keyword priority and data type."""
+    roles = {}
+    for role, keywords in COLUMN_ROLE_KEYWORDS.items():
+        candidates = []
+        for keyword in keywords:
+            for col, kind in schema:
+                if keyword in col.lower() and (col, kind) not in candidates:
+                    candidates.append((col, kind))
+
+        if role in NUMERIC_ROLES:
+            candidates = [c for c in candidates if c[1] == 'numeric']
+        elif role == 'date':
+            # Real datetimes first; numeric columns such as "Year" still support sorting
+            candidates = [c for c in candidates if c[1] == 'datetime'] + [c for c in candidates if c[1] == 'numeric']
+
+        roles[role] = candidates[0][0] if candidates else None
+    return roles
+
+# ============================================================================
+# INGESTION PIPELINE
+# ============================================================================
+
+def compute_file_hash(file) -> str:
+    """Compute a SHA-256 hash of a binary file object's contents."""
+    hasher = hashlib.sha256()
+    if hasattr(file, 'getbuffer'):
+        hasher.update(file.getbuffer())
+    else:
+        file.seek(0)
+        for chunk in iter(lambda: file.read(8 * 1024 * 1024), b''):
+            hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+def get_pipeline_settings(file_name: str, mode: str = 'standard', ai_model: Optional[str] = None) -> Dict[str, Any]:
+    """Describe the settings that influence the cleaned output of the ingestion pipeline."""
+    return {
+        'pipeline_version': INGEST_PIPELINE_VERSION,
+        'mode': mode,
+        'file_type': os.path.splitext(file_name)[1].lower(),
+        'ai_normalization': bool(ai_model),
+        'ai_model': ai_model,
+    }
+
+def get_ingest_cache_key(file, file_name: str, mode: str = 'standard', ai_model: Optional[str] = None) -> str:
+    """Build the cache key from the file content hash plus the pipeline settings."""
+    payload = {
+        'content_hash': compute_file_hash(file),
+        'settings': get_pipeline_settings(file_name, mode, ai_model),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def get_ingest_cache_path(cache_key: str) -> str:
+    """Return the on-disk location of an ingestion cache entry."""
+    return os.path.join(INGEST_CACHE_DIR, f"{cache_key}.parquet")
+
+def type_report_metadata(type_report: Optional[pd.DataFrame]) -> Dict[bytes, bytes]:
+    """Encode a type inference report as Parquet schema metadata."""
+    if type_report is None:
+        return {}
+    return {TYPE_REPORT_METADATA_KEY: type_report.to_json(orient='records').encode()}
+
+def load_type_report(path: str) -> Optional[pd.DataFrame]:
+    """Read the type inference report stored with a cached ingest, if any."""
+    try:
+        report = (pq.read_schema(path).metadata or {}).get(TYPE_REPORT_METADATA_KEY)
+        return pd.DataFrame(json.loads(report)) if report else None
+    except Exception:
+        return None
+
+def load_ingest_cache(cache_key: str) -> Optional[Tuple[pd.DataFrame, Optional[pd.DataFrame]]]:
+    """Load a cleaned DataFrame and its type inference report from the ingestion cache, if present."""
+    if not PARQUET_AVAILABLE:
+        return None
+
+    path = get_ingest_cache_path(cache_key)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        df = pd.read_parquet(path)
+        type_report = load_type_report(path)
+        # Touch the entry so eviction treats it as recently used
+        os.utime(path, None)
+        return df, type_report
+    except Exception:
+        return None
+
+def save_ingest_cache(cache_key: str, df: pd.DataFrame, type_report: Optional[pd.DataFrame] = None):
+    """Store a cleaned DataFrame and its type inference report in the ingestion cache and enforce the size limit."""
+    if not PARQUET_AVAILABLE:
+        return
+
+    os.makedirs(INGEST_CACHE_DIR, exist_ok=True)
+    path = get_ingest_cache_path(cache_key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **type_report_metadata(type_report)})
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        # Frames pyarrow cannot represent (e.g. mixed-type object columns) are simply not cached
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+
+    evict_cache_dir(INGEST_CACHE_DIR, INGEST_CACHE_MAX_BYTES)
+
+def normalize_column_name(col: Any) -> str:
+    """Turn a raw column name into the title-cased form used throughout the app."""
+    return str(col).strip().title().replace('_', ' ')
+
+def handle_duplicate_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Ensure all column names are unique by appending numbers to duplicates."""
+    cols = pd.Series(df.columns)
+    for dup in cols[cols.duplicated()].unique():
+        dup_positions = [i for i, col in enumerate(df.columns) if col == dup]
+        for idx, pos in enumerate(dup_positions[1:], start=2):
+            df.columns.values[pos] = f"{dup} {idx}"
+    return df
+
+def handle_missing_values(df: pd.DataFrame) -> pd.DataFrame:
+    """Intelligently handle missing values based on column type."""
+    for col in df.columns:
+        if df[col].isnull().any():
+            if pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = df[col].fillna(df[col].median())
+            elif pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = df[col].ffill()
+            else:
+                mode_val = df[col].mode()
+                if len(mode_val) > 0:
+                    df[col] = df[col].fillna(mode_val[0])
+                else:
+                    df[col] = df[col].fillna('Unknown')
+    
+    return df
+
+def read_data_file(file, file_name: str) -> pd.DataFrame:
+    """Read a CSV, Excel or Parquet file object, choosing the reader by file name."""
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == '.csv':
+        return pd.read_csv(file)
+    if extension in ('.xlsx', '.xls'):
+        return pd.read_excel(file)
+    if extension == '.parquet':
+        return pd.read_parquet(file)
+    raise ValueError(f"Unsupported file format: {file_name}")
+
+def clean_dataframe(df: pd.DataFrame, rename_columns=None) -> Dict[str, Any]:
+    """Dedupe rows, normalize column names, infer column types and fill missing values."""
+    df = handle_duplicate_columns(df)
+    original_rows = len(df)
+    df = df.drop_duplicates()
+    duplicates_removed = original_rows - len(df)
+
+    if rename_columns is not None:
+        df = rename_columns(df)
+    else:
+        df.columns = [normalize_column_name(col) for col in df.columns]
+
+    df, type_report = infer_column_types(df)
+    df = handle_missing_values(df)
+    return {'df': df, 'type_report': type_report, 'duplicates_removed': duplicates_removed}
+
+def ingest_file(file, file_name: str, rename_columns=None, ai_model: Optional[str] = None) -> Dict[str, Any]:
+    """Clean a data file through the ingestion cache; the app and the command line share both."""
+    cache_key = get_ingest_cache_key(file, file_name, ai_model=ai_model)
+    cached = load_ingest_cache(cache_key)
+    if cached is not None:
+        df, type_report = cached
+        return {'df': df, 'type_report': type_report, 'duplicates_removed': 0, 'cached': True}
+
+    result = clean_dataframe(read_data_file(file, file_name), rename_columns)
+    save_ingest_cache(cache_key, result['df'], result['type_report'])
+    return {**result, 'cached': False}
+
+# ============================================================================
+# CUSTOMER AGGREGATES
+# ============================================================================
+
+def build_customer_aggregates(df: pd.DataFrame, date_col: str, customer_col: str, value_col: str) -> pd.DataFrame:
+    """Reduce transactions to per-customer first/last purchase, order count and revenue."""
+    grouped = df.groupby(customer_col, sort=False)
+    aggregates = pd.DataFrame({
+        'First_Purchase': grouped[date_col].min(),
+        'Last_Purchase': grouped[date_col].max(),
+        'Frequency': grouped.size(),
+        'Monetary': grouped[value_col].sum()
+    })
+    aggregates.index.name = customer_col
+    return aggregates
+
+def combine_customer_aggregates(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """Combine partial per-customer aggregates from disjoint sets of transactions."""
+    combined = pd.concat(parts).groupby(level=0, sort=False).agg({
+        'First_Purchase': 'min',
+        'Last_Purchase': 'max',
+        'Frequency': 'sum',
+        'Monetary': 'sum'
+    })
+    combined.index.name = parts[0].index.name
+    return combined
+
+def build_customer_month_pairs(df: pd.DataFrame, date_col: str, customer_col: str, value_col: str) -> pd.DataFrame:
+    """Reduce transactions to revenue per (customer, month code) activity pair."""
+    valid = df[date_col].notna().to_numpy()
+    pairs = pd.DataFrame({
+        'Customer': df[customer_col].to_numpy()[valid],
+        'Month': period_codes(df[date_col][valid], 'month'),
+        'Revenue': df[value_col].to_numpy(dtype='float64', na_value=0.0)[valid]
+    })
+    return pairs.groupby(['Customer', 'Month'], sort=False, as_index=False)['Revenue'].sum()
+
+def combine_customer_month_pairs(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """Combine activity pairs from different partitions, adding up revenue of shared pairs."""
+    return pd.concat(parts, ignore_index=True).groupby(['Customer', 'Month'], sort=False, as_index=False)['Revenue'].sum()
+
+def quintile_scores(values: pd.Series, reverse: bool = False) -> np.ndarray:
+    """Score values 1-5 by percentile rank; tied values always share a score."""
+    scores = np.ceil(values.rank(method='average', pct=True).to_numpy() * 5).clip(1, 5).astype(np.int8)
+    return 6 - scores if reverse else scores
+
+def score_rfm(aggregates: pd.DataFrame, max_date: pd.Timestamp) -> pd.DataFrame:
+    """Turn per-customer aggregates into an RFM table with scores and segments."""
+    rfm = pd.DataFrame({
+        'Recency': (max_date - aggregates['Last_Purchase']).dt.days,
+        'Frequency': aggregates['Frequency'],
+        'Monetary': aggregates['Monetary']
+    }).reset_index()
+    
+    rfm['R_Score'] = quintile_scores(rfm['Recency'], reverse=True)
+    rfm['F_Score'] = quintile_scores(rfm['Frequency'])
+    rfm['M_Score'] = quintile_scores(rfm['Monetary'])
+    
+    rfm['RFM_Score'] = rfm['R_Score'].astype(str) + rfm['F_Score'].astype(str) + rfm['M_Score'].astype(str)
+    rfm['RFM_Total'] = rfm['R_Score'].astype(int) + rfm['F_Score'] + rfm['M_Score']
+    
+    rfm['Segment'] = np.select(
+        [rfm['RFM_Total'] >= threshold for _, threshold in RFM_SEGMENT_RULES],
+        [segment for segment, _ in RFM_SEGMENT_RULES],
+        default=RFM_DEFAULT_SEGMENT
+    )
+    
+    return rfm
+
+def clv_from_aggregates(aggregates: pd.DataFrame) -> pd.DataFrame:
+    """Compute the CLV table from per-customer aggregates, in customer order (callers rank it)."""
+    customer_data = pd.DataFrame({
+        'Total_Revenue': aggregates['Monetary'],
+        'Avg_Order_Value': aggregates['Monetary'] / aggregates['Frequency'],
+        'Purchase_Frequency': aggregates['Frequency'],
+        'Customer_Lifespan_Days': (aggregates['Last_Purchase'] - aggregates['First_Purchase']).dt.days
+    }).reset_index()
+    
+    avg_lifespan = customer_data['Customer_Lifespan_Days'].replace(0, 1).mean()
+    customer_data['Customer_Lifespan_Days'] = customer_data['Customer_Lifespan_Days'].replace(0, avg_lifespan)
+    
+    customer_data['Purchase_Rate'] = customer_data['Purchase_Frequency'] / (customer_data['Customer_Lifespan_Days'] / 30)
+    customer_data['CLV'] = customer_data['Avg_Order_Value'] * customer_data['Purchase_Rate'] * (customer_data['Customer_Lifespan_Days'] / 30)
+    
+    return customer_data
+
+# ============================================================================
+# COHORT ENGINE
+# ============================================================================
+
+def period_codes(dates: pd.Series, frequency: str = 'month') -> np.ndarray:
+    """Map dates to consecutive integer period codes (weeks start on Monday)."""
+    if frequency == 'week':
+        days = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+        # 1970-01-01 was a Thursday, so shifting by three days aligns weeks to Mondays
+        return (days + 3) // 7
+    months = dates.to_numpy().astype('datetime64[M]').astype(np.int64) + 1970 * 12
+    return months // 3 if frequency == 'quarter' else months
+
+def period_labels(codes: np.ndarray, frequency: str = 'month') -> List[str]:
+    """Render period codes as readable labels, e.g. 2024-03, 2024-Q1 or the week's Monday."""
+    if frequency == 'week':
+        mondays = (codes * 7 - 3).astype('datetime64[D]')
+        return [str(monday) for monday in mondays]
+    if frequency == 'quarter':
+        return [f"{code // 4}-Q{code % 4 + 1}" for code in codes]
+    return [f"{code // 12}-{code % 12 + 1:02d}" for code in codes]
+
+def build_cohort_tables(customers: Any, codes: np.ndarray, revenue: Optional[np.ndarray] = None,
+                        frequency: str = 'month') -> Dict[str, pd.DataFrame]:
+    """Build customer and revenue retention matrices (%) from activity rows in a few bincount passes."""
+    customer_ids, _ = pd.factorize(customers)
+    valid = customer_ids >= 0
+    customer_ids, codes = customer_ids[valid], np.asarray(codes, dtype=np.int64)[valid]
+    if len(codes) == 0:
+        return {'customers': pd.DataFrame(), 'revenue': pd.DataFrame(), 'sizes': pd.Series(dtype='int64')}
+
+    base = codes.min()
+    codes = codes - base
+    first = np.full(customer_ids.max() + 1, codes.max(), dtype=np.int64)
+    np.minimum.at(first, customer_ids, codes)
+
+    # Cells are indexed by (cohort, periods since acquisition) over the cohorts that exist
+    cohort_codes, customer_cohorts = np.unique(first, return_inverse=True)
+    ages = codes - first[customer_ids]
+    max_age = int(ages.max()) + 1
+    n_cells = len(cohort_codes) * max_age
+
+    # Customers are counted once per active period; revenue adds up over every row
+    n_periods = int(codes.max()) + 1
+    active = pd.unique(customer_ids * n_periods + codes)
+    active_customers = active // n_periods
+    active_cells = customer_cohorts[active_customers] * max_age + (active % n_periods - first[active_customers])
+    counts = np.bincount(active_cells, minlength=n_cells).reshape(-1, max_age).astype('float64')
+    observed = counts > 0
+
+    labels = pd.Index(period_labels(cohort_codes + base, frequency), name='Cohort')
+    periods = pd.RangeIndex(max_age, name='Period')
+    tables = {
+        'customers': pd.DataFrame(np.where(observed, counts / counts[:, [0]] * 100, np.nan), index=labels, columns=periods),
+        'sizes': pd.Series(counts[:, 0].astype(np.int64), index=labels, name='Customers')
+    }
+
+    if revenue is not None:
+        revenue = np.nan_to_num(np.asarray(revenue, dtype='float64')[valid])
+        cells = customer_cohorts[customer_ids] * max_age + ages
+        revenue_sums = np.bincount(cells, weights=revenue, minlength=n_cells).reshape(-1, max_age)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            revenue_retention = np.where(observed & (revenue_sums[:, [0]] != 0), revenue_sums / revenue_sums[:, [0]] * 100, np.nan)
+        tables['revenue'] = pd.DataFrame(revenue_retention, index=labels, columns=periods)
+    else:
+        tables['revenue'] = pd.DataFrame()
+
+    return tables
+
+def cohort_tables_from_pairs(pairs: pd.DataFrame, frequency: str = 'month') -> Dict[str, pd.DataFrame]:
+    """Build cohort tables from (customer, month code, revenue) pairs of an out-of-core scan."""
+    codes = pairs['Month'].to_numpy(dtype=np.int64)
+    if frequency == 'quarter':
+        codes = codes // 3
+    return build_cohort_tables(pairs['Customer'].to_numpy(), codes, pairs['Revenue'].to_numpy(), frequency)
+
+# ============================================================================
+# OUT-OF-CORE EXECUTION
+# ============================================================================
+
+def list_parquet_partitions(root: str) -> List[str]:
+    """List the Parquet files under a partitioned dataset directory, in path order."""
+    partitions = []
+    for dirpath, _, filenames in os.walk(root):
+        partitions.extend(os.path.join(dirpath, name) for name in filenames if name.endswith('.parquet'))
+    return sorted(partitions)
+
+def read_parquet_schema(path: str) -> Tuple:
+    """Describe a Parquet file's columns as (name, datetime/numeric/other) pairs."""
+    schema = pq.read_schema(path)
+    fingerprint = []
+    for field in schema:
+        if pat.is_timestamp(field.type) or pat.is_date(field.type):
+            kind = 'datetime'
+        elif pat.is_integer(field.type) or pat.is_floating(field.type) or pat.is_decimal(field.type):
+            kind = 'numeric'
+        else:
+            kind = 'other'
+        fingerprint.append((field.name, kind))
+    return tuple(fingerprint)
+
+def aggregate_customer_partition(path: str, date_col: str, customer_col: str, value_col: str) -> Tuple[pd.DataFrame, pd.DataFrame, int]:
+    """Read one partition's three columns and reduce it to partial aggregates and activity pairs."""
+    df = pq.read_table(path, columns=[date_col, customer_col, value_col]).to_pandas()
+    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+    df[value_col] = pd.to_numeric(df[value_col], errors='coerce')
+    df = df[df[customer_col].notna()]
+
+    return (
+        build_customer_aggregates(df, date_col, customer_col, value_col),
+        build_customer_month_pairs(df, date_col, customer_col, value_col),
+        len(df)
+    )
+
+def scan_customer_partitions(partitions: List[str], date_col: str, customer_col: str, value_col: str,
+                             max_workers: int = 4) -> Dict[str, Any]:
+    """Aggregate a partitioned dataset in a process pool, folding partial results as they finish."""
+    aggregates = []
+    pairs = []
+    rows = 0
+
+    # Spawned workers avoid forking the UI process and its threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(aggregate_customer_partition, path, date_col, customer_col, value_col)
+            for path in partitions
+        ]
+        for future in as_completed(futures):
+            partial, partial_pairs, partial_rows = future.result()
+            aggregates.append(partial)
+            pairs.append(partial_pairs)
+            rows += partial_rows
+
+            # Fold in batches so memory tracks the customer count, not the partition count.
+            # Date partitions can split a customer's month, so pairs are combined as well.
+            if len(aggregates) > PARTITION_MERGE_BATCH:
+                aggregates = [combine_customer_aggregates(aggregates)]
+                pairs = [combine_customer_month_pairs(pairs)]
+
+    if not aggregates:
+        return {'aggregates': pd.DataFrame(), 'pairs': pd.DataFrame(), 'rows': 0, 'partitions': 0}
+    pairs = combine_customer_month_pairs(pairs)
+    return {'aggregates': combine_customer_aggregates(aggregates), 'pairs': pairs, 'rows': rows, 'partitions': len(partitions)}
+
+# ============================================================================
+# ANOMALY ENGINE
+# ============================================================================
+
+def build_anomaly_calendar(daily: pd.DataFrame) -> pd.Series:
+    """Lay a ds/y series on a gap-free daily calendar; days without rows count as zero."""
+    if daily.empty:
+        return pd.Series(dtype='float64')
+    series = daily.set_index('ds')['y'].astype('float64')
+    calendar = pd.date_range(series.index.min(), series.index.max(), freq='D')
+    return series.reindex(calendar, fill_value=0.0)
+
+def anomaly_context_days(window: int = ANOMALY_WINDOW_DAYS, season_weeks: int = ANOMALY_SEASON_WEEKS) -> int:
+    """Return how many trailing days a new day's score depends on."""
+    return 2 * window + 7 * season_weeks
+
+def trailing_median(values: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    """Median of each row's trailing window per column, ignoring NaN; vectorized over column blocks."""
+    n_rows, n_cols = values.shape
+    padded = np.vstack([np.full((window - 1, n_cols), np.nan), values])
+    result = np.full(values.shape, np.nan)
+    block = max(1, ROLLING_BLOCK_CELLS // max(1, n_rows * window))
+    for lo in range(0, n_cols, block):
+        # NaN sorts last, so the median of the valid values sits at the middle of the first `count` slots
+        windows = np.sort(np.lib.stride_tricks.sliding_window_view(padded[:, lo:lo + block], window, axis=0), axis=-1)
+        count = window - np.isnan(windows).sum(axis=-1)
+        lower = np.take_along_axis(windows, np.maximum(count - 1, 0)[..., None] // 2, axis=-1)[..., 0]
+        upper = np.take_along_axis(windows, (count // 2)[..., None].clip(max=window - 1), axis=-1)[..., 0]
+        result[:, lo:lo + block] = np.where(count >= min_periods, (lower + upper) / 2, np.nan)
+    return result
+
+def trailing_mean(values: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    """Mean of each row's trailing window per column, ignoring NaN."""
+    valid = ~np.isnan(values)
+    sums = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    counts = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(valid, axis=0)])
+    starts = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+    total = sums[1:] - sums[starts]
+    count = counts[1:] - counts[starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(count >= min_periods, total / count, np.nan)
+
+def shift_down(values: np.ndarray) -> np.ndarray:
+    """Move every row down by one so each row sees only the rows before it."""
+    return np.vstack([np.full((1, values.shape[1]), np.nan), values[:-1]])
+
+def score_anomaly_matrix(values: pd.DataFrame, window: int = ANOMALY_WINDOW_DAYS,
+                         season_weeks: int = ANOMALY_SEASON_WEEKS) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Score every column of a daily calendar matrix against robust statistics of the days before it."""
+    matrix = values.to_numpy(dtype='float64')
+    min_days = max(2, window // 2)
+
+    # Level: trailing median; weekly season: trailing median of the same weekday's deviation from the level
+    level = shift_down(trailing_median(matrix, window, min_days))
+    detrended = matrix - level
+    season = np.zeros(matrix.shape)
+    weekday = values.index.dayofweek
+    for day in range(7):
+        rows = weekday == day
+        season[rows] = shift_down(trailing_median(detrended[rows], season_weeks, 2))
+    expected = level + np.nan_to_num(season)
+    residual = np.abs(matrix - expected)
+
+    # Spread: scaled median absolute residual over the trailing window; the mean absolute residual
+    # is a floor for sparse series, whose median residual is zero on mostly empty days
+    spread = shift_down(np.fmax(MAD_SCALE * trailing_median(residual, window, min_days),
+                                trailing_mean(residual, window, min_days)))
+    # Series that are mostly empty days have no stable baseline to score against
+    active = shift_down(trailing_mean((matrix != 0).astype('float64'), window, min_days))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_score = np.where((spread > 0) & (active >= ANOMALY_MIN_ACTIVE_SHARE), (matrix - expected) / spread, np.nan)
+    return (pd.DataFrame(expected, index=values.index, columns=values.columns),
+            pd.DataFrame(z_score, index=values.index, columns=values.columns))
+
+def score_anomalies(calendar: pd.Series, window: int = ANOMALY_WINDOW_DAYS,
+                    season_weeks: int = ANOMALY_SEASON_WEEKS) -> pd.DataFrame:
+    """Score each day against robust statistics of the days before it, so appending days never rescores old ones."""
+    expected, z_score = score_anomaly_matrix(calendar.to_frame('y'), window, season_weeks)
+    return pd.DataFrame({
+        'Date': calendar.index,
+        'Revenue': calendar.to_numpy(dtype='float64'),
+        'Expected': expected['y'].to_numpy(),
+        'z_score': z_score['y'].to_numpy()
+    })
+
+def extend_anomaly_scores(scores: pd.DataFrame, calendar: pd.Series, window: int = ANOMALY_WINDOW_DAYS,
+                          season_weeks: int = ANOMALY_SEASON_WEEKS) -> pd.DataFrame:
+    """Score only the days of `calendar` after the last scored day, using a fixed-length trailing context."""
+    last_date = scores['Date'].iloc[-1]
+    new_days = calendar[calendar.index > last_date]
+    if new_days.empty:
+        return scores
+
+    context_days = anomaly_context_days(window, season_weeks)
+    context = pd.concat([scores.set_index('Date')['Revenue'].tail(context_days), new_days])
+    tail = score_anomalies(context, window, season_weeks).tail(len(new_days))
+    return pd.concat([scores, tail], ignore_index=True)
+
+def is_calendar_prefix(scores: pd.DataFrame, calendar: pd.Series) -> bool:
+    """Check whether scored days are an unchanged prefix of a calendar."""
+    n = len(scores)
+    return 0 < n <= len(calendar) and calendar.index[0] == scores['Date'].iloc[0] \
+        and np.array_equal(calendar.to_numpy()[:n], scores['Revenue'].to_numpy())
+
+def threshold_anomalies(scores: pd.DataFrame, sensitivity: float) -> pd.DataFrame:
+    """Select days whose robust score exceeds the sensitivity, newest first."""
+    flagged = scores[scores['z_score'].abs() > sensitivity]
+    return flagged.sort_values('Date', ascending=False)
+
+
+def build_segment_matrix(df: pd.DataFrame, date_col: str, dimensions: List[str], metrics: List[str],
+                         start: pd.Timestamp) -> pd.DataFrame:
+    """Sum every metric per (dimension value, day) from `start` into one day x (dimension, segment, metric) matrix."""
+    rows = df[df[date_col] >= start]
+    day = rows[date_col].dt.normalize().rename('ds')
+    blocks = []
+    for dimension in dimensions:
+        grouped = rows.groupby([rows[dimension].astype(str).rename('Segment'), day], observed=True, sort=False)[metrics].sum()
+        wide = grouped.unstack('Segment')
+        wide.columns = pd.MultiIndex.from_tuples(
+            [(dimension, segment, metric) for metric, segment in wide.columns],
+            names=['Dimension', 'Segment', 'Metric']
+        )
+        blocks.append(wide)
+
+    matrix = pd.concat(blocks, axis=1) if blocks else pd.DataFrame()
+    if matrix.empty:
+        return matrix
+    calendar = pd.date_range(start.normalize(), rows[date_col].max().normalize(), freq='D')
+    return matrix.reindex(calendar, fill_value=0.0).fillna(0.0)
+
+def scan_segment_anomalies(df: pd.DataFrame, date_col: str, dimensions: List[str], metrics: List[str],
+                           days: int = ANOMALY_SCAN_DAYS, top: int = ANOMALY_SCAN_TOP,
+                           window: int = ANOMALY_WINDOW_DAYS, season_weeks: int = ANOMALY_SEASON_WEEKS) -> pd.DataFrame:
+    """Score every segment-metric series in one matrix and rank the most anomalous segment-days of the last `days`."""
+    if df.empty or not dimensions or not metrics:
+        return pd.DataFrame()
+
+    # Only the scanned days and the trailing context their scores depend on are aggregated
+    last_date = df[date_col].max().normalize()
+    start = last_date - pd.Timedelta(days=days + anomaly_context_days(window, season_weeks) - 1)
+    matrix = build_segment_matrix(df, date_col, dimensions, metrics, start)
+    if matrix.empty:
+        return pd.DataFrame()
+
+    expected, z_score = score_anomaly_matrix(matrix, window, season_weeks)
+    recent = z_score.to_numpy()[-days:]
+    strength = np.nan_to_num(np.abs(recent), nan=-1.0).ravel()
+    top = min(top, int((strength >= 0).sum()))
+    if top == 0:
+        return pd.DataFrame()
+
+    best = np.argpartition(-strength, top - 1)[:top]
+    day_index, column_index = np.divmod(best, matrix.shape[1])
+    day_index = day_index + len(matrix) - len(recent)
+    columns = matrix.columns[column_index]
+    ranked = pd.DataFrame({
+        'Dimension': columns.get_level_values('Dimension'),
+        'Segment': columns.get_level_values('Segment'),
+        'Metric': columns.get_level_values('Metric'),
+        'Date': matrix.index[day_index],
+        'Value': matrix.to_numpy()[day_index, column_index],
+        'Expected': expected.to_numpy()[day_index, column_index],
+        'z_score': z_score.to_numpy()[day_index, column_index]
+    })
+    return ranked.reindex(ranked['z_score'].abs().sort_values(ascending=False).index).reset_index(drop=True)
+
+# ============================================================================
+# TOP-K ENGINE
+# ============================================================================
+
+def build_group_sums(keys: Any, values: Any) -> Dict[str, Any]:
+    """Sum values per key with factorize and bincount; rows with a missing key are dropped."""
+    codes, uniques = pd.factorize(pd.Series(keys), sort=False)
+    values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64')
+    valid = codes >= 0
+    sums = np.bincount(codes[valid], weights=np.nan_to_num(values[valid]), minlength=len(uniques))
+    return {'keys': pd.Index(uniques), 'sums': sums}
+
+def extend_group_sums(state: Dict[str, Any], keys: Any, values: Any) -> Dict[str, Any]:
+    """Fold appended rows into existing group sums without revisiting the rows already summed."""
+    new = build_group_sums(keys, values)
+    positions = state['keys'].get_indexer(new['keys'])
+    unseen = positions < 0
+    positions[unseen] = np.arange(len(state['sums']), len(state['sums']) + unseen.sum())
+    sums = np.concatenate([state['sums'], np.zeros(unseen.sum())])
+    sums[positions] += new['sums']
+    return {'keys': state['keys'].append(new['keys'][unseen]), 'sums': sums}
+
+def top_k_indices(values: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k largest values, largest first, found by partial selection instead of a full sort."""
+    values = np.asarray(values, dtype='float64')
+    k = min(k, len(values))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    # NaN partitions last, so it is only selected when there are fewer than k numbers
+    candidates = np.argpartition(-values, k - 1)[:k] if k < len(values) else np.arange(len(values))
+    return candidates[np.argsort(-values[candidates], kind='stable')]
+
+def top_k_groups(state: Dict[str, Any], k: int, other_label: Optional[str] = None) -> pd.Series:
+    """Return the k largest group sums, largest first, plus the remainder under `other_label` when given."""
+    positions = top_k_indices(state['sums'], k)
+    top = pd.Series(state['sums'][positions], index=state['keys'][positions])
+    if other_label is not None and len(state['sums']) > len(positions):
+        top = pd.concat([top, pd.Series([state['sums'].sum() - top.sum()], index=[other_label])])
+    return top
+
+def top_k_rows(df: pd.DataFrame, column: str, k: int) -> pd.DataFrame:
+    """Return the k rows with the largest values in a column, largest first."""
+    return df.iloc[top_k_indices(df[column].to_numpy(dtype='float64'), k)]
+
+# ============================================================================
+# KPI SUMMARY
+# ============================================================================
+
+def compute_kpis(df: pd.DataFrame, roles: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """Calculate headline KPIs from the columns chosen for each role - works with any dataset type."""
+    kpis = {
+        'total_value': 0,
+        'avg_value': 0,
+        'growth_percent': 0,
+        'total_profit': 0,
+        'profit_margin': 0,
+        'total_records': len(df),
+        'unique_entities': 0,
+        'value_label': 'Value',
+        'entity_label': 'Entities'
+    }
+    
+    value_col = roles['value']
+    entity_col = roles['entity']
+    
+    if value_col and pd.api.types.is_numeric_dtype(df[value_col]):
+        try:
+            numeric_data = pd.to_numeric(df[value_col], errors='coerce')
+            kpis['total_value'] = numeric_data.sum()
+            kpis['avg_value'] = numeric_data.mean()
+            kpis['value_label'] = value_col
+        except:
+            pass
+    
+    # Try to find profit column
+    profit_col = roles['profit']
+    if profit_col and pd.api.types.is_numeric_dtype(df[profit_col]):
+        try:
+            profit_data = pd.to_numeric(df[profit_col], errors='coerce')
+            kpis['total_profit'] = profit_data.sum()
+            if kpis['total_value'] > 0:
+                kpis['profit_margin'] = (kpis['total_profit'] / kpis['total_value']) * 100
+        except:
+            pass
+    
+    if entity_col:
+        kpis['unique_entities'] = df[entity_col].nunique()
+        kpis['entity_label'] = entity_col
+    
+    # Calculate growth
+    date_col = roles['date']
+    if date_col and value_col:
+        try:
+            # Check if it's already datetime
+            if pd.api.types.is_datetime64_any_dtype(df[date_col]):
+                df_sorted = df.sort_values(date_col)
+            elif pd.api.types.is_numeric_dtype(df[date_col]):
+                # If numeric (like year), sort by it
+                df_sorted = df.sort_values(date_col)
+            else:
+                # Try to convert to datetime
+                df_sorted = df.copy()
+                df_sorted[date_col] = pd.to_datetime(df_sorted[date_col], errors='coerce')
+                df_sorted = df_sorted.sort_values(date_col)
+            
+            mid_point = len(df_sorted) // 2
+            numeric_data = pd.to_numeric(df_sorted[value_col], errors='coerce')
+            first_half = numeric_data.iloc[:mid_point].sum()
+            second_half = numeric_data.iloc[mid_point:].sum()
+            
+            if first_half > 0:
+                kpis['growth_percent'] = ((second_half - first_half) / first_half) * 100
+        except:
+            pass
+    
+    return kpis
+
+# ============================================================================
+# CHART AGGREGATION
+# ============================================================================
+
+def choose_time_resolution(first_date: pd.Timestamp, last_date: pd.Timestamp) -> str:
+    """Pick the coarsest bin a date span needs: days for short spans, then weeks, then months."""
+    span_days = (last_date - first_date).days + 1
+    for resolution in ('day', 'week'):
+        if span_days <= CHART_RESOLUTION_MAX_DAYS[resolution]:
+            return resolution
+    return 'month'
+
+def resample_daily(daily: pd.Series, resolution: str) -> pd.Series:
+    """Sum a gap-free daily series into week (Monday start) or month bins."""
+    if resolution == 'day' or daily.empty:
+        return daily
+    return daily.resample(CHART_RESAMPLE_RULES[resolution], label='left', closed='left').sum()
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: choose n_out points that keep the visual shape of a line."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        # The next bucket's mean is the third corner of every candidate triangle
+        next_hi = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        areas = np.abs((x[previous] - next_x) * (y[lo:hi] - y[previous]) - (x[previous] - x[lo:hi]) * (next_y - y[previous]))
+        previous = lo + int(np.argmax(areas))
+        keep[bucket + 1] = previous
+    return keep
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Keep each bucket's minimum and maximum so spikes survive downsampling."""
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+
+    y = np.nan_to_num(np.asarray(y, dtype='float64'), nan=0.0)
+    size = -(-n // max(1, (n_out - 2) // 2))
+    buckets = -(-n // size)
+    padding = buckets * size - n
+    offsets = np.arange(buckets) * size
+    lows = np.argmin(np.append(y, np.full(padding, np.inf)).reshape(buckets, size), axis=1) + offsets
+    highs = np.argmax(np.append(y, np.full(padding, -np.inf)).reshape(buckets, size), axis=1) + offsets
+    return np.unique(np.concatenate([[0, n - 1], lows, highs]))
+
+def downsample_series(series: pd.Series, max_points: int = CHART_MAX_POINTS, method: str = 'lttb') -> pd.Series:
+    """Reduce a time-indexed series to at most `max_points` points that keep its shape."""
+    if len(series) <= max_points:
+        return series
+    if method == 'minmax':
+        keep = minmax_indices(series.to_numpy(), max_points)
+    else:
+        keep = lttb_indices(series.index.asi8, series.to_numpy(), max_points)
+    return series.iloc[keep]
+
+def histogram_bins(values: Any, bins: int = CHART_HISTOGRAM_BINS) -> pd.DataFrame:
+    """Bin a numeric column with NumPy; returns one row per bin with its edges, centre and count."""
+    values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64')
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return pd.DataFrame(columns=['Start', 'End', 'Center', 'Count'])
+
+    counts, edges = np.histogram(values, bins=bins)
+    return pd.DataFrame({
+        'Start': edges[:-1],
+        'End': edges[1:],
+        'Center': (edges[:-1] + edges[1:]) / 2,
+        'Count': counts
+    })
+
+# ============================================================================
+# REPORT CHARTS
+# ============================================================================
+
+def build_report_figures(df: pd.DataFrame, roles: Dict[str, Optional[str]], top_k: int = REPORT_TOP_K) -> Dict[str, go.Figure]:
+    """Build the trend, distribution and top-category charts for a static report, skipping any that do not apply."""
+    figures = {}
+    date_col, value_col, category_col = roles['date'], roles['value'], roles['category']
+    if not value_col or not pd.api.types.is_numeric_dtype(df[value_col]):
+        return figures
+    layout = dict(template='plotly_white', font=dict(size=12), title_font_size=16, showlegend=False)
+
+    if date_col and pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        daily = build_daily_history(df.dropna(subset=[date_col]), date_col, value_col)
+        if not daily.empty:
+            daily = daily.set_index('ds')['y'].asfreq('D', fill_value=0)
+            resolution = choose_time_resolution(daily.index[0], daily.index[-1])
+            series = downsample_series(resample_daily(daily, resolution))
+            figures['trend'] = go.Figure(go.Scatter(x=series.index, y=series.to_numpy(), mode='lines', line_color='#667eea'))
+            figures['trend'].update_layout(title=f"{value_col} Trend Over Time ({resolution.title()})", **layout)
+
+    bins = histogram_bins(df[value_col])
+    if not bins.empty:
+        figures['distribution'] = go.Figure(go.Bar(
+            x=bins['Center'], y=bins['Count'], width=bins['End'] - bins['Start'], marker_color='#667eea'
+        ))
+        figures['distribution'].update_layout(title=f"Distribution of {value_col}", xaxis_title=value_col,
+                                              yaxis_title="Frequency", bargap=0, **layout)
+
+    if category_col:
+        grouped = top_k_groups(build_group_sums(df[category_col], df[value_col]), top_k, 'Other')
+        figures['categories'] = go.Figure(go.Bar(x=grouped.index.astype(str), y=grouped.to_numpy(), marker_color='#764ba2'))
+        figures['categories'].update_layout(title=f"{value_col} by {category_col}", xaxis_title=category_col,
+                                            yaxis_title=value_col, **layout)
+    return figures
+
+def write_chart_image(path: str, figure_json: str) -> str:
+    """Render a figure to PNG next to `path`, or to standalone HTML when no image engine is installed; returns the file written."""
+    fig = pio.from_json(figure_json)
+    width, height = REPORT_CHART_SIZE
+    try:
+        fig.write_image(f"{path}.png", width=width, height=height)
+        return f"{path}.png"
+    except Exception:
+        # Static images need kaleido and a browser; the HTML version loads plotly.js from its CDN
+        fig.write_html(f"{path}.html", include_plotlyjs='cdn')
+        return f"{path}.html"
+
+# ============================================================================
+# EXPORT WRITERS
+# ============================================================================
+
+def excel_cell_values(column: pd.Series) -> List[Any]:
+    """Convert a column chunk to values xlsxwriter writes natively; missing values become blank cells."""
+    if pd.api.types.is_datetime64_any_dtype(column.dtype):
+        if getattr(column.dt, 'tz', None) is not None:
+            column = column.dt.tz_localize(None)
+        values = column.astype(object)
+    elif pd.api.types.is_bool_dtype(column.dtype) or pd.api.types.is_numeric_dtype(column.dtype) \
+            or isinstance(column.dtype, pd.StringDtype):
+        values = column.astype(object)
+        if pd.api.types.is_float_dtype(column.dtype):
+            infinite = np.isinf(column.to_numpy(dtype='float64', na_value=np.nan))
+            if infinite.any():
+                # Excel has no infinity, so it is written as text the way DataFrame.to_excel does
+                values[infinite] = np.where(column[infinite] > 0, 'inf', '-inf')
+    else:
+        # Mixed columns keep numbers, text and dates as they are; anything else, infinity included, is written as text
+        values = pd.Series([
+            value if isinstance(value, EXCEL_NATIVE_TYPES) and not (isinstance(value, (float, np.floating)) and np.isinf(value))
+            else str(value) for value in column.astype(object)
+        ], index=column.index, dtype=object)
+    return values.where(column.notna(), None).tolist()
+
+def write_csv_export(path: str, df: pd.DataFrame, compression: Optional[str] = None,
+                     chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Write a frame as CSV in row chunks, optionally gzip or zstd compressed."""
+    if compression == 'gzip':
+        output = gzip.open(path, 'wb', compresslevel=6)
+    elif compression == 'zstd':
+        output = pa.CompressedOutputStream(path, 'zstd')
+    else:
+        output = open(path, 'wb')
+
+    with output:
+        for start in range(0, max(len(df), 1), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            output.write(chunk.to_csv(index=False, header=start == 0).encode('utf-8'))
+
+def write_export(path: str, df: pd.DataFrame, export_format: str, kpis: Optional[Dict[str, Any]] = None,
+                 date_col: Optional[str] = None):
+    """Write a frame to `path` in one of EXPORT_FORMATS; the PDF summary takes its date range from `date_col`."""
+    if export_format == 'csv':
+        write_csv_export(path, df)
+    elif export_format == 'csv.gz':
+        write_csv_export(path, df, 'gzip')
+    elif export_format == 'csv.zst':
+        write_csv_export(path, df, 'zstd')
+    elif export_format == 'parquet':
+        df.to_parquet(path, index=False, compression='zstd' if ZSTD_AVAILABLE else 'snappy')
+    elif export_format == 'xlsx':
+        write_excel_report(path, df, kpis or {})
+    elif export_format == 'pdf':
+        write_pdf_report(path, df, kpis, date_col)
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+def write_excel_report(path: str, df: pd.DataFrame, kpis: Dict[str, Any],
+                       max_rows: int = EXCEL_MAX_ROWS, chunk_rows: int = EXCEL_CHUNK_ROWS) -> List[str]:
+    """Write KPI, data and statistics sheets to an .xlsx file in constant memory; returns the data sheet names."""
+    workbook = lazy_import('xlsxwriter').Workbook(path, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        'strings_to_urls': False
+    })
+    header_format = workbook.add_format({'bold': True, 'bg_color': '#667eea', 'font_color': 'white', 'border': 1})
+
+    # KPI Sheet
+    worksheet = workbook.add_worksheet('KPIs')
+    worksheet.write_row(0, 0, list(kpis.keys()), header_format)
+    worksheet.write_row(1, 0, excel_cell_values(pd.Series(list(kpis.values()), dtype=object)))
+
+    # Data Sheets: constant memory mode flushes each row once the next one starts, so rows go in order
+    # and a new sheet starts whenever the current one reaches Excel's row limit
+    rows_per_sheet = max_rows - 1
+    sheet_names = []
+    columns = [str(col) for col in df.columns]
+    for sheet_start in range(0, max(len(df), 1), rows_per_sheet):
+        name = 'Data' if not sheet_names else f'Data {len(sheet_names) + 1}'
+        sheet_names.append(name)
+        worksheet = workbook.add_worksheet(name)
+        worksheet.set_column(0, max(len(columns) - 1, 0), 15)
+        worksheet.write_row(0, 0, columns, header_format)
+
+        sheet_end = min(sheet_start + rows_per_sheet, len(df))
+        row = 1
+        for chunk_start in range(sheet_start, sheet_end, chunk_rows):
+            chunk = df.iloc[chunk_start:min(chunk_start + chunk_rows, sheet_end)]
+            for values in zip(*(excel_cell_values(chunk[col]) for col in chunk.columns)):
+                worksheet.write_row(row, 0, values)
+                row += 1
+
+    # Summary Statistics
+    summary = df.describe()
+    worksheet = workbook.add_worksheet('Statistics')
+    worksheet.write_row(0, 1, [str(col) for col in summary.columns], header_format)
+    for row, (stat, values) in enumerate(summary.iterrows(), start=1):
+        worksheet.write(row, 0, stat, header_format)
+        worksheet.write_row(row, 1, excel_cell_values(values.infer_objects()) if len(values) else [])
+
+    workbook.close()
+    return sheet_names
+
+def write_pdf_report(path: str, df: pd.DataFrame, kpis: Dict[str, Any], date_col: Optional[str] = None):
+    """Write the one-page KPI and data overview summary as a PDF."""
+    if not REPORTLAB_AVAILABLE:
+        raise RuntimeError("PDF export requires reportlab")
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.units import inch
+    
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = []
+    
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#667eea'),
+        spaceAfter=30,
+        alignment=1
+    )
+    
+    # Title
+    elements.append(Paragraph("Business Intelligence Report", title_style))
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # KPIs
+    elements.append(Paragraph("Key Performance Indicators", styles['Heading2']))
+    elements.append(Spacer(1, 0.2*inch))
+    
+    kpi_data = [
+        ['Metric', 'Value'],
+        [f"Total {kpis['value_label']}", f"{kpis['total_value']:,.2f}"],
+        ['Growth Rate', f"{kpis['growth_percent']:.1f}%"],
+        [f"Average {kpis['value_label']}", f"{kpis['avg_value']:,.2f}"],
+        ['Total Records', f"{kpis['total_records']:,}"],
+        [f"Unique {kpis['entity_label']}", f"{kpis['unique_entities']:,}"]
+    ]
+    
+    kpi_table = Table(kpi_data, colWidths=[3*inch, 2*inch])
+    kpi_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    
+    elements.append(kpi_table)
+    elements.append(Spacer(1, 0.5*inch))
+    
+    # Data Summary
+    elements.append(Paragraph("Data Overview", styles['Heading2']))
+    elements.append(Spacer(1, 0.2*inch))
+    elements.append(Paragraph(f"Total Records: {len(df)}", styles['Normal']))
+    if date_col and not df.empty and pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        elements.append(Paragraph(f"Date Range: {df[date_col].min():%Y-%m-%d} to {df[date_col].max():%Y-%m-%d}", styles['Normal']))
+    else:
+        elements.append(Paragraph("Date Range: N/A", styles['Normal']))
+    
+    doc.build(elements)
+    with open(path, 'wb') as output:
+        output.write(buffer.getvalue())
+
+# ============================================================================
+# REPORT BUNDLES
+# ============================================================================
+
+def render_bundle_artifact(path: str, export_format: Optional[str] = None, df: Optional[pd.DataFrame] = None,
+                           kpis: Optional[Dict[str, Any]] = None, date_col: Optional[str] = None,
+                           figure_json: Optional[str] = None) -> Dict[str, Any]:
+    """Write one export or chart for a bundle and time it; runs in a worker process."""
+    started = time.perf_counter()
+    if figure_json is not None:
+        path = write_chart_image(path, figure_json)
+    else:
+        write_export(path, df, export_format, kpis, date_col)
+    return {'path': path, 'seconds': time.perf_counter() - started, 'worker': os.getpid()}
+
+def plain_json_values(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert NumPy scalars in a flat dict to the Python values json can write."""
+    return {key: value.item() if isinstance(value, np.generic) else value for key, value in values.items()}
+
+def build_report_bundle(path: str, df: pd.DataFrame, roles: Dict[str, Optional[str]],
+                        formats: Tuple[str, ...] = REPORT_BUNDLE_FORMATS, charts: bool = True,
+                        top_k: int = REPORT_TOP_K, max_workers: int = REPORT_WORKERS) -> Dict[str, Any]:
+    """Compute KPIs and charts once, render every artifact across a process pool and zip them with a timings manifest."""
+    started = time.perf_counter()
+    kpis = compute_kpis(df, roles)
+    figures = build_report_figures(df, roles, top_k) if charts else {}
+    analytics_seconds = time.perf_counter() - started
+
+    work_dir = tempfile.mkdtemp(prefix='bundle-', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        os.makedirs(os.path.join(work_dir, 'charts'))
+        tasks = {}
+        for export_format in formats:
+            name = f"{REPORT_ARTIFACT_NAMES.get(export_format, 'data')}.{EXPORT_FORMATS[export_format][0]}"
+            tasks[name] = dict(path=os.path.join(work_dir, name), export_format=export_format, df=df, kpis=kpis,
+                               date_col=roles['date'])
+        for chart, fig in figures.items():
+            tasks[f"charts/{chart}"] = dict(path=os.path.join(work_dir, 'charts', chart), figure_json=fig.to_json())
+
+        results = {}
+        if max_workers <= 1:
+            for name, task in tasks.items():
+                try:
+                    results[name] = render_bundle_artifact(**task)
+                except Exception as exc:
+                    results[name] = {'error': str(exc)}
+        else:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)), mp_context=context) as executor:
+                futures = {executor.submit(render_bundle_artifact, **task): name for name, task in tasks.items()}
+                for future in as_completed(futures):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception as exc:
+                        # A failed artifact is reported in the manifest instead of failing the bundle
+                        results[futures[future]] = {'error': str(exc) or type(exc).__name__}
+
+        artifacts = []
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as bundle:
+            for name in tasks:
+                result = results.get(name, {'error': 'not run'})
+                if 'error' in result:
+                    artifacts.append({'name': name, 'error': result['error']})
+                    continue
+                arcname = os.path.relpath(result['path'], work_dir).replace(os.sep, '/')
+                stored = arcname.endswith(REPORT_STORED_EXTENSIONS)
+                bundle.write(result['path'], arcname, zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+                artifacts.append({
+                    'name': arcname,
+                    'bytes': os.path.getsize(result['path']),
+                    'seconds': round(result['seconds'], 3),
+                    'worker': result['worker']
+                })
+
+            manifest = {
+                'generated_at': datetime.now().isoformat(timespec='seconds'),
+                'rows': len(df),
+                'columns': [str(col) for col in df.columns],
+                'roles': roles,
+                'kpis': plain_json_values(kpis),
+                'analytics_seconds': round(analytics_seconds, 3),
+                'total_seconds': round(time.perf_counter() - started, 3),
+                'artifacts': artifacts
+            }
+            bundle.writestr('manifest.json', json.dumps(manifest, indent=2, default=str))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return manifest
+
+# ============================================================================
+# FORECASTING
+# ============================================================================
+
+def build_daily_history(df: pd.DataFrame, date_col: str, value_col: str) -> pd.DataFrame:
+    """Sum a value column per calendar day into the ds/y frame the forecast engines expect."""
+    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        return pd.DataFrame()
+    daily = df.groupby(df[date_col].dt.normalize())[value_col].sum().reset_index()
+    daily.columns = ['ds', 'y']
+    return daily
+
+def moving_average_forecast(history: pd.DataFrame, periods: int) -> pd.DataFrame:
+    """Project the last 7-day moving average forward as a flat forecast."""
+    window = max(1, min(7, len(history) // 3))
+    last_ma = history['y'].rolling(window=window).mean().iloc[-1]
+    future_dates = pd.date_range(start=history['ds'].max() + pd.Timedelta(days=1), periods=periods)
+    return pd.DataFrame({'ds': future_dates, 'yhat': [last_ma] * periods})
+
+def compute_series_fingerprint(daily_revenue: pd.DataFrame) -> str:
+    """Hash a daily ds/y series so identical series share forecasts."""
+    digest = hashlib.sha256()
+    digest.update(daily_revenue['ds'].to_numpy(dtype='datetime64[ns]').view(np.int64).tobytes())
+    digest.update(daily_revenue['y'].to_numpy(dtype='float64').tobytes())
+    return digest.hexdigest()
+
+def get_prophet_model_keys(daily_revenue: pd.DataFrame) -> Tuple[str, str]:
+    """Return the exact-series model key and the lineage key shared by appended versions of a series."""
+    settings = json.dumps({'settings': PROPHET_SETTINGS, 'prophet_version': lazy_import('prophet').__version__}, sort_keys=True)
+    model_key = hashlib.sha256(f"{settings}|{compute_series_fingerprint(daily_revenue)}".encode()).hexdigest()
+    lineage_key = hashlib.sha256(f"{settings}|{daily_revenue['ds'].iloc[0]}".encode()).hexdigest()
+    return model_key, lineage_key
+
+def load_prophet_model(model_dir: str, model_key: str) -> Optional[str]:
+    """Load a fitted model's JSON from the model store, if present."""
+    path = os.path.join(model_dir, f"{model_key}.json")
+    try:
+        with open(path) as f:
+            payload = json.load(f)
+        # Touch the entry so eviction treats it as recently used
+        os.utime(path, None)
+        return payload['model']
+    except Exception:
+        return None
+
+def find_warm_start(model_dir: str, daily_revenue: pd.DataFrame, lineage_key: str) -> Optional[Dict[str, Any]]:
+    """Return Stan init values from the last model of this series when the new data only appends days."""
+    try:
+        with open(os.path.join(model_dir, f"lineage_{lineage_key}.json")) as f:
+            lineage = json.load(f)
+    except Exception:
+        return None
+
+    n_days = lineage['n_days']
+    if n_days >= len(daily_revenue) or compute_series_fingerprint(daily_revenue.iloc[:n_days]) != lineage['series']:
+        return None
+
+    model_json = load_prophet_model(model_dir, lineage['model_key'])
+    return get_stan_init(lazy_import('prophet.serialize').model_from_json(model_json)) if model_json else None
+
+def get_stan_init(model) -> Dict[str, Any]:
+    """Extract a fitted Prophet model's parameters in the form Stan accepts as init."""
+    init = {name: float(model.params[name][0][0]) for name in ['k', 'm', 'sigma_obs']}
+    init.update({name: model.params[name][0] for name in ['delta', 'beta']})
+    return init
+
+def save_prophet_model(model_dir: str, daily_revenue: pd.DataFrame, model_json: str, max_bytes: int):
+    """Store a fitted model and point its series lineage at it, then enforce the size limit."""
+    model_key, lineage_key = get_prophet_model_keys(daily_revenue)
+    try:
+        os.makedirs(model_dir, exist_ok=True)
+        write_json_atomic(os.path.join(model_dir, f"{model_key}.json"), {'model': model_json})
+        write_json_atomic(os.path.join(model_dir, f"lineage_{lineage_key}.json"), {
+            'model_key': model_key,
+            'n_days': len(daily_revenue),
+            'series': compute_series_fingerprint(daily_revenue)
+        })
+    except OSError:
+        return
+    evict_cache_dir(model_dir, max_bytes)
+
+def fit_prophet_model(daily_revenue: pd.DataFrame, model_dir: Optional[str] = None,
+                      max_bytes: int = 0) -> Tuple[Any, str, str]:
+    """Return a fitted model, its JSON and how it was obtained: from the store, warm-started or cold."""
+    if model_dir:
+        model_key, lineage_key = get_prophet_model_keys(daily_revenue)
+        model_json = load_prophet_model(model_dir, model_key)
+        if model_json:
+            return lazy_import('prophet.serialize').model_from_json(model_json), model_json, 'stored'
+        init = find_warm_start(model_dir, daily_revenue, lineage_key)
+    else:
+        init = None
+
+    model = lazy_import('prophet').Prophet(**PROPHET_SETTINGS)
+    if init:
+        model.fit(daily_revenue, init=init)
+    else:
+        model.fit(daily_revenue)
+    model_json = lazy_import('prophet.serialize').model_to_json(model)
+
+    if model_dir:
+        save_prophet_model(model_dir, daily_revenue, model_json, max_bytes)
+    return model, model_json, 'warm' if init else 'cold'
+
+class ForecastTimeout(TimeoutError):
+    """Raised when a forecast runs past its time limit."""
+
+def list_child_processes() -> set:
+    """Return the ids of processes started by this one (read from /proc; empty where it is unavailable)."""
+    children = set()
+    pid = os.getpid()
+    try:
+        names = [name for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return children
+    for name in names:
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # The parent id is the second field after the parenthesised command name
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    children.add(int(name))
+        except (OSError, ValueError, IndexError):
+            continue
+    return children
+
+def terminate_processes(pids: set):
+    """Send SIGTERM to each process, ignoring ones that already exited."""
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+@contextmanager
+def forecast_timeout(seconds: Optional[float]):
+    """Raise ForecastTimeout if the enclosed block runs longer than the given seconds."""
+    # Alarms only work on the main thread of a Unix process, which is where pool workers run tasks
+    if not seconds or not hasattr(signal, 'SIGALRM') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    existing_children = list_child_processes()
+
+    def on_timeout(signum, frame):
+        # cmdstanpy does not stop its CmdStan process when interrupted, so the fit started here is killed
+        terminate_processes(list_child_processes() - existing_children)
+        raise ForecastTimeout(f"Forecast exceeded {seconds:g}s")
+
+    previous = signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+# ============================================================================
+# FAST FORECAST ENGINES
+# ============================================================================
+
+def fourier_terms(days: np.ndarray, period: float, order: int) -> np.ndarray:
+    """Return sin/cos columns of the given seasonal period for absolute day numbers."""
+    angles = 2 * np.pi * np.outer(days, np.arange(1, order + 1)) / period
+    return np.hstack([np.sin(angles), np.cos(angles)])
+
+def ridge_fit(X: np.ndarray, Y: np.ndarray, penalty: float = RIDGE_PENALTY) -> np.ndarray:
+    """Solve ridge regressions for every column of Y at once; the intercept is not penalized."""
+    ridge = penalty * np.eye(X.shape[1])
+    ridge[0, 0] = 0.0
+    return np.linalg.solve(X.T @ X + ridge, X.T @ Y)
+
+def fourier_design(days: np.ndarray, first_day: int, n_days: int, yearly: bool) -> np.ndarray:
+    """Build intercept, trend, weekly and (optionally) yearly Fourier features."""
+    columns = [np.ones((len(days), 1)), ((days - first_day) / n_days)[:, None], fourier_terms(days, 7.0, WEEKLY_FOURIER_ORDER)]
+    if yearly:
+        columns.append(fourier_terms(days, 365.25, YEARLY_FOURIER_ORDER))
+    return np.hstack(columns)
+
+def fourier_ridge_matrix(Y: np.ndarray, first_day: int, periods: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Fit trend plus Fourier seasonality to each row of Y; returns fitted, future and residual sigma."""
+    n_series, n_days = Y.shape
+    days = np.arange(first_day, first_day + n_days + periods)
+    X = fourier_design(days, first_day, n_days, yearly=n_days >= 365)
+
+    beta = ridge_fit(X[:n_days], Y.T)
+    prediction = (X @ beta).T
+    residuals = Y - prediction[:, :n_days]
+    sigma = np.sqrt((residuals ** 2).sum(axis=1) / max(1, n_days - X.shape[1]))
+    return prediction[:, :n_days], prediction[:, n_days:], np.broadcast_to(sigma[:, None], (n_series, periods))
+
+def holt_winters_pass(Y: np.ndarray, alpha: np.ndarray, beta: np.ndarray, gamma: np.ndarray,
+                      keep_fitted: bool = False) -> Dict[str, np.ndarray]:
+    """Run damped additive Holt-Winters with weekly seasonality; parameters broadcast against the series."""
+    n_days = Y.shape[-1]
+    phi = HOLT_WINTERS_DAMPING
+    shape = np.broadcast_shapes(alpha.shape, Y.shape[:-1])
+
+    level = np.broadcast_to(Y[..., :7].mean(axis=-1), shape).copy()
+    trend = np.broadcast_to((Y[..., 7:14].mean(axis=-1) - Y[..., :7].mean(axis=-1)) / 7 if n_days >= 14 else 0.0, shape).copy()
+    season = np.broadcast_to(Y[..., :7] - Y[..., :7].mean(axis=-1, keepdims=True), shape + (7,)).copy()
+    sse = np.zeros(shape)
+    fitted = np.empty(shape + (n_days,)) if keep_fitted else None
+
+    for t in range(n_days):
+        y = Y[..., t]
+        s = season[..., t % 7]
+        prediction = level + phi * trend + s
+        error = y - prediction
+        if t >= 7:
+            sse += error ** 2
+        if keep_fitted:
+            fitted[..., t] = prediction
+
+        new_level = alpha * (y - s) + (1 - alpha) * (level + phi * trend)
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        season[..., t % 7] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+
+    return {'level': level, 'trend': trend, 'season': season, 'sse': sse, 'fitted': fitted}
+
+def holt_winters_matrix(Y: np.ndarray, first_day: int, periods: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Fit Holt-Winters to each row of Y, choosing smoothing parameters per series from a small grid."""
+    n_series, n_days = Y.shape
+
+    # Yearly seasonality is too long for a seasonal state, so it is removed with Fourier terms first
+    days = np.arange(first_day, first_day + n_days + periods)
+    if n_days >= 730:
+        X = np.hstack([
+            np.ones((len(days), 1)),
+            ((days - first_day) / n_days)[:, None],
+            fourier_terms(days, 365.25, YEARLY_FOURIER_ORDER)
+        ])
+        coefficients = ridge_fit(X[:n_days], Y.T)
+        # Keep only the seasonal part; level and trend are left to the smoother
+        coefficients[:2] = 0.0
+        yearly = (X @ coefficients).T
+    else:
+        yearly = np.zeros((n_series, n_days + periods))
+    Y = Y - yearly[:, :n_days]
+
+    # Score every parameter combination for every series in one vectorized pass
+    grid = np.array(np.meshgrid(*HOLT_WINTERS_GRID.values(), indexing='ij')).reshape(3, -1)
+    search = holt_winters_pass(Y[None, :, :], grid[0][:, None], grid[1][:, None], grid[2][:, None])
+    best = grid[:, np.argmin(search['sse'], axis=0)]
+
+    state = holt_winters_pass(Y, best[0], best[1], best[2], keep_fitted=True)
+    horizon = np.arange(1, periods + 1)
+    damping = np.cumsum(HOLT_WINTERS_DAMPING ** horizon)
+    future = state['level'][:, None] + state['trend'][:, None] * damping + state['season'][:, (n_days + horizon - 1) % 7]
+
+    sigma = np.sqrt(state['sse'] / max(1, n_days - 7))
+    # Additive-model variance approximation: each step ahead adds alpha * (1 + j * beta) of a shock
+    growth = (best[0][:, None] * (1 + np.arange(periods)[None, :] * best[1][:, None])) ** 2
+    spread = sigma[:, None] * np.sqrt(1 + np.cumsum(growth, axis=1) - growth[:, :1])
+    return state['fitted'] + yearly[:, :n_days], future + yearly[:, n_days:], spread
+
+def run_fast_forecasts(histories: Dict[str, pd.DataFrame], periods: int, engine: str = 'holt_winters') -> Dict[str, Dict[str, Any]]:
+    """Forecast many daily ds/y series with a NumPy engine, vectorized over series that share a date span."""
+    fit_matrix = holt_winters_matrix if engine == 'holt_winters' else fourier_ridge_matrix
+    start = time.time()
+
+    # Place each series on a gap-free calendar; days without rows count as zero revenue
+    spans = {}
+    for label, history in histories.items():
+        days = history['ds'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        values = np.zeros(days.max() - days.min() + 1)
+        np.add.at(values, days - days.min(), history['y'].to_numpy(dtype='float64'))
+        spans.setdefault((int(days.min()), len(values)), []).append((label, values))
+
+    results = {}
+    for (first_day, n_days), members in spans.items():
+        if n_days < 14:
+            continue
+        fitted, future, spread = fit_matrix(np.vstack([values for _, values in members]), first_day, periods)
+        dates = pd.to_datetime(np.arange(first_day, first_day + n_days + periods).astype('datetime64[D]'))
+        for row, (label, _) in enumerate(members):
+            yhat = np.concatenate([fitted[row], future[row]])
+            # In-sample bands use the one-step spread
+            width = np.concatenate([np.full(n_days, spread[row, 0]), spread[row]]) * FORECAST_INTERVAL_Z
+            results[label] = {
+                'forecast': pd.DataFrame({'ds': dates, 'yhat': yhat, 'yhat_lower': yhat - width, 'yhat_upper': yhat + width}),
+                'model': None,
+                'model_source': None,
+                'method': engine
+            }
+
+    # Engines fit whole groups at once, so the time is shared evenly between series
+    seconds = time.time() - start
+    for result in results.values():
+        result['fit_seconds'] = result['seconds'] = seconds / max(1, len(results))
+    return results
+
+def run_forecast_job(history: pd.DataFrame, periods: int, model_json: Optional[str] = None,
+                     model_dir: Optional[str] = None, model_max_bytes: int = 0,
+                     timeout: Optional[float] = None, engine: str = 'prophet') -> Dict[str, Any]:
+    """Fit a forecast model on a daily ds/y series, or reuse a fitted one, and predict ahead."""
+    with forecast_timeout(timeout):
+        return predict_forecast(history, periods, model_json, model_dir, model_max_bytes, engine)
+
+def predict_forecast(history: pd.DataFrame, periods: int, model_json: Optional[str] = None,
+                     model_dir: Optional[str] = None, model_max_bytes: int = 0,
+                     engine: str = 'prophet') -> Dict[str, Any]:
+    """Produce a forecast result; see run_forecast_job."""
+    start = time.time()
+
+    if engine in FAST_ENGINES:
+        result = run_fast_forecasts({'series': history}, periods, engine).get('series')
+        if result is not None:
+            return result
+
+    # find_spec only proves Prophet is installed; a broken install falls back to the moving average
+    if (engine != 'moving_average' and PROPHET_AVAILABLE and len(history) > PROPHET_MIN_DAYS
+            and module_importable('prophet.serialize')):
+        if model_json:
+            model, model_source = lazy_import('prophet.serialize').model_from_json(model_json), 'memory'
+        else:
+            model, model_json, model_source = fit_prophet_model(history, model_dir, model_max_bytes)
+        fit_seconds = time.time() - start
+
+        future = model.make_future_dataframe(periods=periods)
+        forecast = model.predict(future)[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+        method = 'prophet'
+    else:
+        model_source = None
+        fit_seconds = 0.0
+        forecast = moving_average_forecast(history, periods)
+        method = 'moving_average'
+
+    return {
+        'forecast': forecast,
+        'model': model_json,
+        'model_source': model_source,
+        'method': method,
+        'fit_seconds': fit_seconds,
+        'seconds': time.time() - start
+    }
+
+# ============================================================================
+# FORECAST EVALUATION
+# ============================================================================
+
+def forecast_accuracy(actual: np.ndarray, forecast: pd.DataFrame) -> Dict[str, float]:
+    """Score a forecast against actual values with MAPE, sMAPE and interval coverage (all in %)."""
+    actual = np.asarray(actual, dtype='float64')
+    predicted = forecast['yhat'].to_numpy(dtype='float64')
+    errors = np.abs(actual - predicted)
+    nonzero = actual != 0
+    denominator = np.abs(actual) + np.abs(predicted)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        symmetric = np.where(denominator > 0, 2 * errors / denominator, 0.0)
+
+    scores = {
+        # Days with zero actuals have no defined percentage error
+        'MAPE': float(np.mean(errors[nonzero] / np.abs(actual[nonzero])) * 100) if nonzero.any() else np.nan,
+        'sMAPE': float(np.mean(symmetric) * 100),
+        'Coverage': np.nan
+    }
+    if 'yhat_lower' in forecast.columns:
+        inside = (actual >= forecast['yhat_lower'].to_numpy()) & (actual <= forecast['yhat_upper'].to_numpy())
+        scores['Coverage'] = float(inside.mean() * 100)
+    return scores
+
+def rolling_origin_cutoffs(history: pd.DataFrame, horizon: int, n_folds: int = BACKTEST_FOLDS,
+                           step: Optional[int] = None) -> List[pd.Timestamp]:
+    """Return fold cutoff dates, oldest first; each fold trains before its cutoff and tests the next `horizon` days."""
+    if history.empty:
+        return []
+    step = step or horizon
+    first, last = history['ds'].min(), history['ds'].max()
+    latest = last - pd.Timedelta(days=horizon - 1)
+    cutoffs = [latest - pd.Timedelta(days=fold * step) for fold in range(n_folds)]
+    # Every fold needs enough training history for the engines to fit
+    return sorted(c for c in cutoffs if (c - first).days >= max(BACKTEST_MIN_TRAIN_DAYS, 2 * horizon))
+
+def run_backtest_fold(history: pd.DataFrame, cutoff: pd.Timestamp, horizon: int, engine: str,
+                      timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Fit one engine on the history before `cutoff` and score it on the following `horizon` days."""
+    train = history[history['ds'] < cutoff]
+    test = history[(history['ds'] >= cutoff) & (history['ds'] < cutoff + pd.Timedelta(days=horizon))]
+    result = run_forecast_job(train, horizon, timeout=timeout, engine=engine)
+
+    # Compare on the tested dates only, since engines differ in how they treat missing days
+    forecast = result['forecast'].merge(test[['ds']], on='ds', how='inner')
+    actual = test.set_index('ds').loc[forecast['ds'], 'y'].to_numpy()
+    return {
+        'Engine': engine,
+        'Model': result['method'],
+        'Cutoff': cutoff,
+        'Train Days': len(train),
+        **forecast_accuracy(actual, forecast),
+        'Fit Seconds': result['fit_seconds'],
+        'Predict Seconds': max(0.0, result['seconds'] - result['fit_seconds'])
+    }
+
+def summarize_backtest(folds: pd.DataFrame) -> pd.DataFrame:
+    """Average fold accuracy per engine and total its wall time, best sMAPE first."""
+    if folds.empty:
+        return pd.DataFrame()
+    summary = folds.groupby('Engine', sort=False).agg(
+        Model=('Model', lambda models: models.mode().iloc[0]),
+        Folds=('Cutoff', 'size'),
+        MAPE=('MAPE', 'mean'),
+        sMAPE=('sMAPE', 'mean'),
+        Coverage=('Coverage', 'mean'),
+        **{'Fit Seconds': ('Fit Seconds', 'sum'), 'Predict Seconds': ('Predict Seconds', 'sum')}
+    )
+    return summary.sort_values('sMAPE').reset_index()
+
+def run_backtest(history: pd.DataFrame, horizon: int, engines: List[str], n_folds: int = BACKTEST_FOLDS,
+                 step: Optional[int] = None, max_workers: int = 2,
+                 timeout: Optional[float] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Run every (engine, fold) pair across a process pool; return the summary and the per-fold rows."""
+    tasks = [(cutoff, engine) for engine in engines for cutoff in rolling_origin_cutoffs(history, horizon, n_folds, step)]
+    if not tasks:
+        return pd.DataFrame(), pd.DataFrame()
+
+    rows = []
+    if max_workers <= 1:
+        rows = [run_backtest_fold(history, cutoff, horizon, engine, timeout) for cutoff, engine in tasks]
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)), mp_context=context) as executor:
+            futures = [executor.submit(run_backtest_fold, history, cutoff, horizon, engine, timeout) for cutoff, engine in tasks]
+            for future in as_completed(futures):
+                try:
+                    rows.append(future.result())
+                except Exception:
+                    # A fold that fails or times out is left out of the averages
+                    continue
+
+    folds = pd.DataFrame(rows)
+    if not folds.empty:
+        folds = folds.sort_values(['Engine', 'Cutoff']).reset_index(drop=True)
+    return summarize_backtest(folds), folds
+
+# ============================================================================
+# HEADLESS ANALYSES
+# ============================================================================
+
+def compute_rfm(df: pd.DataFrame, roles: Dict[str, Optional[str]]) -> pd.DataFrame:
+    """Calculate RFM (Recency, Frequency, Monetary) analysis."""
+    date_col, customer_col, revenue_col = roles['date'], roles['customer'], roles['value']
+    
+    if not all([date_col, customer_col, revenue_col]):
+        return pd.DataFrame()
+    
+    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        return pd.DataFrame()
+    
+    try:
+        aggregates = build_customer_aggregates(df, date_col, customer_col, revenue_col)
+        return score_rfm(aggregates, df[date_col].max())
+    except:
+        return pd.DataFrame()
+
+def compute_clv(df: pd.DataFrame, roles: Dict[str, Optional[str]]) -> pd.DataFrame:
+    """Calculate Customer Lifetime Value (CLV)."""
+    date_col, customer_col, revenue_col = roles['date'], roles['customer'], roles['value']
+    
+    if not all([customer_col, revenue_col, date_col]):
+        return pd.DataFrame()
+    
+    try:
+        return clv_from_aggregates(build_customer_aggregates(df, date_col, customer_col, revenue_col))
+    except:
+        return pd.DataFrame()
+
+def compute_cohorts(df: pd.DataFrame, roles: Dict[str, Optional[str]], frequency: str = 'month') -> Dict[str, Any]:
+    """Build customer and revenue cohort retention tables without touching the input frame."""
+    date_col, customer_col, revenue_col = roles['date'], roles['customer'], roles['value']
+    
+    if not all([date_col, customer_col]):
+        return {}
+    
+    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        return {}
+    
+    try:
+        valid = df[date_col].notna().to_numpy()
+        revenue = df[revenue_col].to_numpy(dtype='float64', na_value=0.0)[valid] if revenue_col else None
+        return build_cohort_tables(
+            df[customer_col][valid],
+            period_codes(df[date_col][valid], frequency),
+            revenue,
+            frequency
+        )
+    except:
+        return {}
+
+def compute_anomalies(df: pd.DataFrame, roles: Dict[str, Optional[str]],
+                      sensitivity: float = ANOMALY_SENSITIVITY) -> pd.DataFrame:
+    """Flag days whose robust seasonal score exceeds the sensitivity."""
+    date_col, value_col = roles['date'], roles['value']
+    if not date_col or not value_col:
+        return pd.DataFrame()
+    
+    history = build_daily_history(df, date_col, value_col)
+    if history.empty:
+        return pd.DataFrame()
+    return threshold_anomalies(score_anomalies(build_anomaly_calendar(history)), sensitivity)
+
+def compute_forecast(df: pd.DataFrame, roles: Dict[str, Optional[str]], periods: int = 30,
+                     engine: str = 'prophet', timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Forecast the daily value series, reusing and storing fitted Prophet models in the shared model cache."""
+    date_col, value_col = roles['date'], roles['value']
+    if not date_col or not value_col:
+        return None
+    
+    history = build_daily_history(df, date_col, value_col)
+    if history.empty:
+        return None
+    return run_forecast_job(history, periods, model_dir=MODEL_CACHE_DIR, model_max_bytes=MODEL_CACHE_MAX_BYTES,
+                            timeout=timeout, engine=engine)
+
+# ============================================================================
+# BATCH RUNS
+# ============================================================================
+
+def load_dataset(path: str, date_col: Optional[str] = None,
+                 value_col: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Optional[str]]]:
+    """Load a CSV, Excel or Parquet file (or Parquet directory) through the app's cleaning pipeline and resolve column roles."""
+    if os.path.isdir(path):
+        # A partitioned directory has no single file to hash, so it is cleaned without the ingest cache
+        df = clean_dataframe(pd.read_parquet(path))['df']
+    else:
+        with open(path, 'rb') as file:
+            df = ingest_file(file, path)['df']
+    
+    roles = dict(resolve_schema_roles(get_schema_fingerprint(df)))
+    # Named columns override the detected ones; raw names are accepted as well as cleaned ones
+    for role, column in (('date', date_col), ('value', value_col)):
+        if column:
+            name = column if column in df.columns else normalize_column_name(column)
+            if name not in df.columns:
+                raise ValueError(f"Column not found in {path}: {column}")
+            roles[role] = name
+    if roles['date'] and not pd.api.types.is_datetime64_any_dtype(df[roles['date']]) \
+            and not pd.api.types.is_numeric_dtype(df[roles['date']]):
+        df[roles['date']] = pd.to_datetime(df[roles['date']], errors='coerce')
+    return df, roles
+
+def discover_datasets(paths: List[str]) -> List[str]:
+    """Expand directories into their data files and Parquet subdirectories, one dataset each."""
+    datasets = []
+    for path in paths:
+        if not os.path.isdir(path):
+            datasets.append(path)
+            continue
+        for name in sorted(os.listdir(path)):
+            entry = os.path.join(path, name)
+            if os.path.isdir(entry):
+                if list_parquet_partitions(entry):
+                    datasets.append(entry)
+            elif os.path.splitext(name)[1].lower() in DATASET_EXTENSIONS:
+                datasets.append(entry)
+    return datasets
+
+def run_dataset_analyses(path: str, output_dir: str, analyses: Tuple[str, ...] = BATCH_ANALYSES,
+                         periods: int = 30, frequency: str = 'month', sensitivity: float = ANOMALY_SENSITIVITY,
+                         engine: str = 'prophet', report_formats: Optional[Tuple[str, ...]] = None,
+                         date_col: Optional[str] = None, value_col: Optional[str] = None) -> Dict[str, Any]:
+    """Load one dataset, run the chosen analyses and write their tables to `output_dir`; runs in a worker process."""
+    started = time.perf_counter()
+    df, roles = load_dataset(path, date_col, value_col)
+    os.makedirs(output_dir, exist_ok=True)
+    summary = {'dataset': path, 'output': output_dir, 'rows': len(df), 'roles': roles,
+               'load_seconds': round(time.perf_counter() - started, 3), 'analyses': {}}
+
+    for analysis in analyses:
+        step_started = time.perf_counter()
+        tables, files = {}, []
+        try:
+            if analysis == 'kpis':
+                write_json_atomic(os.path.join(output_dir, 'kpis.json'), plain_json_values(compute_kpis(df, roles)))
+                files.append('kpis.json')
+            elif analysis == 'rfm':
+                tables['rfm'] = compute_rfm(df, roles)
+            elif analysis == 'clv':
+                clv = compute_clv(df, roles)
+                # Full tables are written highest CLV first; the dashboard ranks only the rows it shows
+                tables['clv'] = clv.sort_values('CLV', ascending=False, ignore_index=True) if not clv.empty else clv
+            elif analysis == 'cohorts':
+                tables = {f"cohorts_{metric}": table for metric, table in compute_cohorts(df, roles, frequency).items()}
+            elif analysis == 'anomalies':
+                tables['anomalies'] = compute_anomalies(df, roles, sensitivity)
+            elif analysis == 'forecast':
+                result = compute_forecast(df, roles, periods, engine)
+                if result is not None:
+                    tables['forecast'] = result['forecast'].tail(periods)
+            else:
+                raise ValueError(f"Unknown analysis: {analysis}")
+        except Exception as exc:
+            # One failed analysis is reported without losing the others
+            summary['analyses'][analysis] = {'error': str(exc) or type(exc).__name__}
+            continue
+
+        for name, table in tables.items():
+            if table is not None and not table.empty:
+                table.to_csv(os.path.join(output_dir, f"{name}.csv"), index=name.startswith('cohorts_'))
+                files.append(f"{name}.csv")
+        summary['analyses'][analysis] = {'files': files, 'seconds': round(time.perf_counter() - step_started, 3)}
+
+    if report_formats:
+        bundle = build_report_bundle(os.path.join(output_dir, 'report.zip'), df, roles, tuple(report_formats), max_workers=1)
+        summary['report'] = {'file': 'report.zip', 'seconds': bundle['total_seconds'],
+                             'failed': [artifact['name'] for artifact in bundle['artifacts'] if 'error' in artifact]}
+
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+    return summary
+
+def run_batch(paths: List[str], output_root: str, max_workers: int = BATCH_WORKERS, **options) -> List[Dict[str, Any]]:
+    """Run the dataset analyses for every dataset under `paths` across a process pool, one output directory each."""
+    datasets = discover_datasets(paths)
+    output_dirs, used = [], set()
+    for path in datasets:
+        name = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+        unique, suffix = name, 2
+        while unique in used:
+            unique, suffix = f"{name}-{suffix}", suffix + 1
+        used.add(unique)
+        output_dirs.append(os.path.join(output_root, unique))
+
+    results = [None] * len(datasets)
+    if max_workers <= 1 or len(datasets) <= 1:
+        for i, (path, output_dir) in enumerate(zip(datasets, output_dirs)):
+            try:
+                results[i] = run_dataset_analyses(path, output_dir, **options)
+            except Exception as exc:
+                results[i] = {'dataset': path, 'error': str(exc) or type(exc).__name__}
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(datasets)), mp_context=context) as executor:
+            futures = {
+                executor.submit(run_dataset_analyses, path, output_dir, **options): i
+                for i, (path, output_dir) in enumerate(zip(datasets, output_dirs))
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as exc:
+                    # A dataset that cannot be read or analysed does not stop the rest of the batch
+                    results[i] = {'dataset': datasets[i], 'error': str(exc) or type(exc).__name__}
+
+    os.makedirs(output_root, exist_ok=True)
+    with open(os.path.join(output_root, 'batch_summary.json'), 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    return results
@@ -0,0 +1,253 @@
+"""
+Autonomous BI Suite - Command Line
+Run the analytics engine against local files without the Streamlit app.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Optional, List, Tuple, Dict
+from datetime import datetime
+
+import pandas as pd
+
+from bi_engine import (
+    load_dataset, build_daily_history, run_backtest, build_report_bundle, run_batch,
+    BACKTEST_FOLDS, FAST_ENGINES, PROPHET_AVAILABLE, ANOMALY_SENSITIVITY,
+    EXPORT_FORMATS, REPORT_BUNDLE_FORMATS, REPORT_WORKERS, REPORT_TOP_K, BATCH_ANALYSES, BATCH_WORKERS
+)
+
+BACKTEST_ENGINES = ('prophet',) + FAST_ENGINES + ('moving_average',)
+REPORT_FORMATS = tuple(export_format for export_format in EXPORT_FORMATS if export_format != 'bundle')
+
+# Import-time benchmark: modules per subsystem, measured on top of the pandas/NumPy baseline
+STARTUP_BASELINE = ('numpy', 'pandas')
+STARTUP_SUBSYSTEMS = {
+    'core': ('numpy', 'pandas'),
+    'ui': ('streamlit',),
+    'charts': ('plotly.express',),
+    'parquet': ('pyarrow.parquet',),
+    'excel': ('xlsxwriter',),
+    'pdf': ('reportlab.platypus',),
+    'forecasting': ('prophet',),
+    'ai': ('openai',),
+    'engine': ('bi_engine',),
+    'app': ('app',)
+}
+
+# Runs in a fresh interpreter: imports the baseline, then times the subsystem and reports the peak memory it added
+# Peak memory is read from VmHWM, since ru_maxrss can carry over the parent's peak through fork and exec
+IMPORT_PROBE = '''
+import sys, json, time, importlib
+def peak_kb():
+    try:
+        with open('/proc/self/status') as status:
+            return next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):
+        return 0
+baseline, modules = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+for name in baseline:
+    importlib.import_module(name)
+before = peak_kb()
+start = time.perf_counter()
+for name in modules:
+    importlib.import_module(name)
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'kb': peak_kb() - before,
+                  'loaded': sorted({name.split('.')[0] for name in sys.modules})}))
+'''
+
+# ============================================================================
+# DATA LOADING
+# ============================================================================
+
+def load_with_roles(path: str, date_col: Optional[str] = None, value_col: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Optional[str]]]:
+    """Load a file and resolve its column roles, letting named columns override the detected ones."""
+    try:
+        return load_dataset(path, date_col, value_col)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+
+def load_daily_history(path: str, date_col: Optional[str] = None, value_col: Optional[str] = None) -> pd.DataFrame:
+    """Load a file and sum its value column per day, resolving unnamed columns by role."""
+    df, roles = load_with_roles(path, date_col, value_col)
+    if not roles['date'] or not roles['value']:
+        raise SystemExit("Could not find a date and a value column; pass --date-col and --value-col.")
+    return build_daily_history(df.dropna(subset=[roles['date']]), roles['date'], roles['value'])
+
+# ============================================================================
+# COMMANDS
+# ============================================================================
+
+def command_backtest(args: argparse.Namespace) -> int:
+    """Print rolling-origin accuracy and timing for each forecast engine."""
+    history = load_daily_history(args.file, args.date_col, args.value_col)
+    engines = [engine for engine in args.engines if engine != 'prophet' or PROPHET_AVAILABLE]
+    summary, folds = run_backtest(history, args.horizon, engines, args.folds, args.step, args.workers, args.timeout)
+    if summary.empty:
+        print("Not enough history for a backtest at this horizon.", file=sys.stderr)
+        return 1
+
+    with pd.option_context('display.width', 160, 'display.max_columns', 20):
+        print(f"{len(history)} days, horizon {args.horizon}, {summary['Folds'].max()} folds per engine\n")
+        print(summary.round(3).to_string(index=False))
+        if args.folds_csv:
+            folds.to_csv(args.folds_csv, index=False)
+        elif args.verbose:
+            print()
+            print(folds.round(dict.fromkeys(folds.select_dtypes('number').columns, 3)).to_string(index=False))
+    return 0
+
+def command_report(args: argparse.Namespace) -> int:
+    """Write a zipped report bundle for a file and print how long each artifact took."""
+    df, roles = load_with_roles(args.file, args.date_col, args.value_col)
+    output = args.output
+    if os.path.isdir(output):
+        stem = os.path.splitext(os.path.basename(os.path.normpath(args.file)))[0]
+        output = os.path.join(output, f"{stem}_report_{datetime.now():%Y%m%d}.zip")
+    manifest = build_report_bundle(output, df, roles, tuple(args.formats), not args.no_charts, args.top_k, args.workers)
+
+    print(f"{output}: {manifest['rows']:,} rows, analytics {manifest['analytics_seconds']:.2f}s, "
+          f"total {manifest['total_seconds']:.2f}s")
+    failed = 0
+    for artifact in manifest['artifacts']:
+        if 'error' in artifact:
+            failed += 1
+            print(f"  {artifact['name']:<24} FAILED: {artifact['error']}")
+        else:
+            print(f"  {artifact['name']:<24} {artifact['bytes']:>12,} bytes  {artifact['seconds']:>7.2f}s")
+    return 1 if failed else 0
+
+def command_batch(args: argparse.Namespace) -> int:
+    """Run the chosen analyses over every dataset in parallel and print a line per dataset."""
+    report_formats = tuple(args.formats) if args.report else None
+    results = run_batch(
+        args.paths, args.output, args.workers,
+        analyses=tuple(args.analyses), periods=args.periods, frequency=args.frequency, sensitivity=args.sensitivity,
+        engine=args.engine, report_formats=report_formats, date_col=args.date_col, value_col=args.value_col
+    )
+    if not results:
+        print("No datasets found.", file=sys.stderr)
+        return 1
+
+    failed = 0
+    for result in results:
+        if 'error' in result:
+            failed += 1
+            print(f"{result['dataset']}: FAILED: {result['error']}")
+            continue
+        errors = [name for name, analysis in result['analyses'].items() if 'error' in analysis]
+        failed += bool(errors or result.get('report', {}).get('failed'))
+        timings = ", ".join(
+            f"{name} {analysis['seconds']:.2f}s" if 'error' not in analysis else f"{name} FAILED"
+            for name, analysis in result['analyses'].items()
+        )
+        print(f"{result['dataset']}: {result['rows']:,} rows in {result['seconds']:.2f}s -> {result['output']}")
+        print(f"  {timings}")
+        if args.verbose:
+            for name in errors:
+                print(f"  {name}: {result['analyses'][name]['error']}")
+    print(f"\n{len(results)} datasets, {failed} with failures; summary in {os.path.join(args.output, 'batch_summary.json')}")
+    return 1 if failed else 0
+
+def probe_imports(modules: Tuple[str, ...], baseline: Tuple[str, ...]) -> Dict[str, object]:
+    """Import modules in a fresh interpreter and return its time, added peak memory and loaded top-level packages."""
+    completed = subprocess.run(
+        [sys.executable, '-c', IMPORT_PROBE, json.dumps(list(baseline)), json.dumps(list(modules))],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        return {'error': (completed.stderr.strip().splitlines() or ['import failed'])[-1]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def command_startup(args: argparse.Namespace) -> int:
+    """Print the import time and memory of each subsystem, and which ones load when the app starts."""
+    app_start = probe_imports(('app',), ())
+    loaded_at_start = set(app_start.get('loaded', []))
+    rows = []
+    for subsystem, modules in STARTUP_SUBSYSTEMS.items():
+        if args.only and subsystem not in args.only:
+            continue
+        baseline = () if subsystem == 'core' else STARTUP_BASELINE
+        runs = [probe_imports(modules, baseline) for _ in range(args.repeat)]
+        timings = [run for run in runs if 'error' not in run]
+        if not timings:
+            rows.append({'Subsystem': subsystem, 'Modules': ', '.join(modules), 'Error': runs[0]['error']})
+            continue
+        rows.append({
+            'Subsystem': subsystem,
+            'Modules': ', '.join(modules),
+            'Import ms': sorted(run['seconds'] for run in timings)[len(timings) // 2] * 1000,
+            'Memory MB': sorted(run['kb'] for run in timings)[len(timings) // 2] / 1024,
+            'Loaded at app start': 'yes' if all(name.split('.')[0] in loaded_at_start for name in modules) else 'no'
+        })
+
+    with pd.option_context('display.width', 160, 'display.max_columns', 20):
+        print(pd.DataFrame(rows).round(1).to_string(index=False))
+    print(f"\nMedian of {args.repeat} fresh interpreters; subsystems other than core are measured on top of "
+          f"{' + '.join(STARTUP_BASELINE)}. Memory is the added peak RSS (Linux only).")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser with one sub-command per task."""
+    parser = argparse.ArgumentParser(prog='cli.py', description="Autonomous BI Suite command line")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    backtest = commands.add_parser('backtest', help="Rolling-origin forecast backtest on a local file")
+    backtest.add_argument('file', help="CSV, Excel or Parquet file")
+    backtest.add_argument('--date-col', help="Date column (default: detected)")
+    backtest.add_argument('--value-col', help="Value column (default: detected)")
+    backtest.add_argument('--horizon', type=int, default=30, help="Days forecast per fold")
+    backtest.add_argument('--folds', type=int, default=BACKTEST_FOLDS, help="Number of rolling origins")
+    backtest.add_argument('--step', type=int, help="Days between origins (default: horizon)")
+    backtest.add_argument('--engines', nargs='+', choices=BACKTEST_ENGINES, default=list(BACKTEST_ENGINES))
+    backtest.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    backtest.add_argument('--timeout', type=float, help="Seconds allowed per fold")
+    backtest.add_argument('--folds-csv', help="Write the per-fold results to this CSV")
+    backtest.add_argument('-v', '--verbose', action='store_true', help="Print the per-fold results")
+    backtest.set_defaults(handler=command_backtest)
+
+    report = commands.add_parser('report', help="Excel, PDF, data and chart files for a local file in one zip")
+    report.add_argument('file', help="CSV, Excel or Parquet file")
+    report.add_argument('-o', '--output', default='.', help="Zip file, or directory for <name>_report_<date>.zip")
+    report.add_argument('--date-col', help="Date column (default: detected)")
+    report.add_argument('--value-col', help="Value column (default: detected)")
+    report.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=list(REPORT_BUNDLE_FORMATS))
+    report.add_argument('--no-charts', action='store_true', help="Leave out the chart images")
+    report.add_argument('--top-k', type=int, default=REPORT_TOP_K, help="Categories shown before grouping as Other")
+    report.add_argument('--workers', type=int, default=REPORT_WORKERS, help="Worker processes")
+    report.set_defaults(handler=command_report)
+
+    batch = commands.add_parser('batch', help="Run analyses over many files or directories in parallel")
+    batch.add_argument('paths', nargs='+', help="Data files, or directories of data files and Parquet datasets")
+    batch.add_argument('-o', '--output', default='batch_output', help="Directory for one result folder per dataset")
+    batch.add_argument('--analyses', nargs='+', choices=BATCH_ANALYSES, default=list(BATCH_ANALYSES))
+    batch.add_argument('--date-col', help="Date column (default: detected per dataset)")
+    batch.add_argument('--value-col', help="Value column (default: detected per dataset)")
+    batch.add_argument('--periods', type=int, default=30, help="Days to forecast")
+    batch.add_argument('--engine', choices=BACKTEST_ENGINES, default='prophet' if PROPHET_AVAILABLE else 'holt_winters',
+                       help="Forecast engine")
+    batch.add_argument('--frequency', choices=['month', 'week', 'quarter'], default='month', help="Cohort period")
+    batch.add_argument('--sensitivity', type=float, default=ANOMALY_SENSITIVITY, help="Anomaly robust z-score threshold")
+    batch.add_argument('--report', action='store_true', help="Also write a report bundle per dataset")
+    batch.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=list(REPORT_BUNDLE_FORMATS),
+                       help="Report bundle files")
+    batch.add_argument('--workers', type=int, default=BATCH_WORKERS, help="Datasets processed at once")
+    batch.add_argument('-v', '--verbose', action='store_true', help="Print the error of each failed analysis")
+    batch.set_defaults(handler=command_batch)
+
+    startup = commands.add_parser('startup', help="Benchmark import time and memory per subsystem")
+    startup.add_argument('--only', nargs='+', choices=list(STARTUP_SUBSYSTEMS), help="Subsystems to measure (default: all)")
+    startup.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per subsystem")
+    startup.set_defaults(handler=command_startup)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Parse the command line and run the chosen command."""
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+Regression checks for the Streamlit-free analytics engine.
+"""
+
+import json
+import os
+import zipfile
+from functools import partial
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+import bi_engine
+from bi_engine import build_report_bundle, write_excel_report
+
+
+def test_excel_report_writes_infinite_values_as_text(tmp_path):
+    path = tmp_path / "report.xlsx"
+    df = pd.DataFrame({'value': [1.0, np.inf, -np.inf, np.nan], 'mixed': ['x', np.inf, 2, None]})
+
+    write_excel_report(str(path), df, {'total_value': 1.0, 'growth_percent': np.inf})
+
+    workbook = load_workbook(path)
+    assert [cell.value for cell in workbook['KPIs'][2]] == [1, 'inf']
+    assert [[cell.value for cell in row] for row in workbook['Data'].iter_rows(min_row=2)] == [
+        [1, 'x'], ['inf', 'inf'], ['-inf', 2]
+    ]
+    assert 'Statistics' in workbook.sheetnames
+
+
+def test_report_bundle_uses_the_sidebar_column_mapping(tmp_path, monkeypatch):
+    import app
+    import streamlit as st
+
+    monkeypatch.setattr(app, 'EXPORT_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'build_report_bundle', partial(build_report_bundle, charts=False, max_workers=1))
+    buttons = {}
+    monkeypatch.setattr(st, 'download_button', lambda **kwargs: buttons.update(kwargs))
+    df = app.generate_sample_data()
+    assert app.get_column_roles(df, apply_overrides=False)['value'] != 'Cost'
+
+    st.session_state['numeric_col'] = 'Cost'
+    try:
+        app.export_download_button("Bundle", df, {}, 'bundle', 'report')
+    finally:
+        # The file is built on a thread that cannot see session state
+        del st.session_state['numeric_col']
+    data = buttons['data']()
+
+    with zipfile.ZipFile(BytesIO(data)) as bundle:
+        manifest = json.loads(bundle.read('manifest.json'))
+    assert manifest['roles']['value'] == 'Cost'
+    assert manifest['kpis']['total_value'] == pytest.approx(df['Cost'].sum())
+
+
+def test_command_line_and_app_load_identical_frames(tmp_path, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, 'GROQ_API_KEY', '')
+    raw = pd.DataFrame({
+        'order_date': ['2024-01-05', '2024-01-06', None, '2024-01-06', '2024-01-09'],
+        'customer_id': ['c1', 'c2', 'c1', 'c2', None],
+        'revenue': ['10.5', '20', '', '20', '7.25'],
+    })
+    path = tmp_path / 'sales.csv'
+    raw.to_csv(path, index=False)
+
+    monkeypatch.setattr(bi_engine, 'INGEST_CACHE_DIR', str(tmp_path / 'app_cache'))
+    upload = BytesIO(path.read_bytes())
+    upload.name = 'sales.csv'
+    app_df = app.process_data(upload)
+
+    monkeypatch.setattr(bi_engine, 'INGEST_CACHE_DIR', str(tmp_path / 'cli_cache'))
+    cli_df, roles = bi_engine.load_dataset(str(path), value_col='revenue')
+
+    pd.testing.assert_frame_equal(cli_df, app_df)
+    assert list(cli_df.columns) == ['Order Date', 'Customer Id', 'Revenue'] and len(cli_df) == 4
+    assert roles['value'] == 'Revenue'
+
+
+def make_transactions(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Order Date': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 400, n), unit='D'),
+        'Customer': rng.integers(0, 300, n).astype(str),
+        'Category': rng.choice(['A', 'B', 'C', 'D'], n),
+        'Revenue': rng.gamma(2.0, 50.0, n).round(2),
+        'Profit': rng.normal(20.0, 5.0, n).round(2),
+    })
+
+
+def test_cohort_tables_match_groupby_retention():
+    df = make_transactions()
+    tables = bi_engine.build_cohort_tables(df['Customer'], bi_engine.period_codes(df['Order Date']), df['Revenue'].to_numpy())
+
+    order = df['Order Date'].dt.to_period('M')
+    cohort = df.groupby('Customer')['Order Date'].transform('min').dt.to_period('M')
+    age = (order - cohort).apply(lambda offset: offset.n)
+    counts = df.groupby([cohort, age])['Customer'].nunique().unstack()
+    revenue = df.groupby([cohort, age])['Revenue'].sum().unstack()
+    expected_customers = counts.divide(counts[0], axis=0) * 100
+    expected_revenue = revenue.divide(revenue[0], axis=0) * 100
+
+    np.testing.assert_allclose(tables['customers'].to_numpy(), expected_customers.to_numpy())
+    np.testing.assert_allclose(tables['revenue'].to_numpy(), expected_revenue.to_numpy())
+    assert list(tables['customers'].index) == [str(period) for period in expected_customers.index]
+    assert tables['sizes'].tolist() == counts[0].tolist()
+
+
+def test_group_sums_and_top_k_match_groupby_nlargest():
+    df = make_transactions()
+    df.loc[::50, 'Customer'] = None
+    state = bi_engine.build_group_sums(df['Customer'], df['Revenue'])
+    expected = df.groupby('Customer')['Revenue'].sum()
+
+    pd.testing.assert_series_equal(pd.Series(state['sums'], index=state['keys']).sort_index(), expected,
+                                   check_names=False, check_index_type=False)
+    top = bi_engine.top_k_groups(state, 10, 'Other')
+    pd.testing.assert_series_equal(top.iloc[:10], expected.nlargest(10), check_names=False, check_index_type=False)
+    assert top['Other'] == pytest.approx(expected.sum() - expected.nlargest(10).sum())
+
+    half = len(df) // 2
+    extended = bi_engine.extend_group_sums(bi_engine.build_group_sums(df['Customer'][:half], df['Revenue'][:half]),
+                                           df['Customer'][half:], df['Revenue'][half:])
+    np.testing.assert_allclose(pd.Series(extended['sums'], index=extended['keys']).sort_index(), expected)
+
+
+def test_lttb_and_minmax_keep_endpoints_and_spikes():
+    rng = np.random.default_rng(1)
+    y = np.sin(np.linspace(0, 20, 5000)) + rng.normal(0, 0.05, 5000)
+    y[1234], y[4321] = 10.0, -10.0
+
+    keep = bi_engine.lttb_indices(np.arange(len(y)), y, 200)
+    assert len(keep) == 200 and keep[0] == 0 and keep[-1] == len(y) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert {1234, 4321} <= set(keep.tolist())
+
+    keep = bi_engine.minmax_indices(y, 200)
+    assert len(keep) <= 200 and keep[0] == 0 and keep[-1] == len(y) - 1
+    buckets = pd.Series(y).groupby(np.arange(len(y)) // -(-len(y) // 99))
+    assert set(buckets.idxmin()) | set(buckets.idxmax()) <= set(keep.tolist())
+
+
+def rolling_anomaly_scores(calendar, window=bi_engine.ANOMALY_WINDOW_DAYS, season_weeks=bi_engine.ANOMALY_SEASON_WEEKS):
+    min_days = max(2, window // 2)
+    level = calendar.rolling(window, min_periods=min_days).median().shift(1)
+    season = (calendar - level).groupby(calendar.index.dayofweek).transform(
+        lambda deviations: deviations.rolling(season_weeks, min_periods=2).median().shift(1))
+    expected = level + season.fillna(0)
+    residual = (calendar - expected).abs()
+    spread = np.fmax(bi_engine.MAD_SCALE * residual.rolling(window, min_periods=min_days).median(),
+                     residual.rolling(window, min_periods=min_days).mean()).shift(1)
+    active = (calendar != 0).astype(float).rolling(window, min_periods=min_days).mean().shift(1)
+    z_score = ((calendar - expected) / spread).where((spread > 0) & (active >= bi_engine.ANOMALY_MIN_ACTIVE_SHARE))
+    return expected, z_score
+
+
+def make_calendar(days=300, seed=2):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-01', periods=days, freq='D')
+    values = 100 + 20 * (index.dayofweek >= 5) + rng.normal(0, 5, days)
+    values[rng.choice(days, 15, replace=False)] = 0.0
+    values[[days // 2, days - 50]] = [400.0, 5.0]
+    return pd.Series(values, index=index)
+
+
+def test_anomaly_matrix_matches_pandas_rolling_statistics():
+    calendar = make_calendar()
+    expected, z_score = bi_engine.score_anomaly_matrix(calendar.to_frame('y'))
+    baseline_expected, baseline_z = rolling_anomaly_scores(calendar)
+
+    np.testing.assert_allclose(expected['y'], baseline_expected.fillna(expected['y']), equal_nan=True)
+    np.testing.assert_allclose(z_score['y'], baseline_z, equal_nan=True)
+    assert z_score['y'].iloc[150] > bi_engine.ANOMALY_SENSITIVITY
+
+
+def test_extended_anomaly_scores_match_a_full_rescore():
+    calendar = make_calendar()
+    scores = bi_engine.extend_anomaly_scores(bi_engine.score_anomalies(calendar.iloc[:200]), calendar)
+    pd.testing.assert_frame_equal(scores, bi_engine.score_anomalies(calendar))
+
+
+def holt_winters_reference(y, periods):
+    best = None
+    for alpha in bi_engine.HOLT_WINTERS_GRID['alpha']:
+        for beta in bi_engine.HOLT_WINTERS_GRID['beta']:
+            for gamma in bi_engine.HOLT_WINTERS_GRID['gamma']:
+                phi = bi_engine.HOLT_WINTERS_DAMPING
+                level, trend = y[:7].mean(), (y[7:14].mean() - y[:7].mean()) / 7
+                season, sse = list(y[:7] - y[:7].mean()), 0.0
+                for t, value in enumerate(y):
+                    error = value - (level + phi * trend + season[t % 7])
+                    sse += error ** 2 if t >= 7 else 0.0
+                    new_level = alpha * (value - season[t % 7]) + (1 - alpha) * (level + phi * trend)
+                    trend = beta * (new_level - level) + (1 - beta) * phi * trend
+                    season[t % 7] = gamma * (value - new_level) + (1 - gamma) * season[t % 7]
+                    level = new_level
+                if best is None or sse < best[0]:
+                    best = (sse, level, trend, season)
+    _, level, trend, season = best
+    damping = np.cumsum(bi_engine.HOLT_WINTERS_DAMPING ** np.arange(1, periods + 1))
+    return np.array([level + trend * damping[h] + season[(len(y) + h) % 7] for h in range(periods)])
+
+
+def test_holt_winters_matrix_matches_a_per_series_loop():
+    Y = np.vstack([make_calendar(120, seed).to_numpy() for seed in range(3)])
+    _, future, _ = bi_engine.holt_winters_matrix(Y, 0, 14)
+    for row in range(len(Y)):
+        np.testing.assert_allclose(future[row], holt_winters_reference(Y[row], 14))
+
+
+def test_fourier_ridge_matrix_matches_per_series_least_squares():
+    Y = np.vstack([make_calendar(400, seed).to_numpy() for seed in range(3)])
+    first_day = 19723
+    fitted, future, _ = bi_engine.fourier_ridge_matrix(Y, first_day, 30)
+
+    days = np.arange(first_day, first_day + 430)
+    X = bi_engine.fourier_design(days, first_day, 400, yearly=True)
+    penalty = np.sqrt(bi_engine.RIDGE_PENALTY) * np.eye(X.shape[1])[1:]
+    for row in range(len(Y)):
+        # Ridge as least squares on rows augmented with the penalty; the intercept is not penalized
+        beta = np.linalg.lstsq(np.vstack([X[:400], penalty]), np.concatenate([Y[row], np.zeros(len(penalty))]), rcond=None)[0]
+        np.testing.assert_allclose(np.concatenate([fitted[row], future[row]]), X @ beta, rtol=1e-6)
+
+
+def test_period_comparison_matches_row_filters():
+    import app
+
+    df = make_transactions()
+    for period in ('week', 'month', 'quarter', 'year'):
+        comparison = app.calculate_period_comparison(df, period)
+        day = df['Order Date'].dt.normalize()
+        for window, total in ((comparison['current_window'], comparison['current_period']),
+                              (comparison['previous_window'], comparison['previous_period'])):
+            rows = (day >= pd.Timestamp(window[0])) & (day <= pd.Timestamp(window[1]))
+            assert total == pytest.approx(df.loc[rows, 'Revenue'].sum())
+
+    max_date = df['Order Date'].max()
+    assert max_date.strftime('%Y-%m-%d') == '2024-02-04'
+    assert app.get_comparison_windows(max_date, 'month') == (
+        pd.Timestamp('2024-02-01'), pd.Timestamp('2024-02-04'), pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-04'))
+
+
+def test_kpi_cube_matches_kpis_over_filtered_rows():
+    import app
+
+    df = make_transactions()
+    roles = dict(bi_engine.resolve_schema_roles(bi_engine.get_schema_fingerprint(df)), entity='Customer')
+    engine = app.build_filter_engine(df, roles['date'], roles['category'])
+    cube = app.build_kpi_cube(engine['base'], roles)
+
+    for date_range in [(engine['min_date'], engine['max_date']), (pd.Timestamp('2023-03-10').date(), pd.Timestamp('2023-09-30').date())]:
+        for category in ['All', 'B', 'missing']:
+            rows = app.apply_filters(engine, date_range, category)
+            expected = bi_engine.compute_kpis(rows, roles)
+            kpis = app.query_kpi_cube(cube, date_range, category)
+            # Growth splits the boundary day pro rata, so it is not compared row for row
+            for name in ('total_value', 'total_profit', 'profit_margin', 'total_records', 'unique_entities'):
+                assert kpis[name] == pytest.approx(expected[name]), (date_range, category, name)
+            if len(rows):
+                assert kpis['avg_value'] == pytest.approx(expected['avg_value'])
+
+
+def test_streaming_dedupe_matches_standard_ingest(tmp_path, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, 'GROQ_API_KEY', '')
+    monkeypatch.setattr(app, 'STREAMING_CHUNK_ROWS', 500)
+    monkeypatch.setattr(bi_engine, 'INGEST_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'INGEST_CACHE_DIR', str(tmp_path))
+    df = make_transactions(2000)
+    # Duplicates both inside a chunk and across chunks
+    raw = pd.concat([df, df.iloc[100:300], df.iloc[1900:1950]], ignore_index=True).to_csv(index=False).encode()
+
+    def upload():
+        file = BytesIO(raw)
+        file.name, file.size = 'sales.csv', len(raw)
+        return file
+
+    streamed = app.process_data(upload(), streaming=True)
+    standard = app.process_data(upload())
+    assert len(streamed) == len(standard) == len(df)
+    pd.testing.assert_frame_equal(streamed, standard, check_dtype=False)
+
+
+def test_find_seen_rows_needs_both_hashes_to_match():
+    import app
+
+    runs = []
+    app.add_hash_run(runs, np.array([5, 5, 9], dtype=np.uint64), np.array([1, 2, 3], dtype=np.uint64))
+    app.add_hash_run(runs, np.array([7], dtype=np.uint64), np.array([4], dtype=np.uint64))
+    seen = app.find_seen_rows(runs, np.array([5, 5, 5, 9, 7, 8], dtype=np.uint64),
+                              np.array([2, 1, 3, 3, 5, 4], dtype=np.uint64))
+    assert seen.tolist() == [True, True, False, True, False, False]
+
+
+def test_ingest_cache_round_trips_the_cleaned_frame(tmp_path, monkeypatch):
+    monkeypatch.setattr(bi_engine, 'INGEST_CACHE_DIR', str(tmp_path))
+    raw = make_transactions(200).to_csv(index=False).encode()
+
+    first = bi_engine.ingest_file(BytesIO(raw), 'sales.csv')
+    second = bi_engine.ingest_file(BytesIO(raw), 'sales.csv')
+    changed = bi_engine.ingest_file(BytesIO(raw.replace(b'2023-', b'2022-', 1)), 'sales.csv')
+
+    assert (first['cached'], second['cached'], changed['cached']) == (False, True, False)
+    pd.testing.assert_frame_equal(second['df'], first['df'])
+    pd.testing.assert_frame_equal(second['type_report'], first['type_report'], check_dtype=False)
+    assert len(os.listdir(tmp_path)) == 2